@@ -0,0 +1,341 @@
+#
+#
+#
+#
+#
+class CompanyDailyMetric(models.Model):
+    """
+    Per-company, per-day rollup of paid sales.
+    The daily counterpart of CompanyMonthlyMetric: dashboard history is read from here
+    instead of re-truncating every paid Order_Items row on each request.
+    Rows are kept up to date by the signals in signals.py. A day whose paid orders all go away
+    keeps a zeroed row (total_daily_orders == 0) so the monthly materialization sees the change
+    through last_updated; readers that mean "days with sales" filter on total_daily_orders > 0.
+    """
+    company = models.ForeignKey(Companies, on_delete=models.CASCADE, related_name='daily_metrics')
+    day = models.DateField()
+
+    total_daily_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))  # Sum of quantity * price
+    total_daily_order_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))  # Sum of Orders.final_amount
+    net_daily_profit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_daily_cogs = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_daily_orders = models.PositiveIntegerField(default=0)
+    total_products_sold = models.PositiveIntegerField(default=0)
+
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('company', 'day')
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.company} - {self.day}"
+
+    @classmethod
+    def refresh_day(cls, company_id, day):
+        """
+        Recomputes the rollup row for a single company/day from its paid orders.
+        Only that day's orders are read, so the cost does not grow with the company's history.
+        Zeroes the row when the day no longer has any paid orders.
+        """
+        paid_orders = Orders.objects.filter(company_id=company_id, status='paid', order_date__date=day)
+
+        order_totals = paid_orders.aggregate(
+            order_count=Count('id'),
+            order_amount=Coalesce(Sum('final_amount'), Decimal('0.00')),
+        )
+        if not order_totals['order_count']:
+            # update() skips auto_now, so last_updated is set explicitly.
+            cls.objects.filter(company_id=company_id, day=day).update(
+                total_daily_revenue=Decimal('0.00'),
+                total_daily_order_amount=Decimal('0.00'),
+                net_daily_profit=Decimal('0.00'),
+                total_daily_cogs=Decimal('0.00'),
+                total_daily_orders=0,
+                total_products_sold=0,
+                last_updated=timezone.now(),
+            )
+            return None
+
+        item_totals = Order_Items.objects.filter(order__in=paid_orders).aggregate(
+            revenue=Coalesce(Sum(F('quantity') * F('price')), Decimal('0.00')),
+            profit=Coalesce(Sum('net_profit'), Decimal('0.00')),
+            cogs=Coalesce(Sum('cogs'), Decimal('0.00')),
+            units=Coalesce(Sum('quantity'), 0),
+        )
+
+        metric, _ = cls.objects.update_or_create(
+            company_id=company_id,
+            day=day,
+            defaults={
+                'total_daily_revenue': item_totals['revenue'],
+                'total_daily_order_amount': order_totals['order_amount'],
+                'net_daily_profit': item_totals['profit'],
+                'total_daily_cogs': item_totals['cogs'],
+                'total_daily_orders': order_totals['order_count'],
+                'total_products_sold': item_totals['units'],
+            }
+        )
+        return metric
+
+    @classmethod
+    def rebuild_for_company(cls, company_id):
+        """
+        Full rebuild of a company's daily rollup from Order_Items and Orders.
+        Used for the initial backfill and as a repair fallback; day-to-day
+        maintenance goes through refresh_day().
+        Rows are upserted, and days that no longer have paid orders are zeroed rather than
+        deleted, so every change moves last_updated where the monthly watermark can see it.
+        """
+        now = timezone.now()
+        order_days = Orders.objects.filter(
+            company_id=company_id,
+            status='paid'
+        ).annotate(
+            day=TruncDay('order_date')
+        ).values('day').annotate(
+            order_count=Count('id'),
+            order_amount=Coalesce(Sum('final_amount'), Decimal('0.00')),
+        )
+        item_days = {
+            row['day']: row for row in Order_Items.objects.filter(
+                order__company_id=company_id,
+                order__status='paid'
+            ).annotate(
+                day=TruncDay('order__order_date')
+            ).values('day').annotate(
+                revenue=Coalesce(Sum(F('quantity') * F('price')), Decimal('0.00')),
+                profit=Coalesce(Sum('net_profit'), Decimal('0.00')),
+                cogs=Coalesce(Sum('cogs'), Decimal('0.00')),
+                units=Coalesce(Sum('quantity'), 0),
+            )
+        }
+
+        metrics = []
+        for row in order_days:
+            items = item_days.get(row['day'], {})
+            metrics.append(cls(
+                company_id=company_id,
+                day=timezone.localdate(row['day']),
+                total_daily_revenue=items.get('revenue', Decimal('0.00')),
+                total_daily_order_amount=row['order_amount'],
+                net_daily_profit=items.get('profit', Decimal('0.00')),
+                total_daily_cogs=items.get('cogs', Decimal('0.00')),
+                total_daily_orders=row['order_count'],
+                total_products_sold=items.get('units', 0),
+                last_updated=now,
+            ))
+
+        with transaction.atomic():
+            # update() skips auto_now, so last_updated is set explicitly.
+            cls.objects.filter(company_id=company_id).exclude(
+                day__in=[metric.day for metric in metrics]
+            ).exclude(total_daily_orders=0).update(
+                total_daily_revenue=Decimal('0.00'),
+                total_daily_order_amount=Decimal('0.00'),
+                net_daily_profit=Decimal('0.00'),
+                total_daily_cogs=Decimal('0.00'),
+                total_daily_orders=0,
+                total_products_sold=0,
+                last_updated=now,
+            )
+            cls.objects.bulk_create(
+                metrics,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['company', 'day'],
+                update_fields=[
+                    'total_daily_revenue', 'total_daily_order_amount', 'net_daily_profit',
+                    'total_daily_cogs', 'total_daily_orders', 'total_products_sold', 'last_updated',
+                ],
+            )
+        return len(metrics)
+
+
+
+class CompanyMetricsWatermark(models.Model):
+    """
+    Per-company watermark for the CompanyMonthlyMetric materialization job.
+    Only months whose CompanyDailyMetric rows changed after monthly_metrics_through are recomputed.
+    """
+    company = models.OneToOneField(Companies, on_delete=models.CASCADE, related_name='metrics_watermark')
+    monthly_metrics_through = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.company} metrics watermark"
+
+
+class TenantContextVersion(models.Model):
+    """
+    Per-user version of the session-cached tenant context (see tenant_context.py).
+    Bumped in the same transaction as the profile or membership change it reflects, so every
+    worker sees the new version as soon as the change commits. Kept in the database rather
+    than a cache, where eviction or a per-process backend would let stale memberships through.
+    Users without a row are at version 0.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} tenant context v{self.version}"
+
+
+class ProductSalesVelocity(models.Model):
+    """
+    Per-product last paid sale date. Backs the "selling well" and "not selling"
+    classifications so the dashboard reads O(products) rows instead of rescanning order history.
+
+    last_sale_date is exact: it is refreshed whenever a product's paid sales change, and it
+    does not age, so no nightly job is needed to keep it correct. Trailing-window totals
+    (units, revenue, profit over the last N days) are not stored here; a stored window total
+    goes stale as soon as a day drops out of it. Aggregate them at read time over
+    sales_window_items(), which reads only the window's paid items.
+    Products that have never sold have no row.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='sales_velocity')
+    company = models.ForeignKey(Companies, on_delete=models.CASCADE, related_name='product_sales_velocities')
+    last_sale_date = models.DateTimeField(null=True, blank=True)
+
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'last_sale_date'], name='velocity_company_last_sale_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} velocity"
+
+    @classmethod
+    def _rows_from_queryset(cls, order_items, now):
+        rows = order_items.filter(
+            order__status='paid'
+        ).values('product_id', 'product__company_id').annotate(
+            last_sale_date=Max('order__order_date')
+        ).order_by()
+
+        return [
+            cls(
+                product_id=row['product_id'],
+                company_id=row['product__company_id'],
+                last_sale_date=row['last_sale_date'],
+                computed_at=now,
+            )
+            for row in rows
+        ]
+
+    @classmethod
+    def refresh_products(cls, product_ids):
+        """
+        Recomputes the velocity rows for the given products only (incremental path).
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        now = timezone.now()
+        velocities = cls._rows_from_queryset(Order_Items.objects.filter(product_id__in=product_ids), now)
+
+        with transaction.atomic():
+            # Products whose last paid sale went away (e.g. a refund) lose their row.
+            cls.objects.filter(product_id__in=product_ids).exclude(
+                product_id__in=[v.product_id for v in velocities]
+            ).delete()
+            cls.objects.bulk_create(
+                velocities,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=['company', 'last_sale_date', 'computed_at'],
+            )
+
+    @classmethod
+    def rebuild_for_company(cls, company_id):
+        """
+        Full rebuild of a company's velocity rows in one grouped pass over its paid Order_Items.
+        """
+        now = timezone.now()
+        velocities = cls._rows_from_queryset(Order_Items.objects.filter(order__company_id=company_id), now)
+        with transaction.atomic():
+            cls.objects.filter(company_id=company_id).delete()
+            cls.objects.bulk_create(velocities, batch_size=1000)
+        return len(velocities)
+
+
+def sales_window_items(company, days, now=None):
+    """
+    The company's paid Order_Items of the trailing `days` days, bounded on order_date so
+    the read stays on the (company, status, order_date) index and covers only the window.
+    """
+    start = (now or timezone.now()) - timedelta(days=days)
+    return Order_Items.objects.filter(
+        order__company=company,
+        order__status='paid',
+        order__order_date__gte=start,
+    )
+
+
+# Products with stock and no paid sale in this many days are "not selling", everywhere.
+NOT_SELLING_DAYS = 90
+
+
+def not_selling_q(now=None):
+    """
+    The single definition of "not selling" used by every dashboard view:
+    the product has stock and no paid sale within NOT_SELLING_DAYS (or has never sold).
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=NOT_SELLING_DAYS)
+    return Q(stock__gt=0) & (
+        Q(sales_velocity__isnull=True) | Q(sales_velocity__last_sale_date__lt=cutoff)
+    )
+
+# --- Dashboard access-path indexes: add to the existing models' class Meta ---
+# Almost every analytics query filters on company + status='paid' + an order_date range
+# (directly on Orders, or through Order_Items.order). Product queries filter on company
+# plus stock <= low_stock_input. The matching operations, built concurrently so they do
+# not lock the tables, are in migration_add.py.
+
+class Orders(models.Model):
+    # ... (existing fields)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'status', 'order_date'], name='orders_company_status_date_idx'),
+            # Partial index: only paid orders, which is all the dashboard ever reads.
+            models.Index(
+                fields=['company', 'order_date'],
+                name='orders_paid_company_date_idx',
+                condition=Q(status='paid'),
+            ),
+        ]
+
+
+class Order_Items(models.Model):
+    # ... (existing fields)
+
+    class Meta:
+        indexes = [
+            # Per-product lookups (sales velocity refresh, per-product exports).
+            models.Index(fields=['product', 'order'], name='order_items_product_order_idx'),
+        ]
+
+
+# Search and pagination indexes for items_to_sell_modal_view.
+# The trigram GIN indexes let Postgres serve `icontains` on name/barcode without a
+# sequential scan; they need the pg_trgm extension (TrigramExtension in migration_add.py).
+# On Postgres `icontains` compiles to UPPER(col::text) LIKE UPPER(%s), so the indexes are
+# built on UPPER(col); an index on the raw column would not match that expression.
+# The (company, stock, name) index matches the keyset pagination order within a warning group.
+class Product(models.Model):
+    # ... (existing fields)
+
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_upper_trgm_idx'),
+            GinIndex(OpClass(Upper('barcode'), name='gin_trgm_ops'), name='product_barcode_upper_trgm_idx'),
+            models.Index(fields=['company', 'stock', 'name'], name='product_company_stock_name_idx'),
+            # Partial index for the low-stock KPI and the "Running Low" filter.
+            models.Index(
+                fields=['company', 'stock'],
+                name='product_low_stock_idx',
+                condition=Q(stock__lte=F('low_stock_input')),
+            ),
+        ]
@@ -0,0 +1,312 @@
+#
+#
+#
+#
+#
+from .analytics_cache import invalidate_company_cache
+from .kpi_stream import get_kpi_broker, kpi_delta
+from .tenant_context import invalidate_tenant_context
+
+# --- Daily rollup and sales velocity maintenance (CompanyDailyMetric, ProductSalesVelocity) ---
+# An order affects the rollup only while it is (or was) 'paid'. We remember the
+# previous status/date in pre_save so a transition to or from 'paid', or a date
+# change on a paid order, refreshes every day it touched, and the velocity rows of
+# every product on it. Paid line-item changes refresh their order's day and product.
+#
+# Signals fire once per line item, so the refreshes are not run from the handlers:
+# the (company, day) pairs, products and changed items' orders are collected per
+# connection and flushed once after commit. An N-line checkout then re-aggregates its
+# day once, with a single Orders lookup for all the lines, instead of N times.
+
+def _queue_refresh(add):
+    """
+    Applies `add` to the refreshes queued on the current connection, then registers the
+    flush after commit (immediately outside a transaction). Every queueing registers the
+    flush again and the first one to run drains the queue, so a rolled-back savepoint that
+    discarded an earlier registration doesn't lose the work.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_analytics_pending_refreshes', None)
+    if pending is None:
+        pending = connection._analytics_pending_refreshes = {
+            'days': set(), 'products': set(), 'item_orders': {}, 'companies': set(),
+        }
+    add(pending)
+    transaction.on_commit(_flush_pending_refreshes)
+
+
+def _flush_pending_refreshes():
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_analytics_pending_refreshes', None)
+    connection._analytics_pending_refreshes = None
+    if not pending:
+        return
+
+    days = set(pending['days'])
+    product_ids = set(pending['products'])
+    company_ids = set(pending['companies'])
+    if pending['item_orders']:
+        orders = Orders.objects.filter(pk__in=pending['item_orders']).values('pk', 'company_id', 'status', 'order_date')
+        orders = {order['pk']: order for order in orders}
+        for order_id, item_product_ids in pending['item_orders'].items():
+            order = orders.get(order_id)
+            if order is None:
+                # Deleted together with its order; the order's own handlers refreshed its day and cache.
+                product_ids |= item_product_ids
+                continue
+            company_ids.add(order['company_id'])
+            if order['status'] == 'paid':
+                product_ids |= item_product_ids
+                if order['order_date']:
+                    days.add((order['company_id'], timezone.localdate(order['order_date'])))
+
+    for company_id, day in sorted(days):
+        CompanyDailyMetric.refresh_day(company_id, day)
+    product_ids.discard(None)
+    if product_ids:
+        ProductSalesVelocity.refresh_products(product_ids)
+
+    # Last: a request that misses the cache from here on reads the refreshed rollups.
+    for company_id in company_ids - {None}:
+        invalidate_company_cache(company_id)
+
+
+def _schedule_daily_metric_refresh(company_id, days):
+    days = {d for d in days if d is not None}
+    if company_id and days:
+        _queue_refresh(lambda pending: pending['days'].update((company_id, day) for day in days))
+
+
+def _schedule_velocity_refresh(product_ids):
+    product_ids = {p for p in product_ids if p is not None}
+    if product_ids:
+        _queue_refresh(lambda pending: pending['products'].update(product_ids))
+
+
+@receiver(pre_save, sender=Orders)
+def remember_previous_order_state(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values('status', 'order_date').first()
+    instance._previous_status = previous['status'] if previous else None
+    instance._previous_order_date = previous['order_date'] if previous else None
+
+
+@receiver(post_save, sender=Orders)
+def update_daily_metric_on_order_save(sender, instance, **kwargs):
+    was_paid = getattr(instance, '_previous_status', None) == 'paid'
+    is_paid = instance.status == 'paid'
+    if not (was_paid or is_paid):
+        return
+
+    days = set()
+    if is_paid and instance.order_date:
+        days.add(timezone.localdate(instance.order_date))
+    if was_paid and instance._previous_order_date:
+        days.add(timezone.localdate(instance._previous_order_date))
+    _schedule_daily_metric_refresh(instance.company_id, days)
+
+
+@receiver(post_delete, sender=Orders)
+def update_daily_metric_on_order_delete(sender, instance, **kwargs):
+    if instance.status == 'paid' and instance.order_date:
+        _schedule_daily_metric_refresh(instance.company_id, {timezone.localdate(instance.order_date)})
+
+
+@receiver(post_save, sender=Orders)
+def update_velocity_on_order_save(sender, instance, **kwargs):
+    was_paid = getattr(instance, '_previous_status', None) == 'paid'
+    if was_paid or instance.status == 'paid':
+        _schedule_velocity_refresh(
+            Order_Items.objects.filter(order=instance).values_list('product_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Order_Items)
+@receiver(post_delete, sender=Order_Items)
+def update_rollups_on_item_change(sender, instance, **kwargs):
+    # Whether the order is paid (and its day) is looked up once per order at flush time.
+    order_id, product_id = instance.order_id, instance.product_id
+    _queue_refresh(lambda pending: pending['item_orders'].setdefault(order_id, set()).add(product_id))
+
+# --- Line-level cost snapshot (Order_Items.cogs / net_profit) ---
+# Every sales aggregate reads the stored cogs and net_profit instead of joining Product,
+# so they are stamped when a line item is saved without them, using the product's cost
+# at the time of sale; later cost changes do not rewrite history. Older rows saved
+# without them are filled by the backfill_line_item_costs command.
+#
+# An edited line is restamped when its product, quantity or price changes, unless the
+# caller set cogs/net_profit itself. A quantity change keeps the unit cost stamped at sale
+# time; only a product change reads the (new) product's current cost.
+
+def _current_unit_cost(instance):
+    # The product the caller passed in costs no query; otherwise read just its cost.
+    if Order_Items.product.is_cached(instance):
+        return instance.product.cost
+    return Product.objects.filter(pk=instance.product_id).values_list('cost', flat=True).first()
+
+
+@receiver(pre_save, sender=Order_Items)
+def stamp_line_item_costs(sender, instance, **kwargs):
+    previous = None
+    if not instance._state.adding and instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values(
+            'product_id', 'quantity', 'price', 'cogs', 'net_profit'
+        ).first()
+
+    restamp_cogs = previous is not None and instance.cogs == previous['cogs'] and (
+        instance.product_id != previous['product_id'] or instance.quantity != previous['quantity']
+    )
+    if (instance.cogs is None or restamp_cogs) and instance.product_id and instance.quantity is not None:
+        if (
+            restamp_cogs and previous['cogs'] is not None and previous['quantity']
+            and instance.product_id == previous['product_id']
+        ):
+            unit_cost = previous['cogs'] / previous['quantity']
+        else:
+            unit_cost = _current_unit_cost(instance)
+        if unit_cost is not None:
+            instance.cogs = unit_cost * instance.quantity
+
+    restamp_profit = previous is not None and instance.net_profit == previous['net_profit'] and (
+        instance.cogs != previous['cogs']
+        or instance.quantity != previous['quantity']
+        or instance.price != previous['price']
+    )
+    if (
+        (instance.net_profit is None or restamp_profit)
+        and instance.cogs is not None and instance.price is not None and instance.quantity is not None
+    ):
+        instance.net_profit = instance.price * instance.quantity - instance.cogs
+
+# --- Analytics cache invalidation ---
+# Any write to a company's orders, line items or products drops its cached dashboard results.
+# The version bump is queued with the rollup refreshes and runs after them, after commit:
+# bumping it earlier would let a request in between cache the stale rollups under the new
+# version. Line items are covered by update_rollups_on_item_change (their orders' companies
+# are invalidated when the queue is flushed).
+
+@receiver(post_save, sender=Orders)
+@receiver(post_delete, sender=Orders)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_analytics_cache_on_company_change(sender, instance, **kwargs):
+    company_id = instance.company_id
+    _queue_refresh(lambda pending: pending['companies'].add(company_id))
+
+
+# --- Tenant context invalidation (see tenant_context.py) ---
+# Session-cached tenant contexts go stale when a profile changes company, when company
+# membership changes, or when a company is deleted.
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_tenant_context_on_profile_change(sender, instance, **kwargs):
+    invalidate_tenant_context({instance.user_id})
+
+
+@receiver(m2m_changed, sender=Companies.employees.through)
+def invalidate_tenant_context_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance is a UserProfile.
+        invalidate_tenant_context({instance.user_id})
+    elif action == 'pre_clear':
+        invalidate_tenant_context(instance.employees.values_list('user_id', flat=True))
+    else:
+        invalidate_tenant_context(UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+
+
+@receiver(pre_delete, sender=Companies)
+def invalidate_tenant_context_on_company_delete(sender, instance, **kwargs):
+    user_ids = set(instance.employees.values_list('user_id', flat=True))
+    user_ids.update(UserProfile.objects.filter(company=instance).values_list('user_id', flat=True))
+    invalidate_tenant_context(user_ids)
+
+
+# --- Live KPI deltas (see kpi_stream.py) ---
+# Only computed while someone streams the company's KPIs; published after commit.
+
+def _publish_kpi_event(company_id, event):
+    if company_id:
+        transaction.on_commit(lambda: get_kpi_broker().publish(company_id, event))
+
+
+def _order_kpi_totals(order):
+    return Order_Items.objects.filter(order=order).aggregate(
+        revenue=Coalesce(Sum(F('quantity') * F('price')), Decimal('0.00')),
+        profit=Coalesce(Sum('net_profit'), Decimal('0.00')),
+    )
+
+
+@receiver(post_save, sender=Orders)
+def publish_kpi_delta_on_order_save(sender, instance, **kwargs):
+    was_paid = getattr(instance, '_previous_status', None) == 'paid'
+    is_paid = instance.status == 'paid'
+    if was_paid == is_paid or not get_kpi_broker().has_listeners(instance.company_id):
+        return
+
+    sign = 1 if is_paid else -1
+    totals = _order_kpi_totals(instance)
+    _publish_kpi_event(instance.company_id, kpi_delta(
+        revenue=sign * totals['revenue'],
+        profit=sign * totals['profit'],
+        orders=sign,
+    ))
+
+
+@receiver(pre_delete, sender=Orders)
+def publish_kpi_delta_on_order_delete(sender, instance, **kwargs):
+    # pre_delete: the line items are still there to be subtracted.
+    if instance.status != 'paid' or not get_kpi_broker().has_listeners(instance.company_id):
+        return
+    totals = _order_kpi_totals(instance)
+    _publish_kpi_event(instance.company_id, kpi_delta(
+        revenue=-totals['revenue'],
+        profit=-totals['profit'],
+        orders=-1,
+    ))
+
+
+@receiver(post_save, sender=Order_Items)
+@receiver(post_delete, sender=Order_Items)
+def publish_kpi_resync_on_paid_item_change(sender, instance, **kwargs):
+    # Editing the lines of an already paid order is rare; reload the totals instead of diffing.
+    # Nothing is looked up unless some stream of this process is open, so checkouts and bulk
+    # edits cost no extra query per line in the usual case.
+    broker = get_kpi_broker()
+    if not broker.has_any_listeners():
+        return
+    if Order_Items.order.is_cached(instance):
+        order = {'company_id': instance.order.company_id, 'status': instance.order.status}
+    else:
+        order = Orders.objects.filter(pk=instance.order_id).values('company_id', 'status').first()
+    if order and order['status'] == 'paid' and broker.has_listeners(order['company_id']):
+        _publish_kpi_event(order['company_id'], {'type': 'resync'})
+
+
+def _is_low_stock(stock, low_stock_input):
+    return stock is not None and low_stock_input is not None and stock <= low_stock_input
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_stock_state(sender, instance, **kwargs):
+    instance._was_low_stock = False
+    if instance.pk and get_kpi_broker().has_listeners(instance.company_id):
+        previous = sender.objects.filter(pk=instance.pk).values('stock', 'low_stock_input').first()
+        instance._was_low_stock = bool(previous) and _is_low_stock(previous['stock'], previous['low_stock_input'])
+
+
+@receiver(post_save, sender=Product)
+def publish_kpi_delta_on_stock_change(sender, instance, **kwargs):
+    was_low = getattr(instance, '_was_low_stock', False)
+    is_low = _is_low_stock(instance.stock, instance.low_stock_input)
+    if was_low != is_low and get_kpi_broker().has_listeners(instance.company_id):
+        _publish_kpi_event(instance.company_id, kpi_delta(low_stock_count=1 if is_low else -1))
+
+
+@receiver(post_delete, sender=Product)
+def publish_kpi_delta_on_product_delete(sender, instance, **kwargs):
+    if _is_low_stock(instance.stock, instance.low_stock_input) and get_kpi_broker().has_listeners(instance.company_id):
+        _publish_kpi_event(instance.company_id, kpi_delta(low_stock_count=-1))
@@ -3,6 +3,60 @@
 #
 #
 #
+import asyncio
+import base64
+import binascii
+import contextvars
+import csv
+import itertools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+from . import bucketing
+from .analytics_cache import cache_company_fragment, cache_company_json, static_fragment
+from .compact_payload import columnar_columns, payload_response, wants_columnar
+from .instrumentation import get_recent_samples, profile_view, summarize_samples
+from .inventory_valuation import build_inventory_valuation
+from .kpi_stream import get_kpi_broker
+from .read_replica import analytics_read_replica, current_read_alias
+from .restock_engine import (
+    RESTOCK_COLUMNS,
+    get_restock_plan,
+    parse_restock_params,
+    restock_rows,
+    restock_selection,
+    restock_supplier_summary,
+)
+from .tenant_context import get_tenant_context
+
+def user_company_id(request, *args, **kwargs):
+    """
+    Returns the id of the authenticated user's company, or None if there is no linked company.
+    Read from the tenant context, so resolving a cache key needs no query.
+    """
+    return get_tenant_context(request).company_id
+
+
+def member_url_company_id(request, company_id, *args, **kwargs):
+    """
+    Returns the company_id from the URL only when the user is a member of that company.
+    Used as the cache key resolver so a cached response can never skip a view's permission check.
+    """
+    if get_tenant_context(request).is_member(company_id):
+        return int(company_id)
+    return None
+
 @login_required
 def sample_dashboard(request):
     """
@@ -16,96 +70,117 @@ def sample_dashboard(request):
     
     context = {
         'company': company,
+        'kpi_stream_enabled': kpi_stream_enabled(),
     }
     return render(request, 'your_analytics_insights_page.html', context)
 
-@login_required
-def get_kpi_data(request):
+def kpi_aggregate_queries(company, now=None):
     """
-    API endpoint to fetch all KPI data as a single JSON object.
+    The two independent conditional-aggregation queries behind the dashboard KPIs,
+    as (queryset, aggregate kwargs) pairs: one over the CompanyDailyMetric rollup (sales side)
+    and one over Product joined to its ProductSalesVelocity row (inventory side).
+    Kept separate so the sync engine runs them back to back and the async views run them concurrently.
     """
-    company, user_profile, has_company = get_user_company(request)
-    if not has_company:
-        return JsonResponse({'error': 'Company not found.'}, status=403)
-
     # --- Date Definitions (All timezone-aware for consistency with DateTimeField) ---
-    today_aware = timezone.now()
+    today_aware = now or timezone.now()
     start_of_today_aware = today_aware.replace(hour=0, minute=0, second=0, microsecond=0)
     thirty_days_ago_aware = start_of_today_aware - timedelta(days=30)
 
-    # All Order_Items for this company with 'paid' status
-    all_time_order_items = Order_Items.objects.filter(
-        order__company=company,
-        order__status='paid'
-    )
-    
-    # --- KPI Calculations ---
-    # Total Revenue (All Time)
-    total_sales = all_time_order_items.aggregate(
-        sum_sales=Coalesce(Sum(F('quantity') * F('price')), Decimal('0.00'))
-    )['sum_sales']
-
-    # Total Profit (All Time)
-    total_profit_all_time = all_time_order_items.aggregate(
-        total=Coalesce(Sum(F('net_profit')), Decimal('0.00'))
-    )['total']
-
-    # Total Orders (All Time)
-    total_orders = Orders.objects.filter(company=company, status='paid').count()
-
-    # Gross Profit Margin (Overall)
-    overall_revenue = all_time_order_items.aggregate(
-        total=Coalesce(Sum(F('quantity') * F('price')), Decimal('0.00'))
-    )['total']
-    overall_cogs = all_time_order_items.aggregate(
-        total=Coalesce(Sum(F('cogs')), Decimal('0.00'))
-    )['total']
-    gross_profit_margin = Decimal('0.00')
-    if overall_revenue > 0:
-        gross_profit_margin = ((overall_revenue - overall_cogs) / overall_revenue) * 100
-
-    # Number of Items Selling Well (Last 30 days - KPI)
-    num_items_selling_well = Order_Items.objects.filter(
-        order__company=company,
-        order__order_date__gte=thirty_days_ago_aware,
-        order__status='paid'
-    ).values('product').distinct().count()
-
-    # Total Inventory Value
-    inventory_products = Product.objects.filter(company=company)
-    total_inventory_value = inventory_products.aggregate(
-        total_value=Coalesce(Sum(F('stock') * F('price')), Decimal('0.00'))
-    )['total_value']
-
-    # Items Needing Attention
-    low_stock_products = Product.objects.filter(
-        company=company,
-        stock__lte=F('low_stock_input')
+    # --- Query 1: Every sales KPI in a single pass over the daily rollup ---
+    # The same definitions kpi_sales_totals_from_rollup sums in Python for the bootstrap
+    # endpoint, so both report the same numbers: total_orders counts paid orders, like the
+    # live stream's +1/-1 deltas. Revenue is computed once and reused for the gross profit margin.
+    sales_query = (
+        CompanyDailyMetric.objects.filter(company=company),
+        {
+            'total_revenue': Coalesce(Sum('total_daily_revenue'), Decimal('0.00')),
+            'total_profit': Coalesce(Sum('net_daily_profit'), Decimal('0.00')),
+            'total_cogs': Coalesce(Sum('total_daily_cogs'), Decimal('0.00')),
+            'total_orders': Coalesce(Sum('total_daily_orders'), 0),
+        }
     )
-    recent_sales_products_ids = Order_Items.objects.filter(
-        order__company=company,
-        order__order_date__gte=thirty_days_ago_aware,
-        order__status='paid'
-    ).values_list('product_id', flat=True).distinct()
-    not_selling_products = Product.objects.filter(
-        company=company
-    ).exclude(
-        id__in=recent_sales_products_ids
+
+    # --- Query 2: Inventory KPIs in a single pass over Product + ProductSalesVelocity ---
+    # A product needs attention if it is running low OR is not selling (see not_selling_q),
+    # the same definition the "Items Needing Attention" modal lists.
+    inventory_query = (
+        Product.objects.filter(company=company),
+        {
+            'total_inventory_value': Coalesce(Sum(F('stock') * F('price')), Decimal('0.00')),
+            'num_items_selling_well': Count('id', filter=Q(sales_velocity__last_sale_date__gte=thirty_days_ago_aware)),
+            'items_needing_attention_count': Count(
+                'id',
+                filter=Q(stock__lte=F('low_stock_input')) | not_selling_q(today_aware)
+            ),
+        }
     )
-    items_needing_attention_count = low_stock_products.count() + not_selling_products.exclude(id__in=low_stock_products.values_list('id', flat=True)).count()
+
+    return sales_query, inventory_query
+
+def assemble_kpi_snapshot(sales_totals, inventory_totals):
+    """
+    Combines the two KPI aggregate results into the raw KPI dict (Decimal/int values).
+    """
+    gross_profit_margin = Decimal('0.00')
+    if sales_totals['total_revenue'] > 0:
+        gross_profit_margin = ((sales_totals['total_revenue'] - sales_totals['total_cogs']) / sales_totals['total_revenue']) * 100
+
+    return {
+        'total_sales': sales_totals['total_revenue'],
+        'total_profit': sales_totals['total_profit'],
+        'total_orders': sales_totals['total_orders'],
+        'gross_profit_margin': gross_profit_margin,
+        'num_items_selling_well': inventory_totals['num_items_selling_well'],
+        'total_inventory_value': inventory_totals['total_inventory_value'],
+        'items_needing_attention_count': inventory_totals['items_needing_attention_count'],
+    }
+
+def compute_kpi_snapshot(company, now=None, sales_totals=None):
+    """
+    KPI engine for the analytics dashboard.
+    Computes all seven dashboard KPIs for a company with two conditional-aggregation queries.
+    `sales_totals` (see kpi_sales_totals_from_rollup) replaces the sales query when the caller
+    already has them. Returns a dict of raw Decimal/int values; use serialize_kpi_snapshot for
+    the JSON contract.
+    """
+    (sales_rows, sales_aggregates), (products, inventory_aggregates) = kpi_aggregate_queries(company, now)
+    if sales_totals is None:
+        sales_totals = sales_rows.aggregate(**sales_aggregates)
+    return assemble_kpi_snapshot(sales_totals, products.aggregate(**inventory_aggregates))
+
+def serialize_kpi_snapshot(kpis):
+    """
+    The JSON contract of the KPI endpoint.
+    """
+    return {
+        'total_sales': float(kpis['total_sales']),
+        'total_profit': float(kpis['total_profit']),
+        'total_orders': kpis['total_orders'],
+        'gross_profit_margin': float(kpis['gross_profit_margin']),
+        'num_items_selling_well': kpis['num_items_selling_well'],
+        'total_inventory_value': float(kpis['total_inventory_value']),
+        'items_needing_attention_count': kpis['items_needing_attention_count'],
+    }
+
+@login_required
+@profile_view('kpi')
+@cache_company_json('kpi', get_company_id=user_company_id)
+@analytics_read_replica
+def get_kpi_data(request):
+    """
+    API endpoint to fetch all KPI data as a single JSON object.
+    """
+    company, user_profile, has_company = get_user_company(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found.'}, status=403)
 
     # Return as JSON
-    return JsonResponse({
-        'total_sales': float(total_sales),
-        'total_profit': float(total_profit_all_time),
-        'total_orders': total_orders,
-        'gross_profit_margin': float(gross_profit_margin),
-        'num_items_selling_well': num_items_selling_well,
-        'total_inventory_value': float(total_inventory_value),
-        'items_needing_attention_count': items_needing_attention_count,
-    })
+    return JsonResponse(serialize_kpi_snapshot(compute_kpi_snapshot(company)))
 
 @login_required
+@profile_view('items_selling_well')
+@cache_company_fragment('items_selling_well', get_company_id=user_company_id)
+@analytics_read_replica
 def get_items_selling_well_modal_content(request):
     company, user_profile_obj, has_company = get_user_company(request)
 
@@ -116,30 +191,30 @@ def get_items_selling_well_modal_content(request):
             messages.error(request, "Company not found. Please set up your company first.")
             return redirect(reverse('accounts:company_setup'))
 
+    context = build_items_selling_well_context(company)
+
+    # Ensure this renders the correct template path:
+    return render(request, 'items_selling_well_modal_content.html', context)
+
+def build_items_selling_well_context(company):
+    """
+    Builds the template context for the "Items Selling Well" modal (top 10 sellers, last 30 days).
+    """
     # --- CORRECTED: Use timezone.now() for precise datetime filtering ---
     now_aware = timezone.now()
     end_date_for_filter = now_aware # Filter up to the current moment
     start_date_for_filter = now_aware - timedelta(days=30) # Exactly 30 days ago from now
 
-    top_selling_items = Order_Items.objects.filter(
-        order__company=company,
-        order__order_date__gte=start_date_for_filter, # Use >= for start datetime
-        order__order_date__lte=end_date_for_filter,   # Use <= for end datetime
-        order__status='paid' # Only consider paid orders
-    ).values(
+    # Aggregated at read time over the window's paid items only, so the 30 days are exact.
+    top_selling_items = sales_window_items(company, 30, now=now_aware).values(
         'product__name',
         'product__barcode',
         'product__stock', # Fetch current stock for display
     ).annotate(
         total_quantity_sold=Sum('quantity'),
-        total_revenue_from_item=Sum(F('quantity') * F('price')), # F('price') refers to Order_Items.price
-        total_profit_from_item=Sum(
-            ExpressionWrapper(
-                F('quantity') * (F('price') - F('product__cost')), # F('product__cost') is from Product model
-                output_field=DecimalField()
-            )
-        )
-    ).order_by('-total_quantity_sold')[:10] # Top 10 items
+        total_revenue_from_item=Sum(F('quantity') * F('price')),
+        total_profit_from_item=Sum('net_profit'),
+    ).filter(total_quantity_sold__gt=0).order_by('-total_quantity_sold')[:10] # Top 10 items
 
     context = {
         'top_selling_items': top_selling_items,
@@ -147,11 +222,12 @@ def get_items_selling_well_modal_content(request):
         'start_date': timezone.localdate(start_date_for_filter),
         'end_date': timezone.localdate(end_date_for_filter),
     }
-
-    # Ensure this renders the correct template path:
-    return render(request, 'items_selling_well_modal_content.html', context)
+    return context
 
 @login_required
+@profile_view('items_to_sell')
+@cache_company_fragment('items_to_sell', get_company_id=user_company_id)
+@analytics_read_replica
 def items_to_sell_modal_view(request):
     """
     Fetches products that need attention for the authenticated user's company
@@ -165,39 +241,89 @@ def items_to_sell_modal_view(request):
             messages.error(request, "Company not found. Please set up your company first.")
             return redirect(reverse('accounts:company_setup'))
 
-    # Define date ranges
-    today = timezone.localdate(timezone.now())
-    ninety_days_ago = today - timedelta(days=90)
-    
-    # Efficiently get all products sold in the last 90 days.
-    # This avoids a subquery inside the main queryset, which is more performant.
-    sold_in_last_90_days_product_ids = set(Order_Items.objects.filter(
-        order__company=company,
-        order__status='paid',
-        order__order_date__gte=ninety_days_ago
-    ).values_list('product_id', flat=True))
+    query = request.GET.get('q', '')
+    try:
+        page_size = min(int(request.GET.get('page_size', ITEMS_TO_SELL_PAGE_SIZE)), ITEMS_TO_SELL_MAX_PAGE_SIZE)
+        after = decode_keyset_cursor(request.GET.get('after'))
+    except ValueError:
+        return HttpResponse("<p class='text-danger text-center'>Invalid page request.</p>", status=400)
+    context = build_items_to_sell_context(company, query, after=after, page_size=max(page_size, 1))
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        html_content = render_to_string('items_attention_modal_content.html', context, request=request)
+        return HttpResponse(html_content)
+    else:
+        messages.info(request, "Items needing attention are typically viewed within the dashboard modal.")
+        return redirect(reverse('your_analytics_insights'))
+
+ITEMS_TO_SELL_PAGE_SIZE = 50
+ITEMS_TO_SELL_MAX_PAGE_SIZE = 200
+
+def encode_keyset_cursor(values):
+    """
+    Encodes the sort key of the last row on a page as an opaque, URL-safe cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode('utf-8')).decode('ascii')
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def decode_keyset_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_keyset_cursor. Raises ValueError if it is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != 4:
+        raise ValueError("Invalid cursor")
+    # (warning rank, stock, name, id): reject tampered element types before they reach the query.
+    rank, stock, name, last_id = values
+    if not (_is_int(rank) and _is_int(stock) and isinstance(name, str) and _is_int(last_id)):
+        raise ValueError("Invalid cursor")
+    return values
+
+def build_items_to_sell_context(company, query='', after=None, page_size=ITEMS_TO_SELL_PAGE_SIZE):
+    """
+    Builds the template context for the "Items Needing Attention" modal
+    (running low or not selling), optionally filtered by a search query.
+    Results are keyset-paginated on (warning order, stock, name, id); `after` is the decoded
+    cursor of the previous page's last row.
+    """
+    today = timezone.now()
 
-    # Build a base queryset of all products for the company
-    products_queryset = Product.objects.filter(company=company)
+    # Build a base queryset of all products for the company, with the last sale joined in
+    # from ProductSalesVelocity and the 30-day units as a per-row subquery over that window.
+    units_last_30_days = sales_window_items(company, 30, now=today).filter(
+        product=OuterRef('pk')
+    ).values('product').annotate(units=Sum('quantity')).values('units')
+    products_queryset = Product.objects.filter(company=company).annotate(
+        last_sold=F('sales_velocity__last_sale_date'),
+        total_sales_last_30_days=Coalesce(Subquery(units_last_30_days), 0),
+    )
 
     # --- Filtering Logic ---
     low_stock_filter = Q(stock__lte=F('low_stock_input'))
     
-    # "Not selling" filter: has stock > 0 AND has not sold in the last 90 days
-    not_selling_filter = Q(stock__gt=0) & ~Q(id__in=sold_in_last_90_days_product_ids)
+    # "Not selling" filter: has stock > 0 AND has not sold in the last NOT_SELLING_DAYS.
+    # Read from ProductSalesVelocity.last_sale_date (a LEFT JOIN) instead of scanning Order_Items.
+    not_selling_filter = not_selling_q()
 
     # Combine the filters
     attention_needed_products = products_queryset.filter(low_stock_filter | not_selling_filter)
 
-    # Apply search query filter if 'q' parameter is present
-    query = request.GET.get('q', '')
+    # Apply search query filter if 'q' parameter is present.
+    # Backed by the trigram indexes on Product.name / Product.barcode.
     if query:
         attention_needed_products = attention_needed_products.filter(
             Q(name__icontains=query) |
             Q(barcode__icontains=query)
         )
 
-    # Annotate with the specific warning status for display
+    # Annotate with the specific warning status for display, and its sort rank
     final_products = attention_needed_products.annotate(
         warning_status=Case(
             When(low_stock_filter & not_selling_filter, then=Value('Running Low & Not Selling')),
@@ -205,36 +331,49 @@ def items_to_sell_modal_view(request):
             When(not_selling_filter, then=Value('Not Selling')),
             default=Value(''),
             output_field=CharField()
-        )
-    ).order_by(
-        Case(
-            When(warning_status='Running Low & Not Selling', then=0),
-            When(warning_status='Running Low', then=1),
-            When(warning_status='Not Selling', then=2),
-            default=3,
-            output_field=IntegerField(),
         ),
-        'stock',
-        'name'
-    )
-    
-    # Note: We can simplify this logic since all products here have a warning.
-    # The default case is technically unreachable if the filters are applied correctly.
+        warning_rank=Case(
+            When(low_stock_filter & not_selling_filter, then=Value(0)),
+            When(low_stock_filter, then=Value(1)),
+            When(not_selling_filter, then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+    ).select_related('category')
+
+    # --- Keyset Pagination: rows strictly after the previous page's last (rank, stock, name, id) ---
+    if after:
+        rank, stock, name, last_id = after
+        final_products = final_products.filter(
+            Q(warning_rank__gt=rank) |
+            Q(warning_rank=rank, stock__gt=stock) |
+            Q(warning_rank=rank, stock=stock, name__gt=name) |
+            Q(warning_rank=rank, stock=stock, name=name, id__gt=last_id)
+        )
+
+    # Fetch one extra row to know whether there is a next page.
+    page = list(final_products.order_by('warning_rank', 'stock', 'name', 'id')[:page_size + 1])
+    has_next = len(page) > page_size
+    page = page[:page_size]
+
+    next_cursor = None
+    if has_next:
+        last = page[-1]
+        next_cursor = encode_keyset_cursor([last.warning_rank, last.stock, last.name, last.id])
 
     context = {
-        'items': final_products,
+        'items': page,
+        'today': today,
         'search_query': query,
         'page_title': "Items Needing Attention",
+        'next_cursor': next_cursor,
+        'page_size': page_size,
+        'is_first_page': not after,
     }
-
-    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        html_content = render_to_string('items_attention_modal_content.html', context, request=request)
-        return HttpResponse(html_content)
-    else:
-        messages.info(request, "Items needing attention are typically viewed within the dashboard modal.")
-        return redirect(reverse('your_analytics_insights'))
+    return context
 
 @login_required
+@analytics_read_replica
 def profit_trends_view(request):
     """
     Displays historical monthly profit trends for the authenticated user's company.
@@ -282,6 +421,9 @@ def profit_trends_view(request):
 
 # ... (rest of your imports and other views)
 @login_required
+@profile_view('total_inventory_value')
+@cache_company_fragment('total_inventory_value', get_company_id=user_company_id)
+@analytics_read_replica
 def total_inventory_value_modal_view(request):
     company, user_profile, has_company = get_user_company(request)
 
@@ -289,65 +431,217 @@ def total_inventory_value_modal_view(request):
         messages.error(request, "Company not found for the current user. Please set up your company.")
         return redirect(reverse('your_analytics_insights')) # Ensure this matches your URL name
 
-    # Base queryset to filter products that are in stock and have a price
-    base_queryset = Product.objects.filter(
-        company=company,
-        stock__gt=0,
-        price__gt=0
-    )
-
-    # --- Overall Totals ---
-    total_retail_value = base_queryset.aggregate(
-        total=Sum(F('stock') * F('price'))
-    )['total'] or 0.0
+    try:
+        category_id = int(request.GET['category']) if request.GET.get('category') else None
+        supplier_id = int(request.GET['supplier']) if request.GET.get('supplier') else None
+    except ValueError:
+        return HttpResponse("<p class='text-danger text-center'>Invalid drill-down request.</p>", status=400)
 
-    total_cost_value = base_queryset.aggregate(
-        total=Sum(F('stock') * F('cost'))
-    )['total'] or 0.0
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return render(request, 'total_inventory_modal.html', build_total_inventory_value_context(
+            company, category_id=category_id, supplier_id=supplier_id
+        ))
+    else:
+        messages.warning(request, "This page is intended to be loaded via AJAX.")
+        return redirect(reverse('your_analytics_insights')) # Ensure this matches your URL name
 
-    # --- Combined Breakdown by Category ---
-    combined_category_breakdown = list(base_queryset.values('category__name').annotate(
-        retail_value=Sum(F('stock') * F('price')),
-        cost_value=Sum(F('stock') * F('cost'))
-    ).order_by('category__name'))
+def build_total_inventory_value_context(company, category_id=None, supplier_id=None):
+    """
+    Builds the template context for the "Total Inventory Value" modal
+    (retail and cost totals with category, supplier and category x supplier breakdowns),
+    optionally drilled down to one category and/or supplier.
+    All figures come from the company's inventory valuation cube (see inventory_valuation.py).
+    """
+    valuation = build_inventory_valuation(company, category_id=category_id, supplier_id=supplier_id)
 
-    # --- Combined Breakdown by Supplier ---
-    combined_supplier_breakdown = list(base_queryset.values('supplier__name').annotate(
-        retail_value=Sum(F('stock') * F('price')),
-        cost_value=Sum(F('stock') * F('cost'))
-    ).order_by('supplier__name'))
+    drilldown = {}
+    if category_id is not None:
+        drilldown['category'] = next(
+            (row['category__name'] for row in valuation['by_category'] if row['category_id'] == category_id), None
+        )
+    if supplier_id is not None:
+        drilldown['supplier'] = next(
+            (row['supplier__name'] for row in valuation['by_supplier'] if row['supplier_id'] == supplier_id), None
+        )
 
     context = {
-        'total_inventory_retail_value': total_retail_value,
-        'total_inventory_cost_value': total_cost_value,
-        'combined_category_breakdown': combined_category_breakdown,
-        'combined_supplier_breakdown': combined_supplier_breakdown,
+        'total_inventory_retail_value': valuation['totals']['retail_value'],
+        'total_inventory_cost_value': valuation['totals']['cost_value'],
+        'combined_category_breakdown': valuation['by_category'],
+        'combined_supplier_breakdown': valuation['by_supplier'],
+        'category_supplier_breakdown': valuation['cells'],
+        'drilldown': drilldown,
         'company': company,
     }
+    return context
+
+
+TRUNC_TO_BUCKET = {
+    TruncDay: bucketing.DAY,
+    TruncWeek: bucketing.WEEK,
+    TruncMonth: bucketing.MONTH,
+    TruncYear: bucketing.YEAR,
+}
+
+# Graph metric -> (label, type), for series not built by the metric branches of build_dashboard_graph_data.
+GRAPH_METRIC_DEFINITIONS = {
+    'sales': ("Total Sales Revenue", "currency"),
+    'profit': ("Total Profit", "currency"),
+    'gross_profit_margin': ("Gross Profit Margin", "percentage"),
+    'num_orders': ("Number of Orders", "integer"),
+}
+
+# --- Approximate all-time graph for large tenants ---
+# Closed months are read from the materialized CompanyMonthlyMetric table (one row per month)
+# and everything after the last materialized month from the daily rollup: the open month,
+# plus any closed month the job has not reached yet, which would otherwise show as 0. The
+# monthly table is as fresh as the last materialization run, so the response says which
+# materialized months changed since then.
+# CompanyMonthlyMetric has no order count, so 'num_orders' is always exact.
+
+APPROXIMATE_GRAPH_METRICS = {'sales', 'profit', 'gross_profit_margin'}
+GRAPH_PRECISIONS = {'auto', 'exact', 'approximate'}
+
+def approximate_graph_min_months():
+    # None disables the automatic switch; ?precision=approximate still opts in.
+    return getattr(settings, 'ANALYTICS_APPROXIMATE_GRAPH_MIN_MONTHS', None)
+
+def closed_month_graph_rows(company, metric, open_month_start):
+    """
+    Returns (rows, as_of): one {'period', 'value'} row per materialized month before
+    open_month_start, and the materialization watermark they are current as of.
+    """
+    rows = CompanyMonthlyMetric.objects.filter(company=company).filter(
+        Q(year__lt=open_month_start.year) | Q(year=open_month_start.year, month__lt=open_month_start.month)
+    ).order_by('year', 'month').values_list(
+        'year', 'month', 'total_monthly_revenue', 'net_monthly_profit', 'total_monthly_cogs',
+        'company__metrics_watermark__monthly_metrics_through'
+    )
 
-    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        return render(request, 'total_inventory_modal.html', context)
-    else:
-        messages.warning(request, "This page is intended to be loaded via AJAX.")
-        return redirect(reverse('your_analytics_insights')) # Ensure this matches your URL name
+    closed_rows = []
+    as_of = None
+    for year, month, revenue, profit, cogs, as_of in rows:
+        if metric == 'sales':
+            value = revenue
+        elif metric == 'profit':
+            value = profit
+        else:
+            value = ((revenue - cogs) / revenue) * 100 if revenue else 0
+        closed_rows.append({'period': date(year, month, 1), 'value': value})
+    return closed_rows, as_of
 
+def month_after(month_start):
+    return date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
 
-@login_required
-def get_dashboard_graph_data(request):
+def stale_closed_months(company, exact_from, as_of):
     """
-    Provides data for the main dashboard sales graph.
-    The data is based on the selected metric and time period,
-    aggregating from Order_Items and Orders models.
+    Months before exact_from whose daily rollup changed after the monthly table was
+    materialized, i.e. the bars an approximate graph may show with outdated values.
     """
-    metric = request.GET.get('metric', 'sales')
-    time_period = request.GET.get('time_period', 'month')
+    changed = CompanyDailyMetric.objects.filter(company=company, day__lt=exact_from)
+    if as_of is not None:
+        changed = changed.filter(last_updated__gt=as_of)
+    return [month.isoformat() for month in changed.dates('day', 'month')]
 
-    # Ensure the user is associated with a company
-    try:
-        company = request.user.profile.company
-    except (AttributeError, Companies.DoesNotExist):
-        return JsonResponse({'error': 'Company not found for user profile'}, status=400)
+# --- Period-over-period comparison (?compare=previous|yoy) ---
+# Both windows are read by the same daily-rollup query; each row is tagged with the window
+# it belongs to, bucketed like the current series and compared bucket by bucket.
+
+GRAPH_COMPARISONS = {'previous', 'yoy'}
+
+def comparison_window(time_period, compare, start_day, end_day):
+    """
+    Returns the (start, end) days of the baseline window for the current window
+    start_day..end_day. 'yoy' is the same window a year earlier; 'previous' is the
+    preceding calendar period for month/year-to-date views (clipped to the same
+    day of month/year) and the preceding window of equal length otherwise.
+    """
+    if compare == 'yoy' or time_period == 'year':
+        shift = relativedelta(years=1)
+    elif time_period == 'month':
+        shift = relativedelta(months=1)
+    else:
+        shift = (end_day - start_day) + timedelta(days=1)
+    return start_day - shift, end_day - shift
+
+def build_graph_comparison(periods, values, baseline_rows, baseline_start, baseline_end, bucket, compare, metric_type):
+    """
+    Gap-fills the baseline rows over the baseline window and aligns them with the current
+    series by position. Returns (comparison, baseline_periods, baseline_values, delta_pct);
+    the arrays are len(periods) long, NaN where the baseline window has no matching bucket
+    (e.g. a shorter previous month) and, for deltas, where the baseline is 0.
+    """
+    baseline_periods = bucketing.period_range(baseline_start, baseline_end, bucket)
+    baseline_filled = bucketing.fill_columns(
+        baseline_periods,
+        [item['period'] for item in baseline_rows],
+        {'value': [item['value'] for item in baseline_rows]},
+        bucket
+    )['value']
+    baseline_values = bucketing.align_by_position(baseline_filled, len(periods))
+
+    comparison = {
+        'mode': compare,
+        'baseline_start': baseline_start.isoformat(),
+        'baseline_end': baseline_end.isoformat(),
+        'totals': None,
+    }
+    if metric_type != 'percentage':
+        # Percentages (margins) don't add up across buckets, so only additive metrics get totals.
+        current_total = float(values.sum())
+        baseline_total = float(baseline_filled.sum())
+        delta_total = bucketing.percent_change(current_total, baseline_total)
+        comparison['totals'] = {
+            'current': current_total,
+            'baseline': baseline_total,
+            'delta_pct': bucketing.nan_to_none([delta_total])[0],
+        }
+    return comparison, baseline_periods, baseline_values, bucketing.percent_change(values, baseline_values)
 
+def graph_rows_from_rollup(daily_rows, metric, start_day, bucket):
+    """
+    Per-bucket {'period', 'value'} rows for a graph metric, summed from already loaded
+    daily rollup rows (see load_daily_rollup_rows) instead of a query.
+    """
+    daily_rows = [row for row in daily_rows if row[0] >= start_day]
+    if not daily_rows:
+        return []
+    periods = bucketing.period_range(daily_rows[0][0], daily_rows[-1][0], bucket)
+    sums = bucketing.fill_columns(
+        periods,
+        [row[0] for row in daily_rows],
+        {
+            'sales': [row[1] for row in daily_rows],
+            'profit': [row[2] for row in daily_rows],
+            'cogs': [row[3] for row in daily_rows],
+            'num_orders': [row[4] for row in daily_rows],
+        },
+        bucket
+    )
+    if metric == 'gross_profit_margin':
+        values = [
+            ((revenue - cogs) / revenue) * 100 if revenue > 0 else 0
+            for revenue, cogs in zip(sums['sales'].tolist(), sums['cogs'].tolist())
+        ]
+    else:
+        values = sums[metric].tolist()
+    return [{'period': period, 'value': value} for period, value in zip(periods.tolist(), values)]
+
+def build_dashboard_graph_data(company, metric, time_period, columnar=False, precision='auto', compare=None, daily_rows=None):
+    """
+    Builds the main dashboard graph series for a company.
+    Returns (response_data, status) so it can back both the graph endpoint
+    and the batched dashboard bootstrap endpoint.
+    With columnar=True the labels/data lists are replaced by the compact
+    start/bucket/count/columns form (see compact_payload.py).
+    For time_period='all', precision 'approximate' (or 'auto' for tenants with at least
+    ANALYTICS_APPROXIMATE_GRAPH_MIN_MONTHS closed months) serves closed months from the
+    monthly table and adds an 'approximation' block to the response.
+    With compare='previous' or 'yoy' the response also carries the baseline window's
+    series and per-bucket % deltas, aligned with the current series (not for 'all').
+    `daily_rows` (see load_daily_rollup_rows) makes it derive the series from those rows
+    instead of querying; always exact, and not combined with `compare`.
+    """
     # Dictionary to hold the final data for JSON response
     response_data = {
         'labels': [],
@@ -359,16 +653,15 @@ def get_dashboard_graph_data(request):
 
     today = timezone.now()
 
-    # Define the base queryset for Order_Items, filtered by company and paid status
-    base_order_items_query = Order_Items.objects.filter(
-        order__company=company,
-        order__status='paid'
-    )
+    # Daily history comes from the pre-aggregated CompanyDailyMetric rollup
+    # (one row per company per day with paid sales), not from raw Order_Items.
+    base_daily_metrics_query = CompanyDailyMetric.objects.filter(company=company)
 
     # --- Step 1: Determine Date Range and Truncation Level ---
     trunc_level = TruncDay
     title_suffix = ""
     start_date = None
+    closed_rows = []
 
     if time_period == 'week':
         start_date = today - timedelta(days=6)
@@ -387,52 +680,91 @@ def get_dashboard_graph_data(request):
         trunc_level = TruncMonth
         title_suffix = f"for {today.year}"
     elif time_period == 'all':
-        first_sale = base_order_items_query.order_by('order__order_date').first()
-        if first_sale:
-            start_date = first_sale.order.order_date
+        min_months = approximate_graph_min_months()
+        if daily_rows is None and metric in APPROXIMATE_GRAPH_METRICS and (
+            precision == 'approximate' or (precision == 'auto' and min_months is not None)
+        ):
+            open_month_start = timezone.localdate(today).replace(day=1)
+            closed_rows, closed_rows_as_of = closed_month_graph_rows(company, metric, open_month_start)
+            if precision == 'auto' and len(closed_rows) < min_months:
+                closed_rows = []
+
+        if daily_rows is not None:
+            first_day = daily_rows[0][0] if daily_rows else None
+        elif closed_rows:
+            # The first materialized month replaces the Min('day') lookup. Months after the last
+            # materialized one (at least the open month) are read exactly from the daily rollup.
+            first_day = closed_rows[0]['period']
+            exact_from = month_after(closed_rows[-1]['period'])
+            base_daily_metrics_query = base_daily_metrics_query.filter(day__gte=exact_from)
         else:
-            return JsonResponse(response_data)
+            first_day = base_daily_metrics_query.filter(total_daily_orders__gt=0).aggregate(first_day=Min('day'))['first_day']
+        if first_day:
+            start_date = datetime(first_day.year, first_day.month, first_day.day, tzinfo=timezone.get_current_timezone())
+        elif columnar:
+            del response_data['labels'], response_data['data']
+            response_data.update(columnar_columns([], bucketing.MONTH, {'value': []}))
+            return response_data, 200
+        else:
+            return response_data, 200
         trunc_level = TruncMonth
         title_suffix = "Overall"
     else:
-        return JsonResponse({'error': 'Invalid time_period'}, status=400)
-
-    # Filter the query by the determined date range
-    if start_date:
-        base_order_items_query = base_order_items_query.filter(order__order_date__gte=start_date)
+        return {'error': 'Invalid time_period'}, 400
+
+    if compare:
+        if time_period == 'all':
+            return {'error': 'Comparison is not available for time_period=all'}, 400
+        current_start = timezone.localdate(start_date)
+        baseline_start, baseline_end = comparison_window(time_period, compare, current_start, timezone.localdate(today))
+
+    # Filter the query by the determined date range (plus the baseline window when comparing)
+    if compare:
+        base_daily_metrics_query = base_daily_metrics_query.filter(
+            Q(day__gte=current_start) | Q(day__gte=baseline_start, day__lte=baseline_end)
+        )
+    elif start_date:
+        base_daily_metrics_query = base_daily_metrics_query.filter(day__gte=timezone.localdate(start_date))
 
     # --- Step 2: Aggregate Data Based on Metric ---
+    # Roll the daily rows up to the requested bucket size (day, week or month).
+    period_rows = base_daily_metrics_query.annotate(period=trunc_level('day'))
+    if compare:
+        # Group by window too, so a week that straddles both windows isn't merged into one bucket.
+        period_rows = period_rows.annotate(
+            series=Case(When(day__gte=current_start, then=Value('current')), default=Value('baseline'))
+        ).values('series', 'period')
+    else:
+        period_rows = period_rows.values('period')
+
     aggregated_data = []
     metric_label = ""
     metric_type = "currency"
 
-    if metric == 'sales':
-        aggregated_data = base_order_items_query.annotate(
-            period=trunc_level('order__order_date')
-        ).values('period').annotate(
-            value=Sum(F('quantity') * F('price'))
+    if daily_rows is not None:
+        if metric not in GRAPH_METRIC_DEFINITIONS:
+            return {'error': 'Invalid metric'}, 400
+        metric_label, metric_type = GRAPH_METRIC_DEFINITIONS[metric]
+        aggregated_data = graph_rows_from_rollup(
+            daily_rows, metric, timezone.localdate(start_date), TRUNC_TO_BUCKET[trunc_level]
+        )
+
+    elif metric == 'sales':
+        aggregated_data = period_rows.annotate(
+            value=Sum('total_daily_revenue')
         ).order_by('period')
         metric_label = "Total Sales Revenue"
 
     elif metric == 'profit':
-        aggregated_data = base_order_items_query.annotate(
-            period=trunc_level('order__order_date')
-        ).values('period').annotate(
-            value=Sum(
-                ExpressionWrapper(
-                    F('quantity') * (F('price') - F('product__cost')),
-                    output_field=DecimalField()
-                )
-            )
+        aggregated_data = period_rows.annotate(
+            value=Sum('net_daily_profit')
         ).order_by('period')
         metric_label = "Total Profit"
 
     elif metric == 'gross_profit_margin':
-        aggregated_data = base_order_items_query.annotate(
-            period=trunc_level('order__order_date')
-        ).values('period').annotate(
-            total_revenue=Sum(F('quantity') * F('price')),
-            total_cogs=Sum(F('quantity') * F('product__cost'))
+        aggregated_data = period_rows.annotate(
+            total_revenue=Sum('total_daily_revenue'),
+            total_cogs=Sum('total_daily_cogs')
         ).order_by('period')
 
         processed_data = []
@@ -443,64 +775,111 @@ def get_dashboard_graph_data(request):
                 margin = ((revenue - cogs) / revenue) * 100
             else:
                 margin = 0
-            processed_data.append({'period': item['period'], 'value': margin})
+            processed_data.append({'period': item['period'], 'value': margin, 'series': item.get('series')})
         aggregated_data = processed_data
 
         metric_label = "Gross Profit Margin"
         metric_type = "percentage"
 
     elif metric == 'num_orders':
-        # This requires a separate query on the Orders model
-        base_orders_query = Orders.objects.filter(
-            company=company,
-            status='paid'
-        )
-        if start_date:
-            base_orders_query = base_orders_query.filter(order_date__gte=start_date)
-
-        aggregated_data = base_orders_query.annotate(
-            period=trunc_level('order_date')
-        ).values('period').annotate(
-            value=Count('id')
+        aggregated_data = period_rows.annotate(
+            value=Sum('total_daily_orders')
         ).order_by('period')
         metric_label = "Number of Orders"
         metric_type = "integer"
 
     else:
-        return JsonResponse({'error': 'Invalid metric'}, status=400)
+        return {'error': 'Invalid metric'}, 400
+
+    if closed_rows:
+        aggregated_data = closed_rows + list(aggregated_data)
+        response_data['approximation'] = {
+            'closed_periods_source': 'monthly_rollup',
+            'closed_periods_as_of': closed_rows_as_of.isoformat() if closed_rows_as_of else None,
+            'exact_from': exact_from.isoformat(),
+            # Materialized months that may differ from their exact value (changed since closed_periods_as_of).
+            'stale_periods': stale_closed_months(company, exact_from, closed_rows_as_of),
+        }
 
     # --- Step 3: Generate Labels and Fill Data (Ensuring Continuity) ---
-    data_map = {item['period']: float(item['value'] if item['value'] is not None else 0) for item in aggregated_data}
-
-    current_iter_date = start_date
-    while current_iter_date <= today:
-        period_key = None
-        if trunc_level == TruncDay:
-            period_key = current_iter_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            response_data['labels'].append(current_iter_date.strftime('%b %d'))
-            current_iter_date += timedelta(days=1)
-        elif trunc_level == TruncWeek:
-            period_key = current_iter_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            response_data['labels'].append(f"Wk {current_iter_date.isocalendar().week} ({current_iter_date.strftime('%b %d')})")
-            current_iter_date += timedelta(days=7)
-        elif trunc_level == TruncMonth:
-            period_key = current_iter_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            response_data['labels'].append(current_iter_date.strftime('%b %Y'))
-            current_iter_date += relativedelta(months=1)
-        elif trunc_level == TruncYear:
-            period_key = current_iter_date.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            response_data['labels'].append(current_iter_date.strftime('%Y'))
-            current_iter_date += relativedelta(years=1)
-
-        response_data['data'].append(data_map.get(period_key, 0.0))
+    # Period keys, labels and gap filling are done in bulk by the shared bucketing module.
+    bucket = TRUNC_TO_BUCKET[trunc_level]
+    periods = bucketing.period_range(timezone.localdate(start_date), timezone.localdate(today), bucket)
+    aggregated_data = list(aggregated_data)
+    if compare:
+        baseline_rows = [item for item in aggregated_data if item['series'] == 'baseline']
+        aggregated_data = [item for item in aggregated_data if item['series'] == 'current']
+    values = bucketing.fill_columns(
+        periods,
+        [item['period'] for item in aggregated_data],
+        {'value': [item['value'] for item in aggregated_data]},
+        bucket
+    )['value']
+
+    columns = {'value': values}
+    if compare:
+        comparison, baseline_periods, baseline_values, delta_pct = build_graph_comparison(
+            periods, values, baseline_rows, baseline_start, baseline_end, bucket, compare, metric_type
+        )
+        response_data['comparison'] = comparison
+        columns['baseline'] = bucketing.nan_to_none(baseline_values)
+        columns['delta_pct'] = bucketing.nan_to_none(delta_pct)
+
+    if columnar:
+        # Labels are derived on the client from start/bucket/count.
+        del response_data['labels'], response_data['data']
+        response_data.update(columnar_columns(periods, bucket, columns))
+        if compare:
+            response_data['comparison']['baseline_period_start'] = str(baseline_periods[0]) if len(baseline_periods) else None
+    else:
+        response_data['labels'] = bucketing.period_labels(periods, bucket)
+        response_data['data'] = values.tolist()
+        if compare:
+            baseline_labels = bucketing.period_labels(baseline_periods[:len(periods)], bucket)
+            response_data['baseline_labels'] = baseline_labels + [None] * (len(periods) - len(baseline_labels))
+            response_data['baseline_data'] = columns['baseline']
+            response_data['delta_pct'] = columns['delta_pct']
 
     response_data['metric_label'] = metric_label
     response_data['title_suffix'] = title_suffix
     response_data['metric_type'] = metric_type
 
-    return JsonResponse(response_data)
+    return response_data, 200
+
+
+
+@login_required
+@profile_view('graph')
+@cache_company_json('graph', get_company_id=user_company_id)
+@analytics_read_replica
+def get_dashboard_graph_data(request):
+    """
+    Provides data for the main dashboard sales graph.
+    The data is based on the selected metric and time period,
+    aggregating from the CompanyDailyMetric daily rollup.
+    ?compare=previous|yoy adds the aligned baseline series and % deltas.
+    """
+    metric = request.GET.get('metric', 'sales')
+    time_period = request.GET.get('time_period', 'month')
+
+    # Ensure the user is associated with a company
+    company, user_profile, has_company = get_user_company(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found for user profile'}, status=400)
+
+    precision = request.GET.get('precision', 'auto')
+    if precision not in GRAPH_PRECISIONS:
+        return JsonResponse({'error': 'Invalid precision'}, status=400)
 
+    compare = request.GET.get('compare') or None
+    if compare is not None and compare not in GRAPH_COMPARISONS:
+        return JsonResponse({'error': 'Invalid compare'}, status=400)
 
+    columnar = wants_columnar(request)
+    response_data, status = build_dashboard_graph_data(company, metric, time_period, columnar, precision, compare)
+    return payload_response(response_data, columnar, status=status)
+
+@static_fragment
 def get_graph_customization_modal_content(request):
     """
     Renders the HTML content for the graph customization modal.
@@ -510,171 +889,229 @@ def get_graph_customization_modal_content(request):
 
 # --- Historical Trends API for Dashboard (Last 10 Months) ---
 
-@login_required
-def get_sales_trends_api_data(request, company_id):
+def fill_monthly_trend_columns(start, end, row_periods, columns, metrics_order):
     """
-    Provides data for the dashboard's 10-month summary table,
-    displaying columns based on 'metrics' GET parameter.
-    If no sales history, displays current month with zeros.
+    Gap-fills monthly metric columns between start and end (inclusive).
+    Returns (periods, series): the month range and a list of (metric, values array) in `metrics_order`.
+    Metrics in `metrics_order` without a matching column are left out.
     """
-    # (Permission check commented out as per your request)
+    periods = bucketing.period_range(start, end, bucketing.MONTH)
+    selected = {m: columns[m] for m in metrics_order if m in columns}
+    filled = bucketing.fill_columns(periods, row_periods, selected, bucketing.MONTH)
 
-    now_aware = timezone.now()
-    today_start_of_month_aware = now_aware.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    default_start_date_aware = (today_start_of_month_aware - relativedelta(months=9))
+    series = []
+    for metric in metrics_order:
+        if metric in filled:
+            series.append((metric, filled[metric].astype('int64') if metric == 'quantity_sold' else filled[metric]))
+    return periods, series
 
-    first_metric_entry = CompanyMonthlyMetric.objects.filter(
-        company_id=company_id
-    ).order_by('year', 'month').first()
+def build_monthly_trend_rows(start, end, row_periods, columns, metrics_order):
+    """
+    Shapes gap-filled monthly metric columns into the trend table rows used by both
+    trend APIs: {'period': 'Jan 2025', <metric>: value, ...}.
+    """
+    periods, series = fill_monthly_trend_columns(start, end, row_periods, columns, metrics_order)
+    series = [(metric, values.tolist()) for metric, values in series]
+
+    return [
+        {'period': label, **{metric: values[i] for metric, values in series}}
+        for i, label in enumerate(bucketing.period_labels(periods, bucketing.MONTH))
+    ]
+
+def build_monthly_trend_columns(start, end, row_periods, columns, metrics_order):
+    """
+    Columnar counterpart of build_monthly_trend_rows (see compact_payload.py).
+    """
+    periods, series = fill_monthly_trend_columns(start, end, row_periods, columns, metrics_order)
+    return columnar_columns(periods, bucketing.MONTH, dict(series))
+
+def sales_trends_window_start():
+    """
+    First month of the 10-month summary table.
+    """
+    today_start_of_month_aware = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return (today_start_of_month_aware - relativedelta(months=9)).date()
 
-    actual_query_start_year = default_start_date_aware.year
-    actual_query_start_month = default_start_date_aware.month
+def sales_trends_rows_from_rollup(daily_rows):
+    """
+    The sales trends inputs (window start, whether there is earlier history, and
+    (year, month, revenue, net_profit, quantity_sold, cogs) rows) summed from already loaded
+    daily rollup rows, instead of querying CompanyMonthlyMetric.
+    """
+    window_start = sales_trends_window_start()
+    months = {}
+    has_earlier_metrics = False
+    for day, revenue, profit, cogs, orders, units in daily_rows:
+        if day < window_start:
+            has_earlier_metrics = True
+            continue
+        totals = months.setdefault((day.year, day.month), [Decimal('0.00'), Decimal('0.00'), 0, Decimal('0.00')])
+        totals[0] += revenue
+        totals[1] += profit
+        totals[2] += units
+        totals[3] += cogs
+    monthly_rows = [(year, month, *totals) for (year, month), totals in sorted(months.items())]
+    return window_start, has_earlier_metrics, monthly_rows
+
+def sales_trends_queries(company_id):
+    """
+    The two independent queries behind the dashboard's 10-month summary table:
+    whether the company has metrics before the window, and its metric rows inside the window.
+    Returns (window_start, earlier_metrics_queryset, monthly_rows_queryset).
+    """
+    window_start = sales_trends_window_start()
+
+    company_metrics = CompanyMonthlyMetric.objects.filter(company_id=company_id)
+    in_window = Q(year=window_start.year, month__gte=window_start.month) | Q(year__gt=window_start.year)
+
+    monthly_rows = company_metrics.filter(in_window).order_by('year', 'month').values_list(
+        'year', 'month', 'total_monthly_revenue', 'net_monthly_profit', 'total_products_sold', 'total_monthly_cogs'
+    )
+    return window_start, company_metrics.exclude(in_window), monthly_rows
 
-    if first_metric_entry:
-        first_entry_date = datetime(first_metric_entry.year, first_metric_entry.month, 1, tzinfo=timezone.get_current_timezone())
-        if first_entry_date > default_start_date_aware:
-            actual_query_start_year = first_metric_entry.year
-            actual_query_start_month = first_metric_entry.month
+def build_sales_trends_data(company_id, requested_metrics_str, columnar=False):
+    """
+    Builds the dashboard's 10-month summary table data for a company.
+    Shared by the sales trends API and the dashboard bootstrap endpoint.
+    """
+    window_start, earlier_metrics, monthly_rows = sales_trends_queries(company_id)
+    return assemble_sales_trends_data(
+        window_start, earlier_metrics.exists(), list(monthly_rows), requested_metrics_str, columnar
+    )
+
+def assemble_sales_trends_data(window_start, has_earlier_metrics, monthly_rows, requested_metrics_str, columnar=False):
+    """
+    Shapes the sales trends query results into the API's JSON contract (rows, or the columnar form).
+    The table starts at the window start if the company has older history, otherwise at its
+    first month of metrics (or the current month when there is no history at all).
+    """
+    current_month = timezone.now().date().replace(day=1)
+    if has_earlier_metrics:
+        start_month = window_start
+    elif monthly_rows:
+        start_month = date(monthly_rows[0][0], monthly_rows[0][1], 1)
     else:
-        actual_query_start_year = today_start_of_month_aware.year
-        actual_query_start_month = today_start_of_month_aware.month
-        
-    sales_data = CompanyMonthlyMetric.objects.filter(
-        company_id=company_id,
-        year__gte=actual_query_start_year,
-    ).filter(
-        Q(year=actual_query_start_year, month__gte=actual_query_start_month) | 
-        Q(year__gt=actual_query_start_year)
-    ).order_by('year', 'month')
-
-    all_months = []
-    current_month_iter_aware = datetime(actual_query_start_year, actual_query_start_month, 1, tzinfo=timezone.get_current_timezone())
-    
-    while current_month_iter_aware <= today_start_of_month_aware:
-        all_months.append(current_month_iter_aware.date())
-        current_month_iter_aware += relativedelta(months=1)
-
-    sales_dict = {}
-    for s in sales_data:
-        month_date_key = date(s.year, s.month, 1)
-        sales_dict[month_date_key] = {
-            'revenue': s.total_monthly_revenue, # Changed to 'revenue' for consistency with metrics_order
-            'net_profit': s.net_monthly_profit, # Changed to 'net_profit'
-            'quantity_sold': s.total_products_sold,
-            'cogs': s.total_monthly_cogs,
-        }
+        start_month = current_month
 
-    trend_data = []
-    
     # --- CHANGE START ---
     # Get selected metrics from GET parameter. Default to all if not provided.
-    requested_metrics_str = request.GET.get('metrics', 'revenue,net_profit,quantity_sold,cogs')
     metrics_order = [m.strip() for m in requested_metrics_str.split(',') if m.strip()]
     # Ensure a default if the parameter is empty or invalid
     if not metrics_order:
         metrics_order = ['revenue', 'net_profit', 'quantity_sold', 'cogs']
     # --- CHANGE END ---
 
-    for month_dt in all_months:
-        month_key = month_dt 
-        month_year_str = month_key.strftime('%b %Y')
-        row_data = {'period': month_year_str}
+    # Map the CompanyMonthlyMetric fields to the simpler keys used in `metrics_order`
+    build_trend_data = build_monthly_trend_columns if columnar else build_monthly_trend_rows
+    trend_data = build_trend_data(
+        start_month,
+        current_month,
+        [date(row[0], row[1], 1) for row in monthly_rows],
+        {
+            'revenue': [row[2] for row in monthly_rows],
+            'net_profit': [row[3] for row in monthly_rows],
+            'quantity_sold': [row[4] for row in monthly_rows],
+            'cogs': [row[5] for row in monthly_rows],
+        },
+        metrics_order
+    )
 
-        entry = sales_dict.get(month_key, {}) 
+    if columnar:
+        return {**trend_data, 'metrics_order': metrics_order}
+    return {'data': trend_data, 'metrics_order': metrics_order}
 
-        for metric in metrics_order:
-            # Ensure the key in `entry` matches the string in `metrics_order`
-            # For CompanyMonthlyMetric, the fields are `total_monthly_revenue`, `net_monthly_profit`, etc.
-            # We need to map these to the simpler 'revenue', 'net_profit' keys used in `metrics_order`
-            if metric == 'revenue':
-                row_data[metric] = float(entry.get('revenue', 0.0))
-            elif metric == 'net_profit':
-                row_data[metric] = float(entry.get('net_profit', 0.0))
-            elif metric == 'quantity_sold':
-                row_data[metric] = int(entry.get('quantity_sold', 0))
-            elif metric == 'cogs':
-                row_data[metric] = float(entry.get('cogs', 0.0))
 
-        trend_data.append(row_data)
+@login_required
+@profile_view('sales_trends')
+@cache_company_json('sales_trends', get_company_id=member_url_company_id)
+@analytics_read_replica
+def get_sales_trends_api_data(request, company_id):
+    """
+    Provides data for the dashboard's 10-month summary table,
+    displaying columns based on 'metrics' GET parameter.
+    If no sales history, displays current month with zeros.
+    """
+    permission_error = company_access_error(request, company_id)
+    if permission_error is not None:
+        return permission_error
 
-    return JsonResponse({'data': trend_data, 'metrics_order': metrics_order})
+    requested_metrics_str = request.GET.get('metrics', 'revenue,net_profit,quantity_sold,cogs')
+    columnar = wants_columnar(request)
+    return payload_response(build_sales_trends_data(company_id, requested_metrics_str, columnar), columnar)
 
 
 # --- All Monthly Sales Trends API (Historical) ---
 @login_required
-@login_required
-@login_required
+@profile_view('all_monthly_sales_trends')
+@cache_company_json('all_monthly_sales_trends', get_company_id=member_url_company_id)
+@analytics_read_replica
 def get_all_monthly_sales_trends_api_data(request, company_id):
     """
     Provides all historical data for the company for the modal.
     If no sales history, displays current month with zeros.
     """
     
-    # New, more robust permission check
-    # Safely retrieve the user's UserProfile object or raise a 404
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    permission_error = company_access_error(request, company_id)
+    if permission_error is not None:
+        return permission_error
 
-    # Then, attempt to find the company and check the employee relationship
-    try:
-        company = Companies.objects.get(id=company_id)
-        if not company.employees.filter(id=user_profile.id).exists():
-            return JsonResponse({'error': 'Unauthorized access to company data.'}, status=403)
-    except Companies.DoesNotExist:
-        return JsonResponse({'error': 'Company not found.'}, status=403)
-    
     # --- Your original view logic continues here ---
     metrics_param = request.GET.get('metrics', 'revenue')
 
-    # Find the earliest and latest sale dates for the company
-    first_sale = Order_Items.objects.filter(
-        order__company_id=company_id
-    ).order_by('order__order_date').first()
+    columnar = wants_columnar(request)
 
-    last_sale = Order_Items.objects.filter(
-        order__company_id=company_id
-    ).order_by('order__order_date').last()
+    monthly_rows, sale_range, sale_range_aggregates = all_monthly_trends_queries(company_id)
+    return payload_response(assemble_all_monthly_trends_data(
+        list(monthly_rows),
+        sale_range.aggregate(**sale_range_aggregates),
+        metrics_param,
+        columnar
+    ), columnar)
 
-    all_months = []
-    query_start_date_aware = None 
+def company_access_error(request, company_id):
+    """
+    Returns an error JsonResponse if the user is not an employee of company_id, otherwise None.
+    Membership comes from the per-request tenant context (no queries on a session hit).
+    """
+    if not get_tenant_context(request).is_member(company_id):
+        return JsonResponse({'error': 'Unauthorized access to company data.'}, status=403)
+    return None
 
-    now_aware = timezone.now()
-    today_start_of_month_aware = now_aware.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+def all_monthly_trends_queries(company_id):
+    """
+    The two independent queries behind the all-history trends modal, both over pre-aggregated tables:
+    the materialized CompanyMonthlyMetric rows (one per month, so O(months) rather than O(line items)),
+    and (queryset, aggregate kwargs) for the first and last day with paid sales from the daily rollup.
+    """
+    # --- Served from the materialized CompanyMonthlyMetric table (see metrics_materialization.py) ---
+    monthly_rows = CompanyMonthlyMetric.objects.filter(
+        company_id=company_id
+    ).order_by('year', 'month').values_list(
+        'year', 'month', 'total_monthly_revenue', 'net_monthly_profit', 'total_products_sold', 'total_monthly_cogs'
+    )
 
-    if first_sale and last_sale:
-        current_month_iter_aware = first_sale.order.order_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        last_month_in_history_aware = last_sale.order.order_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    sale_range = CompanyDailyMetric.objects.filter(company_id=company_id, total_daily_orders__gt=0)
+    return monthly_rows, sale_range, {'first_day': Min('day'), 'last_day': Max('day')}
 
-        loop_end_month_aware = max(today_start_of_month_aware, last_month_in_history_aware)
+def assemble_all_monthly_trends_data(monthly_rows, sale_range, metrics_param, columnar=False):
+    """
+    Shapes the all-history trends query results into the API's JSON contract (rows, or the columnar form).
+    If no sales history, displays current month with zeros.
+    """
+    first_sale_date = sale_range['first_day']
+    last_sale_date = sale_range['last_day']
 
-        query_start_date_aware = current_month_iter_aware
-        
-        while current_month_iter_aware <= loop_end_month_aware:
-            all_months.append(current_month_iter_aware.date())
-            current_month_iter_aware += relativedelta(months=1)
+    now_aware = timezone.now()
+    today_start_of_month_aware = now_aware.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    if monthly_rows:
+        query_start_month = date(monthly_rows[0][0], monthly_rows[0][1], 1)
+        loop_end_month = max(today_start_of_month_aware.date(), date(monthly_rows[-1][0], monthly_rows[-1][1], 1))
     else:
         # --- NEW USER / NO SALES DATA YET: Display only the current month ---
-        all_months.append(today_start_of_month_aware.date())
-        # Query will effectively fetch data for this month if any, but will be empty.
-        query_start_date_aware = today_start_of_month_aware 
-
-    # --- Query to get sales data ---
-    sales_data_query = Order_Items.objects.filter(
-        order__company_id=company_id,
-        order__order_date__gte=query_start_date_aware
-    ).annotate(
-        period=TruncMonth('order__order_date'),
-        total_revenue=Sum('price'),
-        total_net_profit=Sum('net_profit'),
-        total_quantity_sold=Sum('quantity'),
-        total_cogs=Sum('cogs')
-    ).values('period', 'total_revenue', 'total_net_profit', 'total_quantity_sold', 'total_cogs').order_by('period')
+        query_start_month = today_start_of_month_aware.date()
+        loop_end_month = today_start_of_month_aware.date()
 
-    # --- Map sales data to months ---
-    sales_dict = {s['period'].date(): s for s in sales_data_query}
-
-    trend_data = []
     metrics_order = []
 
     requested_metrics = metrics_param.split(',')
@@ -688,27 +1125,32 @@ def get_all_monthly_sales_trends_api_data(request, company_id):
     if 'cogs' in requested_metrics or 'all' in requested_metrics:
         metrics_order.append('cogs')
 
-    for month_dt in all_months:
-        month_key = month_dt
-        month_year_str = month_key.strftime('%b %Y')
-        row_data = {'period': month_year_str}
-
-        entry = sales_dict.get(month_key, {})
-
-        for metric in metrics_order:
-            if metric == 'revenue':
-                row_data[metric] = float(entry.get('total_revenue', 0.0))
-            elif metric == 'net_profit':
-                row_data[metric] = float(entry.get('total_net_profit', 0.0))
-            elif metric == 'quantity_sold':
-                row_data[metric] = int(entry.get('total_quantity_sold', 0))
-            elif metric == 'cogs':
-                row_data[metric] = float(entry.get('total_cogs', 0.0))
+    # --- Map sales data to months ---
+    build_trend_data = build_monthly_trend_columns if columnar else build_monthly_trend_rows
+    trend_data = build_trend_data(
+        query_start_month,
+        loop_end_month,
+        [date(row[0], row[1], 1) for row in monthly_rows],
+        {
+            'revenue': [row[2] for row in monthly_rows],
+            'net_profit': [row[3] for row in monthly_rows],
+            'quantity_sold': [row[4] for row in monthly_rows],
+            'cogs': [row[5] for row in monthly_rows],
+        },
+        metrics_order
+    )
 
-        trend_data.append(row_data)
+    metadata = {
+        'metrics_order': metrics_order,
+        'first_sale_date': first_sale_date.isoformat() if first_sale_date else None,
+        'last_sale_date': last_sale_date.isoformat() if last_sale_date else None,
+    }
+    if columnar:
+        return {**trend_data, **metadata}
+    return {'data': trend_data, **metadata}
 
-    return JsonResponse({'data': trend_data, 'metrics_order': metrics_order})
 @login_required
+@static_fragment
 def historical_trends_modal_content(request):
     """
     This view renders the updated modal content file,
@@ -733,28 +1175,630 @@ def historical_trends_modal_content(request):
     return render(request, 'historical_trends_modal.html', context)
 
 
+# --- Dashboard Bootstrap API (first paint in one round trip) ---
 
-def get_user_company(request):
+DASHBOARD_BOOTSTRAP_PANELS = [
+    'kpi',
+    'graph',
+    'sales_trends',
+    'graph_customization',
+    'items_selling_well',
+    'total_inventory_value',
+    'items_to_sell',
+]
+DEFAULT_BOOTSTRAP_PANELS = ['kpi', 'graph', 'sales_trends']
+# Panels derived from the shared read of the daily rollup.
+ROLLUP_BOOTSTRAP_PANELS = {'kpi', 'graph', 'sales_trends'}
+
+def load_daily_rollup_rows(company):
     """
-    Retrieves the authenticated user's profile and associated company.
-    Returns (company_object, user_profile_object, has_company_linked_boolean).
+    Every day with paid sales for the company, from the CompanyDailyMetric rollup, as
+    (day, revenue, net_profit, cogs, orders, units) tuples ordered by day. A single query of
+    at most one row per day; the bootstrap endpoint derives the KPI sales totals, the graph
+    and the sales trends table from it instead of running each panel's own queries.
     """
-    if not request.user.is_authenticated:
-        return None, None, False
+    return list(CompanyDailyMetric.objects.filter(
+        company=company, total_daily_orders__gt=0
+    ).order_by('day').values_list(
+        'day', 'total_daily_revenue', 'net_daily_profit', 'total_daily_cogs', 'total_daily_orders', 'total_products_sold'
+    ))
 
-    try:
-        # CORRECTED: Access profile via 'profile' related_name
-        profile = request.user.profile
-        if profile.company:
-            return profile.company, profile, True
+def kpi_sales_totals_from_rollup(daily_rows):
+    """
+    The sales side of the KPI snapshot (see kpi_aggregate_queries) summed from daily rollup rows.
+    """
+    return {
+        'total_revenue': sum((row[1] for row in daily_rows), Decimal('0.00')),
+        'total_profit': sum((row[2] for row in daily_rows), Decimal('0.00')),
+        'total_cogs': sum((row[3] for row in daily_rows), Decimal('0.00')),
+        'total_orders': sum(row[4] for row in daily_rows),
+    }
+
+@login_required
+@profile_view('bootstrap')
+@cache_company_json('bootstrap', get_company_id=user_company_id)
+@analytics_read_replica
+def get_dashboard_bootstrap_data(request):
+    """
+    Batched API endpoint for the analytics page.
+    Resolves the user's company once and returns every requested panel in a single JSON payload,
+    replacing the separate KPI, graph, trends and modal requests made on first paint.
+
+    GET parameters:
+        panels       comma-separated subset of DASHBOARD_BOOTSTRAP_PANELS (default: kpi,graph,sales_trends)
+        metric       graph metric (default: 'sales')
+        time_period  graph time period (default: 'month')
+        metrics      sales trends columns (default: all)
+        q            search query for the items_to_sell panel
+    HTML panels are returned as rendered strings, JSON panels with the same shape as their own endpoints.
+    """
+    company, user_profile, has_company = get_user_company(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found.'}, status=403)
+
+    requested_panels = [p.strip() for p in request.GET.get('panels', '').split(',') if p.strip()]
+    if not requested_panels:
+        requested_panels = DEFAULT_BOOTSTRAP_PANELS
+
+    unknown_panels = [p for p in requested_panels if p not in DASHBOARD_BOOTSTRAP_PANELS]
+    if unknown_panels:
+        return JsonResponse({'error': f"Invalid panels: {', '.join(unknown_panels)}"}, status=400)
+
+    panels = {}
+    errors = {}
+
+    # The KPI sales totals, the graph and the trends table share one read of the daily rollup.
+    daily_rows = None
+    if ROLLUP_BOOTSTRAP_PANELS.intersection(requested_panels):
+        daily_rows = load_daily_rollup_rows(company)
+
+    if 'kpi' in requested_panels:
+        panels['kpi'] = serialize_kpi_snapshot(
+            compute_kpi_snapshot(company, sales_totals=kpi_sales_totals_from_rollup(daily_rows))
+        )
+
+    if 'graph' in requested_panels:
+        graph_data, status = build_dashboard_graph_data(
+            company,
+            request.GET.get('metric', 'sales'),
+            request.GET.get('time_period', 'month'),
+            daily_rows=daily_rows,
+        )
+        if status == 200:
+            panels['graph'] = graph_data
         else:
-            return None, profile, False # Return profile even if no company linked
-    except UserProfile.DoesNotExist:
-        # This can happen if a User exists but no UserProfile was created for them.
-        # The post_save signal should prevent this, but it's good for robustness.
-        return None, None, False
-    except AttributeError:
-        # This can happen if 'profile' attribute is not yet attached (e.g., during initial setup)
-        # or if request.user is an AnonymousUser.
+            errors['graph'] = graph_data['error']
+
+    if 'sales_trends' in requested_panels:
+        window_start, has_earlier_metrics, monthly_rows = sales_trends_rows_from_rollup(daily_rows)
+        panels['sales_trends'] = assemble_sales_trends_data(
+            window_start,
+            has_earlier_metrics,
+            monthly_rows,
+            request.GET.get('metrics', 'revenue,net_profit,quantity_sold,cogs'),
+        )
+
+    if 'graph_customization' in requested_panels:
+        panels['graph_customization'] = render_to_string('graph_customization_modal_content.html', {}, request=request)
+
+    if 'items_selling_well' in requested_panels:
+        panels['items_selling_well'] = render_to_string(
+            'items_selling_well_modal_content.html', build_items_selling_well_context(company), request=request
+        )
+
+    if 'total_inventory_value' in requested_panels:
+        panels['total_inventory_value'] = render_to_string(
+            'total_inventory_modal.html', build_total_inventory_value_context(company), request=request
+        )
+
+    if 'items_to_sell' in requested_panels:
+        panels['items_to_sell'] = render_to_string(
+            'items_attention_modal_content.html', build_items_to_sell_context(company, request.GET.get('q', '')), request=request
+        )
+
+    return JsonResponse({'panels': panels, 'errors': errors})
+
+
+
+# --- Analytics Profiling (staff only) ---
+
+@staff_member_required
+def get_analytics_profiling_data(request):
+    """
+    Exposes this process's ring buffer of sampled analytics requests (see instrumentation.py),
+    with a per-endpoint summary. Optional GET filters: endpoint, tenant_id.
+    """
+    tenant_id = request.GET.get('tenant_id')
+    try:
+        tenant_id = int(tenant_id) if tenant_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid tenant_id.'}, status=400)
+
+    samples = get_recent_samples(endpoint=request.GET.get('endpoint'), tenant_id=tenant_id)
+    return JsonResponse({
+        'summary': summarize_samples(samples),
+        'samples': samples,
+    })
+
+# --- Async (ASGI) variants of the dashboard APIs ---
+# Same JSON contracts as the sync endpoints above. Under ASGI these avoid tying up a
+# worker thread per request and run each view's independent queries concurrently.
+# The ORM's own async methods (aaggregate, aexists, ...) all hop onto the single
+# thread_sensitive executor, so gathering them would still run the queries one after
+# another; run_queries_concurrently uses a small pool of its own threads instead.
+# profile_view is not applied here: its execute_wrapper is per-connection, per-thread.
+# Requires Django >= 5.1, the first release whose login_required wraps ``async def`` views;
+# on older versions it returns a sync wrapper around the coroutine, so urls.py only
+# registers these views when async_views_supported().
+
+DEFAULT_ASYNC_QUERY_WORKERS = 8
+
+_query_executor = None
+_query_executor_lock = threading.Lock()
+
+def async_views_supported():
+    return django.VERSION >= (5, 1)
+
+def get_query_executor():
+    """
+    The bounded pool run_queries_concurrently runs on (ANALYTICS_ASYNC_QUERY_WORKERS threads).
+    Its threads live for the whole process, so each keeps its connections across requests,
+    subject to CONN_MAX_AGE like any request thread.
+    """
+    global _query_executor
+    with _query_executor_lock:
+        if _query_executor is None:
+            _query_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ANALYTICS_ASYNC_QUERY_WORKERS', DEFAULT_ASYNC_QUERY_WORKERS),
+                thread_name_prefix='analytics-query',
+            )
+        return _query_executor
+
+def _run_query(func):
+    try:
+        return func()
+    finally:
+        # What request_finished does for request threads: drop connections past CONN_MAX_AGE
+        # or left unusable, keep the rest for the next query on this thread.
+        close_old_connections()
+
+async def run_queries_concurrently(*callables):
+    """
+    Runs zero-argument, blocking ORM callables concurrently on the query pool, each with its
+    thread's own database connection. Returns their results in order. Each call runs in a
+    copy of the caller's context, so the read-replica routing carries over.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_query_executor()
+    return await asyncio.gather(*(
+        loop.run_in_executor(executor, contextvars.copy_context().run, _run_query, func)
+        for func in callables
+    ))
+
+@login_required
+@cache_company_json('kpi', get_company_id=user_company_id)
+@analytics_read_replica
+async def get_kpi_data_async(request):
+    """
+    Async variant of get_kpi_data: the sales and inventory aggregates run concurrently.
+    """
+    company, user_profile, has_company = await sync_to_async(get_user_company)(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found.'}, status=403)
+
+    (sales_rows, sales_aggregates), (products, inventory_aggregates) = kpi_aggregate_queries(company)
+    sales_totals, inventory_totals = await run_queries_concurrently(
+        lambda: sales_rows.aggregate(**sales_aggregates),
+        lambda: products.aggregate(**inventory_aggregates),
+    )
+    return JsonResponse(serialize_kpi_snapshot(assemble_kpi_snapshot(sales_totals, inventory_totals)))
+
+@login_required
+@cache_company_json('graph', get_company_id=user_company_id)
+@analytics_read_replica
+async def get_dashboard_graph_data_async(request):
+    """
+    Async variant of get_dashboard_graph_data.
+    """
+    metric = request.GET.get('metric', 'sales')
+    time_period = request.GET.get('time_period', 'month')
+
+    company, user_profile, has_company = await sync_to_async(get_user_company)(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found for user profile'}, status=400)
+
+    precision = request.GET.get('precision', 'auto')
+    if precision not in GRAPH_PRECISIONS:
+        return JsonResponse({'error': 'Invalid precision'}, status=400)
+
+    compare = request.GET.get('compare') or None
+    if compare is not None and compare not in GRAPH_COMPARISONS:
+        return JsonResponse({'error': 'Invalid compare'}, status=400)
+
+    columnar = wants_columnar(request)
+    response_data, status = await sync_to_async(build_dashboard_graph_data)(company, metric, time_period, columnar, precision, compare)
+    return payload_response(response_data, columnar, status=status)
+
+@login_required
+@cache_company_json('sales_trends', get_company_id=member_url_company_id)
+@analytics_read_replica
+async def get_sales_trends_api_data_async(request, company_id):
+    """
+    Async variant of get_sales_trends_api_data: the history check and the window rows run concurrently.
+    """
+    permission_error = await sync_to_async(company_access_error)(request, company_id)
+    if permission_error is not None:
+        return permission_error
+
+    requested_metrics_str = request.GET.get('metrics', 'revenue,net_profit,quantity_sold,cogs')
+
+    window_start, earlier_metrics, monthly_rows_qs = sales_trends_queries(company_id)
+    has_earlier_metrics, monthly_rows = await run_queries_concurrently(
+        earlier_metrics.exists,
+        lambda: list(monthly_rows_qs),
+    )
+    columnar = wants_columnar(request)
+    return payload_response(assemble_sales_trends_data(
+        window_start, has_earlier_metrics, monthly_rows, requested_metrics_str, columnar
+    ), columnar)
+
+@login_required
+@cache_company_json('all_monthly_sales_trends', get_company_id=member_url_company_id)
+@analytics_read_replica
+async def get_all_monthly_sales_trends_api_data_async(request, company_id):
+    """
+    Async variant of get_all_monthly_sales_trends_api_data: the monthly rows and the
+    sale date range run concurrently once the permission check has passed.
+    """
+    permission_error = await sync_to_async(company_access_error)(request, company_id)
+    if permission_error is not None:
+        return permission_error
+
+    metrics_param = request.GET.get('metrics', 'revenue')
+
+    monthly_rows_qs, sale_range_qs, sale_range_aggregates = all_monthly_trends_queries(company_id)
+    monthly_rows, sale_range = await run_queries_concurrently(
+        lambda: list(monthly_rows_qs),
+        lambda: sale_range_qs.aggregate(**sale_range_aggregates),
+    )
+    columnar = wants_columnar(request)
+    return payload_response(assemble_all_monthly_trends_data(monthly_rows, sale_range, metrics_param, columnar), columnar)
+
+# --- Live KPI stream (Server-Sent Events) ---
+# Pushes KPI deltas published by the signals (see kpi_stream.py) instead of having
+# every dashboard poll the KPI endpoint and re-aggregate.
+
+KPI_STREAM_HEARTBEAT_SECONDS = 15
+
+def load_live_kpi_totals(company):
+    """
+    Seeds the running totals for the live KPI stream (two queries, once per company).
+    """
+    (sales_rows, sales_aggregates), _ = kpi_aggregate_queries(company)
+    sales_totals = sales_rows.aggregate(**sales_aggregates)
+    return {
+        'revenue': sales_totals['total_revenue'],
+        'profit': sales_totals['total_profit'],
+        'orders': sales_totals['total_orders'],
+        'low_stock_count': Product.objects.filter(company=company, stock__lte=F('low_stock_input')).count(),
+    }
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+def kpi_stream_enabled():
+    """
+    Whether the live KPI stream is served (and the dashboard opens it). Off unless
+    ANALYTICS_KPI_STREAM_ENABLED is set: each open stream is a long-lived request, which
+    only ASGI serves without holding a worker thread per dashboard tab, and the async view
+    needs Django >= 5.1 (see async_views_supported).
+    """
+    return async_views_supported() and getattr(settings, 'ANALYTICS_KPI_STREAM_ENABLED', False)
+
+@login_required
+async def get_kpi_stream(request):
+    """
+    Server-sent events stream of the company's KPIs: a 'snapshot' event with the running totals
+    on connect (and after a resync), then a 'delta' event per paid/un-paid order or low-stock change.
+    """
+    company, user_profile, has_company = await sync_to_async(get_user_company)(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found.'}, status=403)
+
+    broker = get_kpi_broker()
+
+    async def snapshot():
+        # Stale totals are reloaded once per process however many streams ask (see kpi_stream.py).
+        totals = await sync_to_async(broker.get_totals)(company.id, lambda: load_live_kpi_totals(company))
+        return format_sse('snapshot', totals)
+
+    async def events():
+        subscription = broker.subscribe(company.id)
+        try:
+            yield await snapshot()
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=KPI_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if broker.is_stale(company.id):
+                        yield await snapshot()
+                    else:
+                        yield ": keep-alive\n\n"
+                    continue
+
+                if event['type'] == 'resync':
+                    yield await snapshot()
+                elif 'totals' in event:
+                    # Deltas published before the totals were loaded are already part of the snapshot.
+                    yield format_sse('delta', {'delta': event['delta'], 'totals': event['totals']})
+        finally:
+            broker.unsubscribe(company.id, subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+# --- Restock Recommendations (see restock_engine.py) ---
+
+RESTOCK_PAGE_SIZE = 100
+RESTOCK_MAX_PAGE_SIZE = 1000
+
+
+def parse_restock_filters(request):
+    """
+    Reads the filters shared by the restock API and export: supplier (id) and needs_reorder
+    (1 keeps only products to reorder). Returns (supplier_id, needs_reorder_only, error_message).
+    """
+    supplier_id = None
+    if request.GET.get('supplier'):
+        try:
+            supplier_id = int(request.GET['supplier'])
+        except ValueError:
+            return None, False, 'Invalid supplier.'
+    return supplier_id, request.GET.get('needs_reorder') == '1', None
+
+
+@login_required
+@profile_view('restock')
+@cache_company_json('restock', get_company_id=user_company_id)
+@analytics_read_replica
+def get_restock_recommendations(request):
+    """
+    Paginated reorder points and quantities for every product of the user's company,
+    ordered by supplier (most urgent first within a supplier), plus per-supplier totals.
+
+    GET parameters: window_days, lead_time_days, review_days, service_level (see
+    restock_engine.py), supplier, needs_reorder=1, page, page_size.
+    """
+    company, user_profile, has_company = get_user_company(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found for user profile'}, status=400)
+
+    params, error = parse_restock_params(request.GET)
+    if not error:
+        supplier_id, needs_reorder_only, error = parse_restock_filters(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', RESTOCK_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page or page_size.'}, status=400)
+    if page < 1 or not 1 <= page_size <= RESTOCK_MAX_PAGE_SIZE:
+        return JsonResponse({'error': f'page must be >= 1 and page_size between 1 and {RESTOCK_MAX_PAGE_SIZE}.'}, status=400)
+
+    # The plan for the whole company is computed once and cached; pages slice it.
+    plan = get_restock_plan(company, params)
+    indices = restock_selection(plan, supplier_id, needs_reorder_only)
+    page_indices = indices[(page - 1) * page_size:page * page_size]
+
+    return JsonResponse({
+        'params': params,
+        'generated_at': plan['generated_at'],
+        'page': page,
+        'page_size': page_size,
+        'total': len(indices),
+        'num_pages': max(-(-len(indices) // page_size), 1),
+        'suppliers': restock_supplier_summary(plan, indices),
+        'results': restock_rows(plan, page_indices),
+    })
+
+
+# --- Streaming Exports (CSV / NDJSON) ---
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    File-like object whose write() returns the value instead of buffering it,
+    so csv.writer can be used to produce rows for a StreamingHttpResponse.
+    """
+    def write(self, value):
+        return value
+
+
+def stream_export(header, rows, export_format, filename):
+    """
+    Streams `rows` (an iterable of tuples matching `header`) as CSV or NDJSON.
+    Rows are encoded one at a time, so memory stays flat regardless of the export size.
+    """
+    if export_format == 'ndjson':
+        content = (json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + "\n" for row in rows)
+        response = StreamingHttpResponse(content, content_type='application/x-ndjson')
+        extension = 'ndjson'
+    else:
+        writer = csv.writer(Echo())
+        content = (writer.writerow(row) for row in itertools.chain([header], rows))
+        response = StreamingHttpResponse(content, content_type='text/csv')
+        extension = 'csv'
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
+
+def start_of_local_day(day):
+    """
+    Midnight of `day` in the current timezone, as an aware datetime.
+    """
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def parse_export_params(request):
+    """
+    Reads the shared export parameters: start/end (YYYY-MM-DD, inclusive, optional) and format (csv|ndjson).
+    Returns (start_date, end_date, export_format, error_message).
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return None, None, None, 'Invalid format. Use csv or ndjson.'
+
+    start_date = end_date = None
+    try:
+        if request.GET.get('start'):
+            start_date = parse_date(request.GET['start'])
+        if request.GET.get('end'):
+            end_date = parse_date(request.GET['end'])
+    except ValueError:
+        return None, None, None, 'Invalid date. Use YYYY-MM-DD.'
+    if (request.GET.get('start') and not start_date) or (request.GET.get('end') and not end_date):
+        return None, None, None, 'Invalid date. Use YYYY-MM-DD.'
+
+    return start_date, end_date, export_format, None
+
+
+@login_required
+@analytics_read_replica
+def export_sales_metrics(request):
+    """
+    Streams daily or monthly sales metrics for the user's company over any date range.
+
+    GET parameters: granularity (day|month, default day), start, end, format (csv|ndjson).
+    Daily rows come straight from the CompanyDailyMetric rollup; monthly rows are grouped from it.
+    """
+    company, user_profile, has_company = get_user_company(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found.'}, status=403)
+
+    start_date, end_date, export_format, error = parse_export_params(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in ('day', 'month'):
+        return JsonResponse({'error': 'Invalid granularity. Use day or month.'}, status=400)
+
+    metrics_query = CompanyDailyMetric.objects.filter(company=company, total_daily_orders__gt=0)
+    if start_date:
+        metrics_query = metrics_query.filter(day__gte=start_date)
+    if end_date:
+        metrics_query = metrics_query.filter(day__lte=end_date)
+
+    header = ['period', 'revenue', 'net_profit', 'cogs', 'orders', 'quantity_sold']
+    if granularity == 'day':
+        rows = metrics_query.order_by('day').values_list(
+            'day', 'total_daily_revenue', 'net_daily_profit', 'total_daily_cogs', 'total_daily_orders', 'total_products_sold'
+        )
+    else:
+        rows = metrics_query.annotate(
+            period=TruncMonth('day')
+        ).values('period').annotate(
+            revenue=Sum('total_daily_revenue'),
+            net_profit=Sum('net_daily_profit'),
+            cogs=Sum('total_daily_cogs'),
+            orders=Sum('total_daily_orders'),
+            quantity_sold=Sum('total_products_sold'),
+        ).order_by('period').values_list('period', 'revenue', 'net_profit', 'cogs', 'orders', 'quantity_sold')
+
+    # The rows are read while streaming, after the view returns: bind them to the view's read alias now.
+    rows = rows.using(current_read_alias())
+    return stream_export(header, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE), export_format, f"sales_metrics_{granularity}")
+
+
+@login_required
+@analytics_read_replica
+def export_product_sales(request):
+    """
+    Streams per-product sales (units, revenue, COGS, net profit, last sale) for the user's company
+    over any date range. GET parameters: start, end, format (csv|ndjson).
+    """
+    company, user_profile, has_company = get_user_company(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found.'}, status=403)
+
+    start_date, end_date, export_format, error = parse_export_params(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    # Aware datetime bounds (not __date lookups), so the (company, order_date) indexes apply.
+    items_query = Order_Items.objects.filter(order__company=company, order__status='paid')
+    if start_date:
+        items_query = items_query.filter(order__order_date__gte=start_of_local_day(start_date))
+    if end_date:
+        items_query = items_query.filter(order__order_date__lt=start_of_local_day(end_date + timedelta(days=1)))
+
+    header = ['product_id', 'name', 'barcode', 'quantity_sold', 'revenue', 'cogs', 'net_profit', 'last_sale']
+    rows = items_query.values('product_id', 'product__name', 'product__barcode').annotate(
+        quantity_sold=Sum('quantity'),
+        revenue=Sum(F('quantity') * F('price')),
+        cogs=Sum('cogs'),
+        net_profit=Sum('net_profit'),
+        last_sale=Max('order__order_date'),
+    ).order_by('product_id').values_list(
+        'product_id', 'product__name', 'product__barcode', 'quantity_sold', 'revenue', 'cogs', 'net_profit', 'last_sale'
+    )
+
+    rows = rows.using(current_read_alias())
+    return stream_export(header, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE), export_format, "product_sales")
+
+
+@login_required
+@analytics_read_replica
+def export_restock_recommendations(request):
+    """
+    Streams the restock plan of the user's company (all rows matching the filters, supplier order).
+    GET parameters: the restock parameters and filters of get_restock_recommendations, format (csv|ndjson).
+    """
+    company, user_profile, has_company = get_user_company(request)
+    if not has_company:
+        return JsonResponse({'error': 'Company not found.'}, status=403)
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return JsonResponse({'error': 'Invalid format. Use csv or ndjson.'}, status=400)
+
+    params, error = parse_restock_params(request.GET)
+    if not error:
+        supplier_id, needs_reorder_only, error = parse_restock_filters(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    # The plan is loaded (or computed) here; streaming only formats the cached arrays.
+    plan = get_restock_plan(company, params)
+    indices = restock_selection(plan, supplier_id, needs_reorder_only)
+
+    def rows():
+        for start in range(0, len(indices), EXPORT_CHUNK_SIZE):
+            for row in restock_rows(plan, indices[start:start + EXPORT_CHUNK_SIZE]):
+                yield tuple(row.values())
+
+    return stream_export(list(RESTOCK_COLUMNS), rows(), export_format, "restock_recommendations")
+
+
+def get_user_company(request):
+    """
+    Retrieves the authenticated user's profile and associated company from the per-request
+    tenant context (see tenant_context.py).
+    Returns (company_object, user_profile_object, has_company_linked_boolean).
+    """
+    tenant = get_tenant_context(request)
+    # Loaded with its company in one query; None for anonymous users, users without a
+    # UserProfile, and a profile deleted since the context was cached.
+    profile = tenant.profile
+    if profile is None:
         return None, None, False
 
+    company = tenant.company
+    return company, profile, company is not None
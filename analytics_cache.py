@@ -0,0 +1,281 @@
+"""
+Per-company result cache for the analytics JSON endpoints.
+
+Entries are stored in a Django cache backend selected by ``ANALYTICS_CACHE_ALIAS``
+(default: ``'default'``). With ``LocMemCache`` this gives TTL expiry plus LRU eviction
+once ``MAX_ENTRIES`` is reached; pointing the alias at Redis/Memcached shares the cache
+across workers without code changes.
+
+Invalidation is version-based: every key embeds the company's current version number,
+and saving an Order, Order_Item or Product bumps that number after commit, once the daily
+rollups it feeds have been refreshed (see signals.py). A bump sets the version to the
+current time in microseconds, so the version also tells how recently the data changed;
+``refill_is_cacheable`` uses that to keep replica reads taken right after a write out of
+the cache (see read_replica.py). Old
+entries are never read again and simply age out through TTL/LRU, so no key scanning
+is needed on any backend.
+
+``cache_company_json`` wraps both sync and ``async def`` views; the async variant uses the
+cache's ``aget``/``aset`` and resolves the tenant in a worker thread.
+
+The dashboard's HTML modal partials use the same version stamp: ``cache_company_fragment``
+caches the rendered fragment and derives an ETag from its cache key, so a browser re-opening
+a modal whose data has not changed gets a ``304 Not Modified`` without the view's queries or
+template rendering. ``static_fragment`` serves modal shells that depend only on the template
+and the query string with a long-lived private ``Cache-Control`` and a deploy-versioned ETag.
+"""
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .compact_payload import negotiated_format
+from .read_replica import get_pin_seconds
+
+
+DEFAULT_TIMEOUT = 300  # seconds
+DEFAULT_STATIC_FRAGMENT_MAX_AGE = 86400  # seconds
+
+# Prefix of every cached result key. Bump it whenever the shape of the cached value changes
+# (v2: entries are (content type, body) tuples), so a deploy never reads entries written by
+# the previous release from a shared cache.
+CACHE_KEY_NAMESPACE = 'analytics:v2'
+
+
+def get_analytics_cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def get_analytics_cache_timeout():
+    return getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def get_static_fragment_max_age():
+    return getattr(settings, 'ANALYTICS_STATIC_FRAGMENT_MAX_AGE', DEFAULT_STATIC_FRAGMENT_MAX_AGE)
+
+
+def get_fragment_version():
+    # Bump on deploys that change the modal templates, so browsers drop their cached copies.
+    return getattr(settings, 'ANALYTICS_FRAGMENT_VERSION', '1')
+
+
+def _version_key(company_id):
+    return f"analytics:version:{company_id}"
+
+
+def new_cache_version():
+    # Seeded from the clock (microseconds), so a version key that was evicted restarts above
+    # every value it had; restarting at 1 would make entries cached under old versions valid again.
+    return time.time_ns() // 1000
+
+
+def get_company_cache_version(company_id):
+    cache = get_analytics_cache()
+    version = cache.get(_version_key(company_id))
+    if version is None:
+        # No timeout: the version should outlive the entries that embed it.
+        seed = new_cache_version()
+        cache.add(_version_key(company_id), seed, timeout=None)
+        version = cache.get(_version_key(company_id), seed)
+    return version
+
+
+def invalidate_company_cache(company_id):
+    """
+    Drops every cached analytics result for a company by moving its version to the
+    current time (and at least one past the previous version).
+    """
+    if not company_id:
+        return
+    cache = get_analytics_cache()
+    version = new_cache_version()
+    previous = cache.get(_version_key(company_id))
+    if previous is not None and previous >= version:
+        version = previous + 1
+    cache.set(_version_key(company_id), version, timeout=None)
+
+
+def refill_is_cacheable(company_id, read_alias):
+    """
+    False for a result read from a replica (`read_alias` set) while the company's data
+    changed less than the replica pin window ago: the replica may not have replayed that
+    change yet, and caching the result would serve it under the new version for a whole TTL.
+    Such results are still returned, just not stored.
+    """
+    if read_alias is None:
+        return True
+    changed_ago = time.time() - get_company_cache_version(company_id) / 1_000_000
+    return changed_ago > get_pin_seconds()
+
+
+def make_cache_key(company_id, endpoint, params):
+    """
+    Builds a key from company, endpoint and the (order-insensitive) request parameters.
+    """
+    raw_params = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+    params_hash = hashlib.md5(raw_params.encode('utf-8')).hexdigest()
+    version = get_company_cache_version(company_id)
+    return f"{CACHE_KEY_NAMESPACE}:{company_id}:v{version}:{endpoint}:{params_hash}"
+
+
+def _cache_params(request, kwargs):
+    # The payload format can also be negotiated through the Accept header, so it is part of the key.
+    return {
+        **request.GET.dict(),
+        **{f"url_{k}": v for k, v in kwargs.items()},
+        '_format': negotiated_format(request),
+    }
+
+
+def _cache_entry(response):
+    return (response['Content-Type'], response.content)
+
+
+def _hit_response(cached):
+    content_type, content = cached
+    response = HttpResponse(content, content_type=content_type)
+    patch_vary_headers(response, ['Accept'])
+    response['X-Analytics-Cache'] = 'HIT'
+    return response
+
+
+def _is_cacheable(response):
+    return response.status_code == 200 and not getattr(response, 'streaming', False)
+
+
+def cache_company_json(endpoint, get_company_id):
+    """
+    View decorator that caches successful JSON responses per company, endpoint, GET parameters
+    and negotiated payload format (see compact_payload.py).
+    ``get_company_id(request, *args, **kwargs)`` resolves the tenant; returning None bypasses the cache.
+    Non-200 responses are never cached.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # The resolver and the version lookup may touch the database / a sync cache client.
+                company_id = await sync_to_async(get_company_id)(request, *args, **kwargs)
+                if not company_id:
+                    return await view_func(request, *args, **kwargs)
+
+                cache = get_analytics_cache()
+                key = await sync_to_async(make_cache_key)(company_id, endpoint, _cache_params(request, kwargs))
+
+                cached = await cache.aget(key)
+                if cached is not None:
+                    return _hit_response(cached)
+
+                response = await view_func(request, *args, **kwargs)
+                read_alias = getattr(request, '_analytics_read_alias', None)
+                if _is_cacheable(response) and await sync_to_async(refill_is_cacheable)(company_id, read_alias):
+                    await cache.aset(key, _cache_entry(response), timeout=get_analytics_cache_timeout())
+                    response['X-Analytics-Cache'] = 'MISS'
+                return response
+            return async_wrapper
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            company_id = get_company_id(request, *args, **kwargs)
+            if not company_id:
+                return view_func(request, *args, **kwargs)
+
+            cache = get_analytics_cache()
+            key = make_cache_key(company_id, endpoint, _cache_params(request, kwargs))
+
+            cached = cache.get(key)
+            if cached is not None:
+                return _hit_response(cached)
+
+            response = view_func(request, *args, **kwargs)
+            read_alias = getattr(request, '_analytics_read_alias', None)
+            if _is_cacheable(response) and refill_is_cacheable(company_id, read_alias):
+                cache.set(key, _cache_entry(response), timeout=get_analytics_cache_timeout())
+                response['X-Analytics-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _is_ajax(request):
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+
+def _with_revalidation(response, etag):
+    response['ETag'] = etag
+    # Browsers keep the fragment but must revalidate it on every open.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def cache_company_fragment(endpoint, get_company_id):
+    """
+    View decorator for the AJAX modal partials: caches the rendered HTML per company, endpoint,
+    GET parameters, data version and current day (the partials show dates relative to today),
+    and answers a matching If-None-Match with 304 Not Modified.
+    Non-AJAX requests (which the views redirect) and non-200 responses are never cached.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            company_id = get_company_id(request, *args, **kwargs) if _is_ajax(request) else None
+            if not company_id:
+                return view_func(request, *args, **kwargs)
+
+            params = {**_cache_params(request, kwargs), '_day': timezone.localdate().isoformat()}
+            key = make_cache_key(company_id, f"fragment:{endpoint}", params)
+            etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return _with_revalidation(not_modified, etag)
+
+            cache = get_analytics_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                content_type, content = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Analytics-Cache'] = 'HIT'
+                return _with_revalidation(response, etag)
+
+            response = view_func(request, *args, **kwargs)
+            # An uncached (possibly pre-write replica) fragment gets no ETag either, so the
+            # browser can't revalidate its copy into a 304 for the new version.
+            read_alias = getattr(request, '_analytics_read_alias', None)
+            if _is_cacheable(response) and refill_is_cacheable(company_id, read_alias):
+                cache.set(key, _cache_entry(response), timeout=get_analytics_cache_timeout())
+                response['X-Analytics-Cache'] = 'MISS'
+                _with_revalidation(response, etag)
+            return response
+        return wrapper
+    return decorator
+
+
+def static_fragment(view_func):
+    """
+    View decorator for modal shells whose HTML depends only on the template and the query string.
+    Responses get a long-lived private Cache-Control and an ETag tied to ANALYTICS_FRAGMENT_VERSION,
+    so re-opening the modal is served from the browser cache, or by a 304 once it expires.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        path_hash = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+        etag = quote_etag(f"{get_fragment_version()}-{path_hash}")
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=get_static_fragment_max_age())
+        return response
+    return wrapper
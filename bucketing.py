@@ -0,0 +1,193 @@
+"""
+Shared time-series bucketing for the dashboard graph and trend APIs.
+
+Period keys, labels and gap-filled series are produced in bulk with NumPy
+datetime64 arithmetic instead of walking the range one period at a time with
+strftime/relativedelta. Bucket keys match what the database truncation
+functions return (TruncDay, TruncWeek -> ISO Monday, TruncMonth, TruncYear),
+so aggregated rows can be aligned with one vectorized lookup.
+"""
+from datetime import date, datetime
+
+import numpy as np
+
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+YEAR = 'year'
+
+MONTH_ABBR = np.array(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
+
+# 1970-01-01 (datetime64 day 0) was a Thursday; +3 makes Monday == 0.
+_EPOCH_WEEKDAY_OFFSET = 3
+
+
+def to_datetime64(value):
+    """
+    Converts a date/datetime (or datetime64) to datetime64[D]. Aware datetimes
+    are expected to already be in the timezone the buckets are defined in.
+    """
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return np.datetime64(value, 'D')
+    return np.datetime64(value, 'D')
+
+
+def bucket_start(days, bucket):
+    """
+    Truncates a datetime64[D] scalar or array to the start of its bucket.
+    """
+    days = np.asarray(days, dtype='datetime64[D]')
+    if bucket == DAY:
+        return days
+    if bucket == WEEK:
+        weekday = (days.astype('int64') + _EPOCH_WEEKDAY_OFFSET) % 7
+        return days - weekday.astype('timedelta64[D]')
+    if bucket == MONTH:
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    if bucket == YEAR:
+        return days.astype('datetime64[Y]').astype('datetime64[D]')
+    raise ValueError(f"Unknown bucket: {bucket}")
+
+
+def period_range(start, end, bucket):
+    """
+    Returns the start day of every bucket between start and end (inclusive)
+    as a datetime64[D] array.
+    """
+    first = bucket_start(to_datetime64(start), bucket)
+    last = bucket_start(to_datetime64(end), bucket)
+    if last < first:
+        return np.array([], dtype='datetime64[D]')
+
+    if bucket == DAY:
+        return np.arange(first, last + 1, dtype='datetime64[D]')
+    if bucket == WEEK:
+        return np.arange(first, last + 1, 7, dtype='datetime64[D]')
+    if bucket == MONTH:
+        months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1, dtype='datetime64[M]')
+        return months.astype('datetime64[D]')
+    if bucket == YEAR:
+        years = np.arange(first.astype('datetime64[Y]'), last.astype('datetime64[Y]') + 1, dtype='datetime64[Y]')
+        return years.astype('datetime64[D]')
+    raise ValueError(f"Unknown bucket: {bucket}")
+
+
+def period_labels(periods, bucket):
+    """
+    Builds display labels for an array of bucket start days:
+    day -> 'Jan 05', week -> 'Wk 2 (Jan 06)', month -> 'Jan 2025', year -> '2025'.
+    """
+    periods = np.asarray(periods, dtype='datetime64[D]')
+    if periods.size == 0:
+        return []
+
+    months = periods.astype('datetime64[M]')
+    years = periods.astype('datetime64[Y]').astype('int64') + 1970
+    month_names = MONTH_ABBR[months.astype('int64') % 12]
+    day_of_month = (periods - months.astype('datetime64[D]')).astype('int64') + 1
+
+    if bucket == YEAR:
+        labels = years.astype(str)
+    elif bucket == MONTH:
+        labels = np.char.add(np.char.add(month_names, ' '), years.astype(str))
+    else:
+        day_labels = np.char.add(np.char.add(month_names, ' '), np.char.zfill(day_of_month.astype(str), 2))
+        if bucket == DAY:
+            labels = day_labels
+        else:
+            labels = np.char.add(
+                np.char.add(np.char.add('Wk ', iso_week_numbers(periods).astype(str)), ' ('),
+                np.char.add(day_labels, ')')
+            )
+    return labels.tolist()
+
+
+def iso_week_numbers(days):
+    """
+    ISO 8601 week number for each datetime64[D] day.
+    """
+    days = np.asarray(days, dtype='datetime64[D]')
+    weekday = (days.astype('int64') + _EPOCH_WEEKDAY_OFFSET) % 7
+    # The ISO year of a week is the year of its Thursday.
+    thursdays = days - weekday.astype('timedelta64[D]') + np.timedelta64(3, 'D')
+    iso_year_start = thursdays.astype('datetime64[Y]').astype('datetime64[D]')
+    return (thursdays - iso_year_start).astype('int64') // 7 + 1
+
+
+def align(periods, row_periods, bucket):
+    """
+    Maps aggregated row periods onto a period range with one sorted lookup.
+    Returns (positions, matched): positions[i] is the index of row i in `periods`,
+    valid only where matched[i] is True (rows outside the range are dropped).
+    """
+    if len(row_periods) == 0 or len(periods) == 0:
+        empty = np.array([], dtype='int64')
+        return empty, empty.astype(bool)
+
+    keys = bucket_start(np.array([to_datetime64(p) for p in row_periods], dtype='datetime64[D]'), bucket)
+    positions = np.searchsorted(periods, keys)
+    in_bounds = positions < len(periods)
+    matched = np.zeros(len(keys), dtype=bool)
+    matched[in_bounds] = periods[positions[in_bounds]] == keys[in_bounds]
+    return positions, matched
+
+
+def fill_columns(periods, row_periods, columns, bucket):
+    """
+    Gap-fills several value columns against a period range using a single alignment.
+    `columns` maps a name to a sequence of values (same length as `row_periods`);
+    missing periods are 0. Returns a dict of float64 arrays.
+    """
+    positions, matched = align(periods, row_periods, bucket)
+    filled = {}
+    for name, values in columns.items():
+        series = np.zeros(len(periods), dtype='float64')
+        if matched.any():
+            values = np.array([0 if v is None else v for v in values], dtype='float64')
+            np.add.at(series, positions[matched], values[matched])
+        filled[name] = series
+    return filled
+
+
+def bucket_series(start, end, bucket, rows):
+    """
+    Convenience wrapper for a single series: `rows` is an iterable of (period, value).
+    Returns (labels, data) as plain lists ready for JSON.
+    """
+    rows = list(rows)
+    periods = period_range(start, end, bucket)
+    filled = fill_columns(periods, [r[0] for r in rows], {'value': [r[1] for r in rows]}, bucket)
+    return period_labels(periods, bucket), filled['value'].tolist()
+
+
+def align_by_position(values, length):
+    """
+    Truncates or NaN-pads a value array to `length` so a baseline series can be compared
+    with the current one bucket by bucket (bucket i against bucket i).
+    """
+    aligned = np.full(length, np.nan, dtype='float64')
+    n = min(length, len(values))
+    aligned[:n] = values[:n]
+    return aligned
+
+
+def percent_change(current, baseline):
+    """
+    Element-wise percentage change from baseline to current (relative to |baseline|).
+    NaN where the baseline is zero or missing.
+    """
+    current = np.asarray(current, dtype='float64')
+    baseline = np.asarray(baseline, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = (current - baseline) / np.abs(baseline) * 100
+    return np.where(np.isfinite(change), change, np.nan)
+
+
+def nan_to_none(values):
+    """
+    Float array -> plain list with NaN as None (JSON null).
+    """
+    return [None if v != v else v for v in np.asarray(values, dtype='float64').tolist()]
@@ -0,0 +1,97 @@
+"""
+Compact columnar payloads for the dashboard graph and trend APIs.
+
+The default responses are lists of per-period rows with the period label repeated on
+every row. The columnar format sends each series once, as a plain values array, plus
+the first bucket's start day, the bucket size and the bucket count; the client derives
+the labels itself (same rules as bucketing.period_labels):
+
+    {"start": "2025-01-01", "bucket": "day", "count": 31, "columns": {"value": [...]}, ...}
+
+Clients opt in with ``?format=columnar`` or ``Accept: application/vnd.inventory.columnar+json``;
+everything else keeps getting the row format. Payloads are encoded with orjson when it is
+installed (NumPy arrays are serialized natively, without a tolist() round trip) and with
+the standard json module otherwise.
+"""
+import json
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+COLUMNAR_FORMAT = 'columnar'
+ROW_FORMAT = 'json'
+COLUMNAR_CONTENT_TYPE = 'application/vnd.inventory.columnar+json'
+
+
+def negotiated_format(request):
+    """
+    Returns COLUMNAR_FORMAT or ROW_FORMAT. An explicit ?format= wins over the Accept header.
+    """
+    requested = request.GET.get('format')
+    if requested:
+        return COLUMNAR_FORMAT if requested == COLUMNAR_FORMAT else ROW_FORMAT
+    if COLUMNAR_CONTENT_TYPE in request.headers.get('Accept', ''):
+        return COLUMNAR_FORMAT
+    return ROW_FORMAT
+
+
+def wants_columnar(request):
+    return negotiated_format(request) == COLUMNAR_FORMAT
+
+
+def columnar_columns(periods, bucket, columns):
+    """
+    Builds the columnar part of a payload from a datetime64[D] period range and
+    a dict of value arrays aligned with it.
+    """
+    return {
+        'start': str(periods[0]) if len(periods) else None,
+        'bucket': bucket,
+        'count': len(periods),
+        'columns': columns,
+    }
+
+
+class _ColumnarJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        if isinstance(o, np.generic):
+            return o.item()
+        return super().default(o)
+
+
+def encode_columnar(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, cls=_ColumnarJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+class ColumnarResponse(HttpResponse):
+    """
+    JSON response in the columnar content type, encoded with encode_columnar.
+    """
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', COLUMNAR_CONTENT_TYPE)
+        super().__init__(content=encode_columnar(data), **kwargs)
+
+
+def payload_response(data, columnar, status=200):
+    """
+    Returns a ColumnarResponse or a JsonResponse for an already-shaped payload.
+    Both vary on Accept, since the format can be negotiated through it.
+    """
+    if columnar:
+        response = ColumnarResponse(data, status=status)
+    else:
+        response = JsonResponse(data, status=status)
+    patch_vary_headers(response, ['Accept'])
+    return response
@@ -0,0 +1,138 @@
+"""
+Lightweight per-request instrumentation for the analytics views.
+
+`profile_view(endpoint)` records, for a sampled fraction of requests:
+query count, total DB time, Python (non-DB) time, payload size, endpoint and tenant.
+Each sampled response gets a `Server-Timing` header, and the sample is appended to an
+in-process ring buffer that the staff-only profiling endpoint exposes.
+
+Settings:
+    ANALYTICS_PROFILING_SAMPLE_RATE  fraction of requests to instrument (default 0.1; 0 disables)
+    ANALYTICS_PROFILING_BUFFER_SIZE  samples kept per process (default 500)
+
+Query timing uses connection.execute_wrapper, so it works with DEBUG off and costs a
+couple of perf_counter() calls per query on sampled requests only.
+"""
+import functools
+import random
+import statistics
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_BUFFER_SIZE = 500
+
+_samples = deque(maxlen=getattr(settings, 'ANALYTICS_PROFILING_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+_samples_lock = threading.Lock()
+
+
+class QueryTimer:
+    """
+    execute_wrapper that counts queries and accumulates their wall time.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def _tenant_id(request):
+    # Only reads a tenant context the view already resolved, so this never hits the database.
+    tenant = getattr(request, '_tenant_context', None)
+    return getattr(tenant, 'company_id', None)
+
+
+def _should_sample():
+    rate = getattr(settings, 'ANALYTICS_PROFILING_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def profile_view(endpoint):
+    """
+    View decorator that instruments a sampled fraction of requests (see module docstring).
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _should_sample():
+                return view_func(request, *args, **kwargs)
+
+            timer = QueryTimer()
+            started = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                response = view_func(request, *args, **kwargs)
+            total = time.perf_counter() - started
+
+            db_ms = timer.duration * 1000
+            total_ms = total * 1000
+            python_ms = max(total_ms - db_ms, 0.0)
+            payload_bytes = None if getattr(response, 'streaming', False) else len(response.content)
+
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{timer.count} queries", '
+                f'app;dur={python_ms:.1f}, '
+                f'total;dur={total_ms:.1f}'
+            )
+
+            sample = {
+                'endpoint': endpoint,
+                'tenant_id': _tenant_id(request),
+                'status': response.status_code,
+                'query_count': timer.count,
+                'db_ms': round(db_ms, 2),
+                'python_ms': round(python_ms, 2),
+                'total_ms': round(total_ms, 2),
+                'payload_bytes': payload_bytes,
+                'recorded_at': timezone.now().isoformat(),
+            }
+            with _samples_lock:
+                _samples.append(sample)
+            return response
+        return wrapper
+    return decorator
+
+
+def get_recent_samples(endpoint=None, tenant_id=None):
+    with _samples_lock:
+        samples = list(_samples)
+    if endpoint:
+        samples = [s for s in samples if s['endpoint'] == endpoint]
+    if tenant_id is not None:
+        samples = [s for s in samples if s['tenant_id'] == tenant_id]
+    return samples
+
+
+def summarize_samples(samples):
+    """
+    Per-endpoint summary: sample count, p50/p95 total time, mean DB time, mean queries, mean payload.
+    """
+    by_endpoint = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample['endpoint'], []).append(sample)
+
+    summary = {}
+    for endpoint, endpoint_samples in by_endpoint.items():
+        totals = sorted(s['total_ms'] for s in endpoint_samples)
+        payloads = [s['payload_bytes'] for s in endpoint_samples if s['payload_bytes'] is not None]
+        summary[endpoint] = {
+            'samples': len(endpoint_samples),
+            'p50_total_ms': round(statistics.median(totals), 2),
+            'p95_total_ms': round(totals[min(len(totals) - 1, int(len(totals) * 0.95))], 2),
+            'mean_db_ms': round(statistics.fmean(s['db_ms'] for s in endpoint_samples), 2),
+            'mean_query_count': round(statistics.fmean(s['query_count'] for s in endpoint_samples), 2),
+            'mean_payload_bytes': round(statistics.fmean(payloads)) if payloads else None,
+        }
+    return summary
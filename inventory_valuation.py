@@ -0,0 +1,131 @@
+"""
+Inventory valuation cube for the "Total Inventory Value" modal.
+
+Every valued product (in stock, with a price) is aggregated once, grouped at the finest
+grain the modal needs: one cell per (category, supplier) pair present in the catalog.
+Totals, per-category and per-supplier breakdowns are ROLLUP-style sums over those cells,
+done in Python, so adding a breakdown over existing dimensions costs no extra scan of
+Product and the number of cells is bounded by categories x suppliers, not by catalog size.
+
+The cells are snapshotted per company in the analytics cache. The key carries the
+company's data version (see analytics_cache.py), so any Product save drops the snapshot,
+and drill-down requests (a single category or supplier) reuse it instead of re-querying.
+
+Entry points:
+    get_inventory_cells(company)                                   -- cached cube cells
+    build_inventory_valuation(company, category_id=None, supplier_id=None)  -- totals + breakdowns
+"""
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+
+from inventory_app.analytics_cache import (
+    get_analytics_cache,
+    get_analytics_cache_timeout,
+    make_cache_key,
+    refill_is_cacheable,
+)
+from inventory_app.models import Product
+from inventory_app.read_replica import current_read_alias
+
+
+# Dimension name -> (id field, label field) on the grouped Product rows.
+DIMENSIONS = {
+    'category': ('category_id', 'category__name'),
+    'supplier': ('supplier_id', 'supplier__name'),
+}
+
+MEASURES = ('retail_value', 'cost_value', 'units_in_stock', 'product_count')
+
+
+def compute_inventory_cells(company):
+    """
+    Runs the single grouped pass and returns one dict per (category, supplier) cell with
+    the dimension ids/labels and every measure.
+    """
+    group_fields = [field for id_field, label_field in DIMENSIONS.values() for field in (id_field, label_field)]
+    rows = Product.objects.filter(
+        company=company,
+        stock__gt=0,
+        price__gt=0
+    ).values(*group_fields).annotate(
+        retail_value=Sum(F('stock') * F('price')),
+        cost_value=Sum(F('stock') * F('cost')),
+        units_in_stock=Sum('stock'),
+        product_count=Count('id'),
+    ).order_by()
+    return list(rows)
+
+
+def get_inventory_cells(company):
+    """
+    Returns the company's cube cells from the versioned snapshot, computing them on a miss.
+    """
+    cache = get_analytics_cache()
+    key = make_cache_key(company.id, 'inventory_valuation_cube', {})
+    cells = cache.get(key)
+    if cells is None:
+        cells = compute_inventory_cells(company)
+        if refill_is_cacheable(company.id, current_read_alias()):
+            cache.set(key, cells, timeout=get_analytics_cache_timeout())
+    return cells
+
+
+def _empty_measures():
+    return {measure: Decimal('0.00') if measure.endswith('_value') else 0 for measure in MEASURES}
+
+
+def _add_measures(target, cell):
+    for measure in MEASURES:
+        target[measure] += cell[measure] or 0
+
+
+def rollup_totals(cells):
+    """
+    Grand totals over a set of cells.
+    """
+    totals = _empty_measures()
+    for cell in cells:
+        _add_measures(totals, cell)
+    return totals
+
+
+def rollup_by(cells, dimension):
+    """
+    Sums a set of cells per member of one dimension ('category' or 'supplier'), ordered by label
+    (unlabelled members last). Rows carry the dimension's id and label fields plus every measure.
+    """
+    id_field, label_field = DIMENSIONS[dimension]
+    groups = {}
+    for cell in cells:
+        member = cell[id_field]
+        if member not in groups:
+            groups[member] = {id_field: member, label_field: cell[label_field], **_empty_measures()}
+        _add_measures(groups[member], cell)
+    return sorted(groups.values(), key=lambda row: (row[label_field] is None, row[label_field] or ''))
+
+
+def build_inventory_valuation(company, category_id=None, supplier_id=None):
+    """
+    Totals, per-category, per-supplier and category x supplier breakdowns for a company,
+    optionally drilled down to one category and/or one supplier. All of it comes from the
+    same cube snapshot.
+    """
+    cells = get_inventory_cells(company)
+    if category_id is not None:
+        cells = [cell for cell in cells if cell['category_id'] == category_id]
+    if supplier_id is not None:
+        cells = [cell for cell in cells if cell['supplier_id'] == supplier_id]
+
+    return {
+        'totals': rollup_totals(cells),
+        'by_category': rollup_by(cells, 'category'),
+        'by_supplier': rollup_by(cells, 'supplier'),
+        'cells': sorted(
+            cells,
+            key=lambda cell: (
+                cell['category__name'] is None, cell['category__name'] or '',
+                cell['supplier__name'] is None, cell['supplier__name'] or '',
+            )
+        ),
+    }
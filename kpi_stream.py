@@ -0,0 +1,200 @@
+"""
+Live KPI push channel for the analytics dashboard.
+
+Signals publish small KPI deltas when an order is paid or un-paid and when a product
+crosses its low-stock threshold (see signals.py). The broker keeps per-company running
+totals, seeded once from the database when the first stream for a company opens, and
+applies each delta to them; streams forward the delta together with the new totals.
+So the cost of keeping N dashboards current is O(events), not O(N x full re-aggregation).
+
+Event payloads (JSON-friendly; money values are Decimals):
+    {'type': 'delta', 'delta': {'revenue': ..., 'profit': ..., 'orders': ..., 'low_stock_count': ...}}
+    {'type': 'resync'}   -- totals can't be updated incrementally; streams fetch them again
+
+A resync only marks the company's totals stale. Reloads are single-flight: the first stream
+that asks for stale totals runs the query, streams asking meanwhile wait for its result,
+and later ones get the fresh copy, so N open dashboards cost one reload, not N. A delta
+or resync published while a reload runs may or may not be in the rows it read, so that
+reload is discarded and run again (up to MAX_RELOAD_ATTEMPTS times); deltas are applied to
+the previous totals in the meantime, so streams keep getting them.
+
+The stream endpoint is only registered when ``ANALYTICS_KPI_STREAM_ENABLED`` is set, which
+requires an ASGI deployment (under WSGI each open dashboard tab would hold a worker thread)
+and Django >= 5.1 for ``login_required`` on the async view.
+
+``InProcessKpiBroker`` only reaches streams served by the same process. Deployments with
+several workers should point ``ANALYTICS_KPI_BROKER`` at a shared implementation of the
+same interface (e.g. Redis pub/sub). Totals are also reloaded after
+``ANALYTICS_KPI_STREAM_RESYNC_SECONDS`` (default 300) to bound any drift.
+"""
+import asyncio
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+KPI_DELTA_FIELDS = ('revenue', 'profit', 'orders', 'low_stock_count')
+SUBSCRIBER_QUEUE_SIZE = 100
+DEFAULT_RESYNC_SECONDS = 300
+MAX_RELOAD_ATTEMPTS = 3
+
+
+def get_resync_seconds():
+    return getattr(settings, 'ANALYTICS_KPI_STREAM_RESYNC_SECONDS', DEFAULT_RESYNC_SECONDS)
+
+
+def _deliver(subscription, event):
+    # Runs on the subscriber's event loop.
+    try:
+        subscription.put_nowait(event)
+    except asyncio.QueueFull:
+        # Slow consumer: drop its backlog and make it fetch the (current) totals instead.
+        while not subscription.empty():
+            subscription.get_nowait()
+        subscription.put_nowait({'type': 'resync'})
+
+
+class _Reload:
+    """
+    An in-flight totals reload. `dirty` is set (under the broker lock) when an event is
+    published while it runs; `done` releases the streams waiting for it.
+    """
+    def __init__(self):
+        self.dirty = False
+        self.totals = None
+        self.done = threading.Event()
+
+
+class InProcessKpiBroker:
+    """
+    Per-process pub/sub plus running KPI totals. publish() is thread-safe and may be called
+    from any thread; subscribe()/unsubscribe() are called from the stream's event loop.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # company_id -> {(loop, asyncio.Queue), ...}
+        self._totals = {}       # company_id -> (loaded_at, {field: value})
+        self._stale = set()     # company_ids whose totals a resync invalidated
+        self._reloads = {}      # company_id -> _Reload in flight
+
+    def has_listeners(self, company_id):
+        with self._lock:
+            return bool(self._subscribers.get(company_id))
+
+    def has_any_listeners(self):
+        # Lets publishers skip resolving the company when no stream is open at all.
+        with self._lock:
+            return bool(self._subscribers)
+
+    def subscribe(self, company_id):
+        subscription = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(company_id, set()).add((asyncio.get_running_loop(), subscription))
+        return subscription
+
+    def unsubscribe(self, company_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(company_id, set())
+            subscribers.discard((asyncio.get_running_loop(), subscription))
+            if not subscribers:
+                # Nobody watches this company any more; stop keeping its totals.
+                self._subscribers.pop(company_id, None)
+                self._totals.pop(company_id, None)
+                self._stale.discard(company_id)
+
+    def _is_stale_locked(self, company_id):
+        entry = self._totals.get(company_id)
+        return (
+            entry is None
+            or company_id in self._stale
+            or time.monotonic() - entry[0] > get_resync_seconds()
+        )
+
+    def get_totals(self, company_id, load_totals):
+        """
+        Returns the company's running totals, loading them with `load_totals()` (a blocking
+        database call, so run this in a worker thread) if absent or stale. Concurrent callers
+        share one load.
+        """
+        with self._lock:
+            if not self._is_stale_locked(company_id):
+                return dict(self._totals[company_id][1])
+            reload = self._reloads.get(company_id)
+            leader = reload is None
+            if leader:
+                reload = self._reloads[company_id] = _Reload()
+
+        if not leader:
+            reload.done.wait()
+            if reload.totals is not None:
+                return dict(reload.totals)
+            # The leader's load failed; load for this caller.
+            return dict(load_totals())
+
+        try:
+            for attempt in range(MAX_RELOAD_ATTEMPTS):
+                totals = load_totals()
+                with self._lock:
+                    if not reload.dirty or attempt == MAX_RELOAD_ATTEMPTS - 1:
+                        # A last dirty load is kept anyway; the periodic resync bounds its drift.
+                        reload.totals = totals
+                        if company_id in self._subscribers:
+                            self._totals[company_id] = (time.monotonic(), totals)
+                            self._stale.discard(company_id)
+                        return dict(totals)
+                    reload.dirty = False
+        finally:
+            with self._lock:
+                self._reloads.pop(company_id, None)
+            reload.done.set()
+
+    def is_stale(self, company_id):
+        with self._lock:
+            return self._is_stale_locked(company_id)
+
+    def publish(self, company_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(company_id, ()))
+            if not subscribers:
+                return
+            reload = self._reloads.get(company_id)
+            if reload is not None:
+                reload.dirty = True
+            entry = self._totals.get(company_id)
+            if event['type'] == 'delta' and entry is not None and company_id not in self._stale:
+                totals = entry[1]
+                for field, value in event['delta'].items():
+                    totals[field] = totals.get(field, 0) + value
+                event = {**event, 'totals': dict(totals)}
+            elif event['type'] == 'resync':
+                self._stale.add(company_id)
+
+        for loop, subscription in subscribers:
+            loop.call_soon_threadsafe(_deliver, subscription, event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_kpi_broker():
+    """
+    The process-wide broker: ANALYTICS_KPI_BROKER (a dotted path to a class) or InProcessKpiBroker.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            broker_path = getattr(settings, 'ANALYTICS_KPI_BROKER', None)
+            _broker = import_string(broker_path)() if broker_path else InProcessKpiBroker()
+        return _broker
+
+
+def kpi_delta(revenue=Decimal('0.00'), profit=Decimal('0.00'), orders=0, low_stock_count=0):
+    """
+    Builds a delta event; fields that did not change are left out.
+    """
+    delta = {'revenue': revenue, 'profit': profit, 'orders': orders, 'low_stock_count': low_stock_count}
+    return {'type': 'delta', 'delta': {field: value for field, value in delta.items() if value}}
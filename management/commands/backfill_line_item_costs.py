@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+from inventory_app.analytics_cache import invalidate_company_cache
+from inventory_app.models import CompanyDailyMetric, Order_Items, Product, ProductSalesVelocity
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills Order_Items.cogs and net_profit where they are missing, in primary-key batches, then "
+        "rebuilds the derived daily and velocity tables of the affected companies. Rows that already "
+        "have them are left alone. Missing costs can only be taken from the product's current cost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            action='append',
+            dest='company_ids',
+            help="Only backfill the given company id. Can be passed more than once.",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows would be filled.")
+
+    def handle(self, *args, **options):
+        missing = Order_Items.objects.filter(Q(cogs__isnull=True) | Q(net_profit__isnull=True))
+        if options['company_ids']:
+            missing = missing.filter(order__company_id__in=options['company_ids'])
+
+        if options['dry_run']:
+            self.stdout.write(f"{missing.count()} line items are missing cogs or net_profit.")
+            return
+
+        # Computed in the database per batch: no join in the UPDATE itself, and no rows pulled into Python.
+        unit_cost = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('cost')[:1])
+        batch_size = options['batch_size']
+        last_pk = 0
+        processed = 0
+        company_ids = set()
+
+        while True:
+            batch_pks = list(missing.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch_pks:
+                break
+            last_pk = batch_pks[-1]
+
+            batch = Order_Items.objects.filter(pk__in=batch_pks)
+            with transaction.atomic():
+                batch.filter(cogs__isnull=True).update(cogs=F('quantity') * unit_cost)
+                batch.filter(net_profit__isnull=True, cogs__isnull=False).update(
+                    net_profit=F('quantity') * F('price') - F('cogs')
+                )
+            company_ids.update(batch.values_list('order__company_id', flat=True).distinct())
+            processed += len(batch_pks)
+            self.stdout.write(f"Processed {processed} line items (through pk {last_pk}).")
+
+        # bulk UPDATEs bypass signals, so the derived tables are rebuilt explicitly.
+        # Rebuilt daily rows are newer than every watermark, so the next monthly
+        # materialization run recomputes the affected months.
+        for company_id in sorted(company_ids):
+            CompanyDailyMetric.rebuild_for_company(company_id)
+            ProductSalesVelocity.rebuild_for_company(company_id)
+            invalidate_company_cache(company_id)
+            self.stdout.write(f"Company {company_id}: daily metrics and sales velocity rebuilt.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {processed} line items across {len(company_ids)} companies."
+        ))
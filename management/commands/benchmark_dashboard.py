@@ -0,0 +1,111 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from inventory_app import views
+from inventory_app.analytics_cache import invalidate_company_cache
+from inventory_app.synthetic_tenant import seed_synthetic_tenant
+
+
+# (name, view, GET params, needs company_id kwarg, is AJAX, max queries, must scale sub-linearly with history)
+# Views that still aggregate over the full order history (all-time totals) are
+# reported but not held to the sub-linear check.
+VIEW_CASES = [
+    ('kpi', 'get_kpi_data', {}, False, False, 8, False),
+    ('graph_sales_month', 'get_dashboard_graph_data', {'metric': 'sales', 'time_period': 'month'}, False, False, 8, True),
+    ('graph_profit_quarter', 'get_dashboard_graph_data', {'metric': 'profit', 'time_period': 'quarter'}, False, False, 8, True),
+    ('graph_orders_all', 'get_dashboard_graph_data', {'metric': 'num_orders', 'time_period': 'all'}, False, False, 8, True),
+    ('sales_trends', 'get_sales_trends_api_data', {}, True, False, 8, True),
+    ('all_monthly_trends', 'get_all_monthly_sales_trends_api_data', {'metrics': 'all'}, True, False, 10, False),
+    ('items_selling_well', 'get_items_selling_well_modal_content', {}, False, True, 8, True),
+    ('items_to_sell', 'items_to_sell_modal_view', {}, False, True, 8, True),
+    ('total_inventory_value', 'total_inventory_value_modal_view', {}, False, True, 10, True),
+    ('index', 'index', {}, False, False, 12, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds synthetic tenants of growing order history inside a rolled-back transaction and "
+        "asserts per-view query counts and that latency grows sub-linearly with history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=2000, help="Orders at scale 1.")
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--history-days', type=int, default=90, help="History length at scale 1.")
+        parser.add_argument('--scales', default='1,4,16', help="Comma-separated history multipliers.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per view (median is reported).")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        scales = sorted(int(s) for s in options['scales'].split(','))
+        factory = RequestFactory()
+        results = {}
+
+        with transaction.atomic():
+            for scale in scales:
+                company, user = seed_synthetic_tenant(
+                    products=options['products'],
+                    orders=options['orders'] * scale,
+                    items_per_order=options['items_per_order'],
+                    history_days=options['history_days'] * scale,
+                    seed=options['seed'] + scale,
+                )
+                self.stdout.write(f"Seeded scale x{scale}: {options['orders'] * scale} orders over {options['history_days'] * scale} days.")
+
+                for name, view_name, params, needs_company, is_ajax, _, _ in VIEW_CASES:
+                    view = getattr(views, view_name)
+                    kwargs = {'company_id': company.id} if needs_company else {}
+                    headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if is_ajax else {}
+
+                    timings = []
+                    query_count = 0
+                    for _ in range(options['repeat']):
+                        # Measure the computation, not the result cache.
+                        invalidate_company_cache(company.id)
+                        request = factory.get('/', params, **headers)
+                        request.user = user
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            view(request, **kwargs)
+                            timings.append(time.perf_counter() - started)
+                        query_count = len(queries)
+
+                    results[(name, scale)] = (statistics.median(timings), query_count)
+
+            # Never keep the synthetic tenants.
+            transaction.set_rollback(True)
+
+        self.report(scales, results)
+
+    def report(self, scales, results):
+        smallest, largest = scales[0], scales[-1]
+        history_growth = largest / smallest
+        failures = []
+
+        self.stdout.write("")
+        self.stdout.write(f"{'view':<24}" + "".join(f"{'x' + str(s):>18}" for s in scales) + f"{'growth':>10}")
+        for name, _, _, _, _, max_queries, sublinear in VIEW_CASES:
+            cells = "".join(
+                f"{results[(name, s)][0] * 1000:>10.1f}ms/{results[(name, s)][1]:>3}q" for s in scales
+            )
+            growth = results[(name, largest)][0] / max(results[(name, smallest)][0], 1e-9)
+            self.stdout.write(f"{name:<24}{cells}{growth:>9.2f}x")
+
+            query_counts = {results[(name, s)][1] for s in scales}
+            if max(query_counts) > max_queries:
+                failures.append(f"{name}: {max(query_counts)} queries (budget {max_queries})")
+            if len(query_counts) > 1:
+                failures.append(f"{name}: query count changes with history size {sorted(query_counts)}")
+            if sublinear and growth >= history_growth:
+                failures.append(f"{name}: latency grew {growth:.1f}x for {history_growth:.0f}x history")
+
+        if failures:
+            raise CommandError("Dashboard benchmark regressions:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All dashboard views within query budgets and sub-linear in history."))
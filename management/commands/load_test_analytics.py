@@ -0,0 +1,219 @@
+import math
+import queue
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from inventory_app import views
+from inventory_app.analytics_cache import invalidate_company_cache
+from inventory_app.models import Companies
+from inventory_app.synthetic_tenant import seed_synthetic_tenants
+
+
+GRAPH_METRICS = ['sales', 'profit', 'gross_profit_margin', 'num_orders']
+GRAPH_TIME_PERIODS = ['week', 'month', 'quarter', 'year', 'all']
+
+# (name, view, GET params, needs company_id kwarg, is AJAX)
+LOAD_CASES = [
+    ('kpi', 'get_kpi_data', {}, False, False),
+    *[
+        (f'graph_{metric}_{time_period}', 'get_dashboard_graph_data', {'metric': metric, 'time_period': time_period}, False, False)
+        for metric in GRAPH_METRICS
+        for time_period in GRAPH_TIME_PERIODS
+    ],
+    *[
+        (f'graph_sales_{time_period}_vs_{compare}', 'get_dashboard_graph_data',
+         {'metric': 'sales', 'time_period': time_period, 'compare': compare}, False, False)
+        for time_period in ['month', 'quarter']
+        for compare in ['previous', 'yoy']
+    ],
+    ('sales_trends', 'get_sales_trends_api_data', {}, True, False),
+    ('all_monthly_trends', 'get_all_monthly_sales_trends_api_data', {'metrics': 'all'}, True, False),
+    ('restock_recommendations', 'get_restock_recommendations', {}, False, False),
+    ('items_selling_well', 'get_items_selling_well_modal_content', {}, False, True),
+    ('items_to_sell', 'items_to_sell_modal_view', {}, False, True),
+    ('total_inventory_value', 'total_inventory_value_modal_view', {}, False, True),
+    ('historical_trends_modal', 'historical_trends_modal_content', {}, False, True),
+    ('graph_customization_modal', 'get_graph_customization_modal_content', {}, False, True),
+]
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the analytics views (KPIs, every graph metric x time period, trend APIs, modals) "
+        "from concurrent worker threads against committed tenant data, and reports p50/p95/p99 "
+        "latency and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            action='append',
+            dest='company_ids',
+            help="Load-test an existing company id. Can be passed more than once.",
+        )
+        parser.add_argument('--seed-companies', type=int, default=0, help="Seed this many synthetic tenants first.")
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=5000, help="Orders per seeded company.")
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--history-days', type=int, default=365)
+        parser.add_argument('--keep', action='store_true', help="Keep seeded tenants after the run.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent worker threads.")
+        parser.add_argument('--requests', type=int, default=50, help="Requests per view case.")
+        parser.add_argument('--case', action='append', dest='cases', help="Only run the named case(s).")
+        parser.add_argument('--cold', action='store_true', help="Invalidate the analytics cache before every request.")
+        parser.add_argument('--max-p95-ms', type=float, default=None, help="Fail if any case's p95 exceeds this.")
+        parser.add_argument('--max-queries', type=int, default=None, help="Fail if any request runs more queries.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        cases = [case for case in LOAD_CASES if not options['cases'] or case[0] in options['cases']]
+        if not cases:
+            raise CommandError("No matching cases. Known cases: " + ", ".join(case[0] for case in LOAD_CASES))
+
+        seeded = []
+        if options['seed_companies']:
+            seeded = seed_synthetic_tenants(
+                companies=options['seed_companies'],
+                seed=options['seed'],
+                name_prefix='Load Test Tenant',
+                products=options['products'],
+                orders=options['orders'],
+                items_per_order=options['items_per_order'],
+                history_days=options['history_days'],
+            )
+            self.stdout.write(f"Seeded {len(seeded)} tenants.")
+
+        tenants = seeded + [self.tenant_for(company_id) for company_id in options['company_ids'] or []]
+        if not tenants:
+            raise CommandError("Pass --company and/or --seed-companies.")
+
+        try:
+            results, wall_time = self.run_load(tenants, cases, options)
+        finally:
+            if seeded and not options['keep']:
+                for company, user in seeded:
+                    company.delete()
+                    user.delete()
+
+        self.report(cases, results, wall_time, options)
+
+    def tenant_for(self, company_id):
+        company = Companies.objects.filter(pk=company_id).first()
+        user = get_user_model().objects.filter(
+            profile__company_id=company_id, is_active=True
+        ).order_by('pk').first()
+        if company is None or user is None:
+            raise CommandError(f"Company {company_id} not found or has no active user.")
+        return company, user
+
+    def run_load(self, tenants, cases, options):
+        rng = random.Random(options['seed'])
+        jobs = [
+            (case, tenants[i % len(tenants)])
+            for case in cases
+            for i in range(options['requests'])
+        ]
+        # Interleave cases so every view runs under mixed load.
+        rng.shuffle(jobs)
+
+        pending = queue.SimpleQueue()
+        for job in jobs:
+            pending.put(job)
+
+        factory = RequestFactory()
+        results = {case[0]: [] for case in cases}
+
+        def worker():
+            samples = []
+            try:
+                # Open the connection up front so the first timed request doesn't pay for it.
+                connection.ensure_connection()
+                while True:
+                    try:
+                        job = pending.get_nowait()
+                    except queue.Empty:
+                        return samples
+                    samples.append(self.run_one(factory, job, options['cold']))
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            futures = [pool.submit(worker) for _ in range(options['concurrency'])]
+            for future in futures:
+                for name, elapsed, query_count, status in future.result():
+                    results[name].append((elapsed, query_count, status))
+        return results, time.perf_counter() - started
+
+    def run_one(self, factory, job, cold):
+        (name, view_name, params, needs_company, is_ajax), (company, user) = job
+        if cold:
+            invalidate_company_cache(company.id)
+
+        view = getattr(views, view_name)
+        kwargs = {'company_id': company.id} if needs_company else {}
+        headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if is_ajax else {}
+        request = factory.get('/', params, **headers)
+        request.user = user
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = view(request, **kwargs)
+            elapsed = time.perf_counter() - started
+        return name, elapsed, len(queries), response.status_code
+
+    def report(self, cases, results, wall_time, options):
+        failures = []
+        total_requests = sum(len(samples) for samples in results.values())
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'case':<34}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/req':>8}{'max q':>7}{'errors':>8}"
+        )
+        for name, *_ in cases:
+            samples = results[name]
+            timings = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+            query_counts = [query_count for _, query_count, _ in samples]
+            errors = sum(1 for _, _, status in samples if status >= 400)
+            p95 = percentile(timings, 95)
+
+            self.stdout.write(
+                f"{name:<34}{len(samples):>6}"
+                f"{percentile(timings, 50):>10.1f}{p95:>10.1f}{percentile(timings, 99):>10.1f}"
+                f"{sum(query_counts) / max(len(query_counts), 1):>8.1f}{max(query_counts, default=0):>7}{errors:>8}"
+            )
+
+            if errors:
+                failures.append(f"{name}: {errors} error responses")
+            if options['max_p95_ms'] is not None and p95 > options['max_p95_ms']:
+                failures.append(f"{name}: p95 {p95:.1f}ms (budget {options['max_p95_ms']:.1f}ms)")
+            if options['max_queries'] is not None and max(query_counts, default=0) > options['max_queries']:
+                failures.append(f"{name}: {max(query_counts)} queries (budget {options['max_queries']})")
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{total_requests} requests in {wall_time:.1f}s at concurrency {options['concurrency']} "
+            f"({total_requests / max(wall_time, 1e-9):.1f} req/s)."
+        )
+
+        if failures:
+            raise CommandError("Load test regressions:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All analytics views within budget."))
@@ -0,0 +1,45 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.metrics_materialization import run_monthly_materialization
+
+
+class Command(BaseCommand):
+    help = (
+        "Materializes CompanyMonthlyMetric from the daily rollup. Only months touched since each "
+        "company's watermark are recomputed unless --full is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            action='append',
+            dest='company_ids',
+            help="Only materialize the given company id. Can be passed more than once.",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Size of the process pool (1 runs in-process).",
+        )
+        parser.add_argument('--full', action='store_true', help="Recompute every month, ignoring watermarks.")
+
+    def handle(self, *args, **options):
+        results = run_monthly_materialization(
+            company_ids=options['company_ids'],
+            workers=options['workers'],
+            full=options['full'],
+        )
+
+        errors = [(company_id, error) for company_id, _, error in results if error]
+        months = sum(count for _, count, _ in results)
+        self.stdout.write(f"Recomputed {months} months across {len(results)} companies.")
+
+        if errors:
+            for company_id, error in errors:
+                self.stderr.write(f"Company {company_id}: {error}")
+            raise CommandError(f"{len(errors)} companies failed to materialize.")
+        self.stdout.write(self.style.SUCCESS("Monthly metrics are up to date."))
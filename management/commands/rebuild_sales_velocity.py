@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.models import Orders, ProductSalesVelocity
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the ProductSalesVelocity table (last paid sale per product) from paid orders. A repair tool; signals keep it current."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            action='append',
+            dest='company_ids',
+            help="Only rebuild the given company id. Can be passed more than once.",
+        )
+
+    def handle(self, *args, **options):
+        company_ids = options['company_ids'] or list(
+            Orders.objects.filter(status='paid').values_list('company_id', flat=True).distinct()
+        )
+
+        for company_id in company_ids:
+            count = ProductSalesVelocity.rebuild_for_company(company_id)
+            self.stdout.write(f"Company {company_id}: {count} product velocity rows rebuilt.")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales velocity for {len(company_ids)} companies."))
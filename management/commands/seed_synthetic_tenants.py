@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.synthetic_tenant import seed_synthetic_tenants
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates synthetic tenants (company, user, products, orders and line items over a history) "
+        "with bulk_create, and builds their derived metric tables. Data is committed; use it on "
+        "staging/load-test databases only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=5000, help="Orders per company.")
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--history-days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--name-prefix', default='Synthetic Tenant')
+
+    def handle(self, *args, **options):
+        tenants = seed_synthetic_tenants(
+            companies=options['companies'],
+            seed=options['seed'],
+            name_prefix=options['name_prefix'],
+            products=options['products'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            history_days=options['history_days'],
+        )
+
+        for company, user in tenants:
+            self.stdout.write(f"Company {company.id} ({company.name}): user {user.username}")
+
+        line_items = options['orders'] * options['items_per_order'] * len(tenants)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(tenants)} companies with about {line_items} line items in total."
+        ))
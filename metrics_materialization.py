@@ -0,0 +1,146 @@
+"""
+Materialization of CompanyMonthlyMetric from the CompanyDailyMetric rollup.
+
+Each company keeps a watermark (CompanyMetricsWatermark). A run only recomputes the
+months that contain daily rows updated since that watermark, so a nightly pass over
+thousands of tenants touches little more than the current month for each of them.
+
+last_updated is stamped by the application clock when a row is written, not when its
+transaction commits, so a row written just before a run but committed after it would fall
+behind the watermark. Each run therefore re-reads ANALYTICS_MATERIALIZATION_OVERLAP_SECONDS
+(default 300) before the watermark; recomputing a month twice is harmless. Keep the overlap
+above the longest write transaction plus the clock skew between app servers.
+Companies are processed in parallel with a process pool.
+
+Entry points:
+    materialize_company_monthly_metrics(company_id, full=False)  -- one company, in-process
+    run_monthly_materialization(company_ids=None, workers=None, full=False)  -- scheduler/cron/Celery friendly
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from inventory_app.analytics_cache import invalidate_company_cache
+from inventory_app.models import CompanyDailyMetric, CompanyMetricsWatermark, CompanyMonthlyMetric
+
+
+DEFAULT_OVERLAP_SECONDS = 300
+
+
+def get_watermark_overlap():
+    return timedelta(seconds=getattr(settings, 'ANALYTICS_MATERIALIZATION_OVERLAP_SECONDS', DEFAULT_OVERLAP_SECONDS))
+
+
+def materialize_company_monthly_metrics(company_id, full=False):
+    """
+    Recomputes the company's monthly metrics for every month touched since its watermark
+    (or every month when `full` is set). Returns the number of months recomputed.
+    """
+    # Taken before reading so rows updated during the run are picked up next time.
+    run_started = timezone.now()
+
+    watermark, _ = CompanyMetricsWatermark.objects.get_or_create(company_id=company_id)
+    daily_metrics = CompanyDailyMetric.objects.filter(company_id=company_id)
+
+    touched = daily_metrics
+    if not full and watermark.monthly_metrics_through:
+        touched = touched.filter(last_updated__gt=watermark.monthly_metrics_through - get_watermark_overlap())
+    touched_months = set(touched.dates('day', 'month'))
+
+    if not touched_months and not full:
+        watermark.monthly_metrics_through = run_started
+        watermark.save(update_fields=['monthly_metrics_through'])
+        return 0
+
+    monthly_rows = {}
+    if touched_months:
+        monthly_rows = {
+            # TruncMonth over a DateField yields plain dates, matching dates('day', 'month').
+            row['period']: row
+            for row in daily_metrics.filter(
+                day__gte=min(touched_months)
+            ).annotate(
+                period=TruncMonth('day')
+            ).values('period').annotate(
+                revenue=Coalesce(Sum('total_daily_revenue'), Decimal('0.00')),
+                profit=Coalesce(Sum('net_daily_profit'), Decimal('0.00')),
+                cogs=Coalesce(Sum('total_daily_cogs'), Decimal('0.00')),
+                orders=Coalesce(Sum('total_daily_orders'), 0),
+                units=Coalesce(Sum('total_products_sold'), 0),
+            ).order_by('period')
+        }
+
+    with transaction.atomic():
+        if full:
+            CompanyMonthlyMetric.objects.filter(company_id=company_id).delete()
+
+        for month in sorted(touched_months):
+            row = monthly_rows.get(month)
+            if not row or not row['orders']:
+                # Every paid order in the month went away.
+                CompanyMonthlyMetric.objects.filter(company_id=company_id, year=month.year, month=month.month).delete()
+                continue
+
+            CompanyMonthlyMetric.objects.update_or_create(
+                company_id=company_id,
+                year=month.year,
+                month=month.month,
+                defaults={
+                    'date_recorded': date(month.year, month.month, 1),
+                    'total_monthly_revenue': row['revenue'],
+                    'net_monthly_profit': row['profit'],
+                    'total_monthly_cogs': row['cogs'],
+                    'total_products_sold': row['units'],
+                }
+            )
+
+        watermark.monthly_metrics_through = run_started
+        watermark.save(update_fields=['monthly_metrics_through'])
+
+    # The trend endpoints cache results read from this table.
+    transaction.on_commit(lambda: invalidate_company_cache(company_id))
+    return len(touched_months)
+
+
+def _init_worker():
+    # Child processes must not reuse the parent's database connections.
+    django.setup()
+    connections.close_all()
+
+
+def _materialize_in_worker(company_id, full):
+    try:
+        return company_id, materialize_company_monthly_metrics(company_id, full=full), None
+    except Exception as exc:  # reported back to the parent, which keeps going
+        return company_id, 0, repr(exc)
+    finally:
+        connections.close_all()
+
+
+def run_monthly_materialization(company_ids=None, workers=None, full=False):
+    """
+    Materializes monthly metrics for the given companies (default: every company with daily metrics).
+    With workers > 1, companies are spread across a process pool.
+    Returns a list of (company_id, months_recomputed, error) tuples.
+    """
+    if company_ids is None:
+        company_ids = list(CompanyDailyMetric.objects.values_list('company_id', flat=True).distinct().order_by())
+
+    if not workers or workers <= 1:
+        return [_materialize_in_worker(company_id, full) for company_id in company_ids]
+
+    # Close the parent's connections before forking so no socket is shared with the children.
+    connections.close_all()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_materialize_in_worker, company_id, full) for company_id in company_ids]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
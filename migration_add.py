@@ -0,0 +1,205 @@
+#
+#
+#
+#
+#
+# inventory_app/migrations/XXXX_company_daily_metric.py
+# Creates the CompanyDailyMetric rollup table (see Add_models.py). Fill it for existing
+# companies with CompanyDailyMetric.rebuild_for_company().
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        # ... (latest inventory_app migration)
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyDailyMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total_daily_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_daily_order_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('net_daily_profit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_daily_cogs', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_daily_orders', models.PositiveIntegerField(default=0)),
+                ('total_products_sold', models.PositiveIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='daily_metrics',
+                    to='inventory_app.companies',
+                )),
+            ],
+            options={
+                'ordering': ['day'],
+                'unique_together': {('company', 'day')},
+            },
+        ),
+    ]
+
+
+# inventory_app/migrations/XXXX_company_metrics_watermark.py
+# Creates the CompanyMetricsWatermark table used by metrics_materialization.py. Companies
+# without a row get one on their first run, which then materializes every month.
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        # ... (latest inventory_app migration)
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyMetricsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monthly_metrics_through', models.DateTimeField(blank=True, null=True)),
+                ('company', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='metrics_watermark',
+                    to='inventory_app.companies',
+                )),
+            ],
+        ),
+    ]
+
+
+# inventory_app/migrations/XXXX_product_sales_velocity.py
+# Creates the ProductSalesVelocity table (see Add_models.py). Fill it for existing
+# companies with the rebuild_sales_velocity command.
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        # ... (latest inventory_app migration)
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesVelocity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_sale_date', models.DateTimeField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='sales_velocity',
+                    to='inventory_app.product',
+                )),
+                ('company', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='product_sales_velocities',
+                    to='inventory_app.companies',
+                )),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['company', 'last_sale_date'], name='velocity_company_last_sale_idx'),
+                ],
+            },
+        ),
+    ]
+
+
+# inventory_app/migrations/XXXX_tenant_context_version.py
+# Creates the TenantContextVersion table (see Add_models.py and tenant_context.py).
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        # ... (latest inventory_app migration)
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantContextVersion',
+            fields=[
+                ('user', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True,
+                    related_name='+',
+                    serialize=False,
+                    to=settings.AUTH_USER_MODEL,
+                )),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
+
+
+# inventory_app/migrations/XXXX_dashboard_access_path_indexes.py
+# Indexes declared in the models' Meta (see Add_models.py), created with
+# CREATE INDEX CONCURRENTLY so large tenants' tables stay writable during the migration.
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+from django.db.models import F, Q
+from django.db.models.functions import Upper
+
+
+class Migration(migrations.Migration):
+    # Concurrent index builds cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        # ... (latest inventory_app migration)
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='orders',
+            index=models.Index(fields=['company', 'status', 'order_date'], name='orders_company_status_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orders',
+            index=models.Index(
+                fields=['company', 'order_date'],
+                name='orders_paid_company_date_idx',
+                condition=Q(status='paid'),
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='order_items',
+            index=models.Index(fields=['product', 'order'], name='order_items_product_order_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            # Expression index on UPPER(name): what icontains compares against on Postgres.
+            index=GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_upper_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=GinIndex(OpClass(Upper('barcode'), name='gin_trgm_ops'), name='product_barcode_upper_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['company', 'stock', 'name'], name='product_company_stock_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(
+                fields=['company', 'stock'],
+                name='product_low_stock_idx',
+                condition=Q(stock__lte=F('low_stock_input')),
+            ),
+        ),
+    ]
@@ -0,0 +1,189 @@
+"""
+Read-replica routing for the analytics views.
+
+Views wrapped in ``analytics_read_replica`` run their ORM reads against the database alias
+named by ``ANALYTICS_READ_REPLICA`` (unset: everything stays on the primary), so dashboard
+aggregates don't compete with POS checkout transactions. Writes always go to the primary.
+
+Freshness policy -- a request reads from the primary instead when:
+  * the user's session wrote anything in the last ``ANALYTICS_REPLICA_PIN_SECONDS``
+    (default 5), so users see their own orders right away. ``ReplicaPinningMiddleware``
+    notices writes through the router and stamps the session;
+  * the primary connection is inside a transaction (e.g. ATOMIC_REQUESTS).
+Other users of a company that just changed keep reading from the replica, so busy tenants
+still get its benefit. What must not happen is that the cache miss following the write's
+version bump fills the new version with pre-write replica data for a whole TTL: the cache
+decorators skip storing a result read from the replica while the company's cache version is
+younger than the pin window (see ``refill_is_cacheable`` in analytics_cache.py). That check
+uses the shared analytics cache, which already has to be shared for invalidation to work.
+The pin window should exceed the replica's usual replication lag.
+
+Models of ``ANALYTICS_REPLICA_EXCLUDED_APPS`` (default: sessions and the database cache
+table) are never read from the replica.
+
+Wiring (see settings_add.py):
+    DATABASE_ROUTERS = ['inventory_app.read_replica.AnalyticsReplicaRouter']
+    MIDDLEWARE += ['inventory_app.read_replica.ReplicaPinningMiddleware']
+"""
+import contextvars
+import functools
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+SESSION_PIN_KEY = '_analytics_primary_until'
+DEFAULT_PIN_SECONDS = 5
+DEFAULT_EXCLUDED_APPS = ('sessions', 'django_cache')
+
+# Alias reads are routed to while an analytics view runs (None: primary).
+_read_alias = contextvars.ContextVar('analytics_read_alias', default=None)
+# Per-request {'wrote': bool}, shared (not copied) with worker threads of the request.
+_request_writes = contextvars.ContextVar('analytics_request_writes', default=None)
+
+
+def get_replica_alias():
+    alias = getattr(settings, 'ANALYTICS_READ_REPLICA', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def get_pin_seconds():
+    return getattr(settings, 'ANALYTICS_REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS)
+
+
+def _is_excluded(model):
+    return model._meta.app_label in getattr(settings, 'ANALYTICS_REPLICA_EXCLUDED_APPS', DEFAULT_EXCLUDED_APPS)
+
+
+def current_read_alias():
+    """
+    The alias the running analytics view reads from (None: primary). Querysets evaluated
+    after the view returns, e.g. streamed exports, bind to it with .using().
+    """
+    return _read_alias.get()
+
+
+def replica_alias_for(request):
+    """
+    The alias an analytics request should read from, or None for the primary.
+    """
+    alias = get_replica_alias()
+    if alias is None:
+        return None
+    session = getattr(request, 'session', None)
+    if session is not None and session.get(SESSION_PIN_KEY, 0) > time.time():
+        return None
+    return alias
+
+
+def analytics_read_replica(view_func):
+    """
+    Routes the view's reads to the replica, subject to the freshness policy above.
+    Place it below the cache decorators, so cache hits never resolve it; the alias is left
+    on the request (``_analytics_read_alias``) for them to decide whether to store the result.
+    Wraps both sync and ``async def`` views; worker threads started through sync_to_async
+    inherit the routing.
+    """
+    def resolve_alias(request):
+        alias = replica_alias_for(request)
+        request._analytics_read_alias = alias
+        return alias
+
+    if iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _read_alias.set(await sync_to_async(resolve_alias)(request))
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _read_alias.set(resolve_alias(request))
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class AnalyticsReplicaRouter:
+    """
+    Sends reads made inside analytics_read_replica views to the replica; leaves every
+    other routing decision to Django's defaults (the primary).
+    """
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or _is_excluded(model):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction must see its writes.
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None and not _is_excluded(model):
+            writes['wrote'] = True
+        # Explicitly the primary: returning None would let Django fall back to the instance's
+        # _state.db, i.e. the replica for anything loaded inside analytics_read_replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data.
+        databases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == get_replica_alias():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pins the session to the primary for the pin window after a request that wrote to the
+    database. Must come after SessionMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        writes = {'wrote': False}
+        token = _request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_writes.reset(token)
+        self.pin_session(request, writes)
+        return response
+
+    async def __acall__(self, request):
+        writes = {'wrote': False}
+        token = _request_writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_writes.reset(token)
+        if writes['wrote']:
+            await sync_to_async(self.pin_session)(request, writes)
+        return response
+
+    def pin_session(self, request, writes):
+        session = getattr(request, 'session', None)
+        if writes['wrote'] and session is not None and get_replica_alias() is not None:
+            session[SESSION_PIN_KEY] = time.time() + get_pin_seconds()
@@ -0,0 +1,287 @@
+"""
+Restock recommendations: reorder points and order quantities for every product of a company.
+
+Demand is measured from paid sales over the last ``window_days`` (default 90). For each
+product, with d = mean daily units and s = standard deviation of daily units (days without
+sales count as 0), lead time L days and review period R days:
+
+    safety_stock  = z * s * sqrt(L)                  (z from the service level, e.g. 0.95 -> 1.645)
+    reorder_point = ceil(d * L + safety_stock)
+    target_stock  = ceil(d * (L + R) + safety_stock)
+    reorder_qty   = target_stock - stock, once stock <= reorder_point (else 0)
+
+This replaces the hand-set ``low_stock_input`` threshold with one derived from the product's
+own sales; the threshold is still returned alongside for comparison.
+
+The whole company is computed in one batch: one grouped query returns units per (product,
+day) over the window, and mean/variance for every product come from ``np.bincount`` sums and
+sums of squares. There is no per-product Python loop, so 50k SKUs stay cheap. The resulting
+column arrays are snapshotted in the analytics cache under the company's data version (see
+analytics_cache.py), ordered by supplier so a supplier's recommendations form one purchase
+list. Pages and CSV exports slice that snapshot.
+
+Entry points:
+    get_restock_plan(company, params)                         -- cached column arrays
+    restock_selection(plan, supplier_id, needs_reorder_only)  -- filtered row indices
+    restock_supplier_summary(plan, indices)                   -- per-supplier totals
+    restock_rows(plan, indices)                               -- JSON-ready rows
+"""
+import math
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory_app.analytics_cache import (
+    get_analytics_cache,
+    get_analytics_cache_timeout,
+    make_cache_key,
+    refill_is_cacheable,
+)
+from inventory_app.models import Order_Items, Product
+from inventory_app.read_replica import current_read_alias
+
+
+DEFAULT_WINDOW_DAYS = 90
+DEFAULT_LEAD_TIME_DAYS = 7
+DEFAULT_REVIEW_DAYS = 14
+DEFAULT_SERVICE_LEVEL = 0.95
+
+# Column name -> JSON conversion, in output order.
+RESTOCK_COLUMNS = {
+    'product_id': int,
+    'name': str,
+    'barcode': str,
+    'supplier_id': int,
+    'supplier_name': str,
+    'stock': int,
+    'low_stock_input': int,
+    'daily_demand': float,
+    'demand_std': float,
+    'safety_stock': float,
+    'reorder_point': int,
+    'target_stock': int,
+    'reorder_qty': int,
+    'reorder_cost': float,
+    'days_of_cover': float,
+    'needs_reorder': bool,
+}
+
+
+def default_restock_params():
+    return {
+        'window_days': getattr(settings, 'ANALYTICS_RESTOCK_WINDOW_DAYS', DEFAULT_WINDOW_DAYS),
+        'lead_time_days': getattr(settings, 'ANALYTICS_RESTOCK_LEAD_TIME_DAYS', DEFAULT_LEAD_TIME_DAYS),
+        'review_days': getattr(settings, 'ANALYTICS_RESTOCK_REVIEW_DAYS', DEFAULT_REVIEW_DAYS),
+        'service_level': getattr(settings, 'ANALYTICS_RESTOCK_SERVICE_LEVEL', DEFAULT_SERVICE_LEVEL),
+    }
+
+
+def parse_restock_params(query_params):
+    """
+    Reads window_days, lead_time_days, review_days (positive ints, at most 365) and
+    service_level (0.5 <= p < 1) over the defaults. Returns (params, error_message).
+    """
+    params = default_restock_params()
+    try:
+        for name in ('window_days', 'lead_time_days', 'review_days'):
+            if query_params.get(name):
+                params[name] = int(query_params[name])
+        if query_params.get('service_level'):
+            params['service_level'] = float(query_params['service_level'])
+    except ValueError:
+        return None, 'Invalid restock parameter.'
+
+    if not all(1 <= params[name] <= 365 for name in ('window_days', 'lead_time_days', 'review_days')):
+        return None, 'window_days, lead_time_days and review_days must be between 1 and 365.'
+    if not 0.5 <= params['service_level'] < 1:
+        return None, 'service_level must be at least 0.5 and below 1.'
+    return params, None
+
+
+def load_product_columns(company):
+    """
+    One row per product of the company, as column arrays ordered by product id.
+    """
+    rows = list(Product.objects.filter(company=company).order_by('id').values_list(
+        'id', 'name', 'barcode', 'supplier_id', 'supplier__name', 'stock', 'low_stock_input', 'cost'
+    ))
+    ids, names, barcodes, supplier_ids, supplier_names, stock, low_stock_input, cost = zip(*rows) if rows else ([],) * 8
+    return {
+        'product_id': np.array(ids, dtype='int64'),
+        'name': np.array(names, dtype=object),
+        'barcode': np.array(barcodes, dtype=object),
+        'supplier_id': np.array(supplier_ids, dtype=object),
+        'supplier_name': np.array(supplier_names, dtype=object),
+        'stock': np.array([s or 0 for s in stock], dtype='int64'),
+        'low_stock_input': np.array([t or 0 for t in low_stock_input], dtype='int64'),
+        'cost': np.array([float(c or 0) for c in cost], dtype='float64'),
+    }
+
+
+def load_daily_demand(company, start):
+    """
+    Units sold per (product, day) on paid orders since `start` (aware datetime), from one
+    grouped query. Returns (product_ids, units) arrays; the day only splits the groups.
+    """
+    rows = Order_Items.objects.filter(
+        order__company=company,
+        order__status='paid',
+        order__order_date__gte=start,
+    ).values('product_id', day=TruncDate('order__order_date')).annotate(
+        units=Sum('quantity')
+    ).order_by().values_list('product_id', 'units')
+    rows = list(rows)
+    product_ids = np.fromiter((r[0] for r in rows), dtype='int64', count=len(rows))
+    units = np.fromiter((r[1] or 0 for r in rows), dtype='float64', count=len(rows))
+    return product_ids, units
+
+
+def demand_statistics(product_ids, demand_product_ids, demand_units, window_days):
+    """
+    Mean and standard deviation of daily units for every product in `product_ids` (sorted),
+    given the non-zero (product, day) totals of the window.
+    """
+    n = len(product_ids)
+    if n == 0 or len(demand_product_ids) == 0:
+        return np.zeros(n), np.zeros(n)
+
+    positions = np.searchsorted(product_ids, demand_product_ids)
+    positions = np.minimum(positions, n - 1)
+    matched = product_ids[positions] == demand_product_ids
+    totals = np.bincount(positions[matched], weights=demand_units[matched], minlength=n)
+    squares = np.bincount(positions[matched], weights=demand_units[matched] ** 2, minlength=n)
+
+    mean = totals / window_days
+    variance = np.maximum(squares / window_days - mean ** 2, 0)
+    return mean, np.sqrt(variance)
+
+
+def _supplier_order(plan):
+    # Supplier name (unassigned last), then most urgent first: needs reorder, fewest days of cover.
+    supplier_names = plan['supplier_name']
+    has_no_supplier = np.array([name is None for name in supplier_names])
+    names = np.array([name or '' for name in supplier_names])
+    return np.lexsort((plan['product_id'], plan['days_of_cover'], ~plan['needs_reorder'], names, has_no_supplier))
+
+
+def compute_restock_plan(company, params, now=None):
+    """
+    Computes the restock columns for every product of the company in one batch.
+    """
+    now = now or timezone.now()
+    window_days = params['window_days']
+    lead_time = params['lead_time_days']
+    z = NormalDist().inv_cdf(params['service_level'])
+
+    today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    window_start = today_start - timedelta(days=window_days - 1)
+
+    plan = load_product_columns(company)
+    demand_product_ids, demand_units = load_daily_demand(company, window_start)
+    mean, std = demand_statistics(plan['product_id'], demand_product_ids, demand_units, window_days)
+
+    stock = plan['stock']
+    safety_stock = z * std * math.sqrt(lead_time)
+    reorder_point = np.ceil(mean * lead_time + safety_stock).astype('int64')
+    target_stock = np.ceil(mean * (lead_time + params['review_days']) + safety_stock).astype('int64')
+    needs_reorder = (mean > 0) & (stock <= reorder_point)
+    reorder_qty = np.where(needs_reorder, np.maximum(target_stock - stock, 0), 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(mean > 0, np.maximum(stock, 0) / mean, np.inf)
+
+    plan.update({
+        'daily_demand': mean,
+        'demand_std': std,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'target_stock': target_stock,
+        'reorder_qty': reorder_qty,
+        'reorder_cost': reorder_qty * plan['cost'],
+        'days_of_cover': days_of_cover,
+        'needs_reorder': needs_reorder,
+    })
+    order = _supplier_order(plan)
+    plan = {name: column[order] for name, column in plan.items()}
+    plan['generated_at'] = now.isoformat()
+    return plan
+
+
+def get_restock_plan(company, params):
+    """
+    Returns the company's restock plan from the versioned snapshot, computing it on a miss.
+    """
+    cache = get_analytics_cache()
+    key = make_cache_key(company.id, 'restock_plan', params)
+    plan = cache.get(key)
+    if plan is None:
+        plan = compute_restock_plan(company, params)
+        if refill_is_cacheable(company.id, current_read_alias()):
+            cache.set(key, plan, timeout=get_analytics_cache_timeout())
+    return plan
+
+
+def restock_selection(plan, supplier_id=None, needs_reorder_only=False):
+    """
+    Indices of the plan rows matching the filters, in plan order.
+    """
+    mask = np.ones(len(plan['product_id']), dtype=bool)
+    if supplier_id is not None:
+        mask &= plan['supplier_id'] == supplier_id
+    if needs_reorder_only:
+        mask &= plan['needs_reorder']
+    return np.flatnonzero(mask)
+
+
+def restock_supplier_summary(plan, indices):
+    """
+    Per-supplier totals over the selected rows: products, products to reorder, units and cost.
+    """
+    if len(indices) == 0:
+        return []
+    supplier_ids = plan['supplier_id'][indices]
+    keys = np.array([-1 if s is None else s for s in supplier_ids], dtype='int64')
+    unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    product_count = np.bincount(inverse)
+    reorder_count = np.bincount(inverse, weights=plan['needs_reorder'][indices])
+    reorder_units = np.bincount(inverse, weights=plan['reorder_qty'][indices])
+    reorder_cost = np.bincount(inverse, weights=plan['reorder_cost'][indices])
+
+    summary = [
+        {
+            'supplier_id': None if key == -1 else int(key),
+            'supplier_name': plan['supplier_name'][indices[first[i]]],
+            'product_count': int(product_count[i]),
+            'reorder_count': int(reorder_count[i]),
+            'reorder_units': int(reorder_units[i]),
+            'reorder_cost': round(float(reorder_cost[i]), 2),
+        }
+        for i, key in enumerate(unique_keys)
+    ]
+    return sorted(summary, key=lambda row: (row['supplier_name'] is None, row['supplier_name'] or ''))
+
+
+def _json_value(value, convert):
+    if value is None:
+        return None
+    if convert is float:
+        value = float(value)
+        return round(value, 2) if math.isfinite(value) else None
+    return convert(value)
+
+
+def restock_rows(plan, indices):
+    """
+    Plan rows for the given indices as JSON-friendly dicts (infinite days of cover -> None).
+    """
+    columns = {name: plan[name][indices] for name in RESTOCK_COLUMNS}
+    return [
+        {name: _json_value(columns[name][i], convert) for name, convert in RESTOCK_COLUMNS.items()}
+        for i in range(len(indices))
+    ]
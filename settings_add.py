@@ -0,0 +1,93 @@
+#
+#
+#
+#
+#
+# --- Analytics result cache (see inventory_app/analytics_cache.py) ---
+# LocMemCache evicts least-recently-used entries past MAX_ENTRIES and expires by TIMEOUT.
+# For multiple workers, point the 'analytics' alias at a shared backend, e.g.
+# 'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'analytics',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+ANALYTICS_CACHE_ALIAS = 'analytics'
+ANALYTICS_CACHE_TIMEOUT = 300  # seconds
+
+# --- Analytics view profiling (see inventory_app/instrumentation.py) ---
+ANALYTICS_PROFILING_SAMPLE_RATE = 0.1  # fraction of analytics requests instrumented; 0 disables
+ANALYTICS_PROFILING_BUFFER_SIZE = 500  # recent samples kept per worker process
+
+# --- Async dashboard APIs (Django >= 5.1, served under ASGI) ---
+# Threads kept for running an async view's independent queries concurrently; each holds
+# its own connection (subject to CONN_MAX_AGE), so count them against the database's limit.
+ANALYTICS_ASYNC_QUERY_WORKERS = 8
+
+# --- Monthly metric materialization (see inventory_app/metrics_materialization.py) ---
+# Each run re-reads daily rows updated this long before the watermark, to catch rows that
+# committed after the previous run started. Keep it above the longest write transaction.
+ANALYTICS_MATERIALIZATION_OVERLAP_SECONDS = 300
+
+# --- Modal fragment caching (see inventory_app/analytics_cache.py) ---
+# Data-backed modal partials are cached per company version and revalidated with ETags.
+# Static modal shells are cached by the browser for ANALYTICS_STATIC_FRAGMENT_MAX_AGE;
+# bump ANALYTICS_FRAGMENT_VERSION on deploys that change those templates.
+ANALYTICS_FRAGMENT_VERSION = '1'
+ANALYTICS_STATIC_FRAGMENT_MAX_AGE = 86400  # seconds
+# Compiled templates are reused across requests by the cached template loader, which Django
+# enables by default when TEMPLATES[...]['OPTIONS'] has no 'loaders'. If the project lists
+# loaders explicitly, wrap them:
+# 'loaders': [('django.template.loaders.cached.Loader', [
+#     'django.template.loaders.filesystem.Loader',
+#     'django.template.loaders.app_directories.Loader',
+# ])],
+
+# --- Tenant context (see inventory_app/tenant_context.py) ---
+# Resolves the user's company and memberships once per request and caches them in the session.
+# Must come after django.contrib.auth.middleware.AuthenticationMiddleware.
+MIDDLEWARE += ['inventory_app.tenant_context.TenantContextMiddleware']
+ANALYTICS_TENANT_CONTEXT_TTL = 300  # seconds a session-cached tenant context is trusted
+
+# --- Live KPI stream (see inventory_app/kpi_stream.py) ---
+# The default in-process broker only reaches streams served by the same worker process;
+# set ANALYTICS_KPI_BROKER to a dotted path of a shared broker class for multi-worker deployments.
+# Each open dashboard holds its stream request open: enable only when served under ASGI
+# (under WSGI every tab would pin a worker thread) and on Django >= 5.1.
+ANALYTICS_KPI_STREAM_ENABLED = False
+ANALYTICS_KPI_BROKER = None
+ANALYTICS_KPI_STREAM_RESYNC_SECONDS = 300  # running totals are reloaded at least this often
+
+# --- Approximate all-time graph (see get_dashboard_graph_data) ---
+# Tenants with at least this many closed months get time_period=all from the monthly rollup
+# (months after the last materialized one are computed exactly). Opt-in: None disables the
+# automatic switch, so only ?precision=approximate uses it; e.g. 24 turns it on.
+ANALYTICS_APPROXIMATE_GRAPH_MIN_MONTHS = None
+
+# --- Analytics read replica (see inventory_app/read_replica.py) ---
+# Analytics views read from this database alias; None keeps every query on 'default'.
+# To try it locally, add a second database, e.g. a Postgres streaming replica, or for SQLite:
+# DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+# A user's session reads from the primary for ANALYTICS_REPLICA_PIN_SECONDS after it writes,
+# and results read from the replica within that window of a company's last write are not cached.
+# ReplicaPinningMiddleware must come after SessionMiddleware.
+DATABASE_ROUTERS = ['inventory_app.read_replica.AnalyticsReplicaRouter']
+MIDDLEWARE += ['inventory_app.read_replica.ReplicaPinningMiddleware']
+ANALYTICS_READ_REPLICA = None
+ANALYTICS_REPLICA_PIN_SECONDS = 5  # keep above the replica's usual replication lag
+ANALYTICS_REPLICA_EXCLUDED_APPS = ('sessions', 'django_cache')  # never read from the replica
+
+# --- Restock recommendations (see inventory_app/restock_engine.py) ---
+# Defaults for the reorder-point model; each can be overridden per request.
+ANALYTICS_RESTOCK_WINDOW_DAYS = 90     # days of sales history used for demand rate and variability
+ANALYTICS_RESTOCK_LEAD_TIME_DAYS = 7   # supplier lead time
+ANALYTICS_RESTOCK_REVIEW_DAYS = 14     # days an order should cover beyond the lead time
+ANALYTICS_RESTOCK_SERVICE_LEVEL = 0.95  # target probability of not stocking out during the lead time
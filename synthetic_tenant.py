@@ -0,0 +1,122 @@
+"""
+Synthetic tenant generator for benchmarking and load-testing the analytics views.
+
+Creates companies with products, paid/pending orders and line items spread over a
+configurable history, using bulk_create throughout. bulk_create bypasses signals,
+so the derived tables (CompanyDailyMetric, ProductSalesVelocity, CompanyMonthlyMetric)
+are rebuilt at the end of each tenant.
+
+Entry points:
+    seed_synthetic_tenant(...)            -- one company, returns (company, user)
+    seed_synthetic_tenants(companies, ...)  -- several companies, returns [(company, user), ...]
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from inventory_app.metrics_materialization import materialize_company_monthly_metrics
+from inventory_app.models import (
+    Companies,
+    CompanyDailyMetric,
+    Order_Items,
+    Orders,
+    Product,
+    ProductSalesVelocity,
+)
+
+
+BATCH_SIZE = 2000
+
+
+def seed_synthetic_tenant(products=500, orders=5000, items_per_order=3, history_days=365, seed=None, name=None):
+    """
+    Seeds one synthetic company and returns (company, user).
+    The user has a profile linked to the company so the views can be called as that tenant.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    suffix = f"{now:%Y%m%d%H%M%S}-{rng.randint(0, 10**6)}"
+
+    company = Companies.objects.create(name=name or f"Synthetic Tenant {suffix}")
+
+    user = get_user_model().objects.create_user(username=f"synthetic-{suffix}", password=None)
+    # UserProfile is created by the post_save signal on User.
+    profile = user.profile
+    profile.company = company
+    profile.save()
+    company.employees.add(profile)
+
+    product_objs = []
+    for i in range(products):
+        cost = Decimal(rng.randint(100, 5000)) / 100
+        product_objs.append(Product(
+            company=company,
+            name=f"Product {i:06d}",
+            barcode=f"{rng.randint(10**11, 10**12 - 1)}",
+            cost=cost,
+            price=(cost * Decimal('1.35')).quantize(Decimal('0.01')),
+            stock=rng.randint(0, 200),
+            low_stock_input=rng.randint(5, 20),
+        ))
+    product_objs = Product.objects.bulk_create(product_objs, batch_size=BATCH_SIZE)
+
+    order_objs = []
+    for _ in range(orders):
+        order_objs.append(Orders(
+            company=company,
+            status='paid' if rng.random() < 0.9 else 'pending',
+            order_date=now - timedelta(seconds=rng.randint(0, history_days * 86400)),
+            final_amount=Decimal('0.00'),
+        ))
+    order_objs = Orders.objects.bulk_create(order_objs, batch_size=BATCH_SIZE)
+    # order_date may be auto_now_add; bulk_update skips pre_save, so the synthetic history sticks.
+    Orders.objects.bulk_update(order_objs, ['order_date'], batch_size=BATCH_SIZE)
+
+    item_objs = []
+    for order in order_objs:
+        order_total = Decimal('0.00')
+        for product in rng.sample(product_objs, min(items_per_order, len(product_objs))):
+            quantity = rng.randint(1, 5)
+            line_revenue = product.price * quantity
+            line_cogs = product.cost * quantity
+            order_total += line_revenue
+            item_objs.append(Order_Items(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price=product.price,
+                cogs=line_cogs,
+                net_profit=line_revenue - line_cogs,
+            ))
+        order.final_amount = order_total
+
+        if len(item_objs) >= BATCH_SIZE:
+            Order_Items.objects.bulk_create(item_objs, batch_size=BATCH_SIZE)
+            item_objs = []
+    Order_Items.objects.bulk_create(item_objs, batch_size=BATCH_SIZE)
+    Orders.objects.bulk_update(order_objs, ['final_amount'], batch_size=BATCH_SIZE)
+
+    CompanyDailyMetric.rebuild_for_company(company.id)
+    ProductSalesVelocity.rebuild_for_company(company.id)
+    materialize_company_monthly_metrics(company.id, full=True)
+
+    return company, user
+
+
+def seed_synthetic_tenants(companies=1, seed=None, name_prefix=None, **tenant_options):
+    """
+    Seeds `companies` synthetic tenants with the same shape (see seed_synthetic_tenant for the options).
+    Each tenant gets its own derived seed, so runs with the same seed are reproducible.
+    Returns a list of (company, user).
+    """
+    tenants = []
+    for index in range(companies):
+        tenants.append(seed_synthetic_tenant(
+            seed=None if seed is None else seed + index,
+            name=f"{name_prefix} {index + 1}" if name_prefix else None,
+            **tenant_options
+        ))
+    return tenants
@@ -0,0 +1,175 @@
+"""
+Per-request tenant context for the analytics views.
+
+``get_tenant_context(request)`` resolves, once per request, the user's profile id, their
+company id and the ids of every company they are an employee of. The ids are cached in
+the session, so most requests resolve the tenant without touching the database; the
+profile and company objects are loaded lazily, only by views that need them.
+
+Session entries are invalidated through a per-user version number stored in the database
+(TenantContextVersion) and bumped by ``invalidate_tenant_context`` (see signals.py: profile
+saves, company membership changes, company deletion) inside the changing transaction. A
+request checks it with one primary-key read, so a removed member loses access on the first
+request after the change commits, on every worker. A cache would not do: an evicted or
+per-process version would let the old session copy through. Entries also expire after
+``ANALYTICS_TENANT_CONTEXT_TTL`` seconds (default 300).
+
+Every read here is pinned to the primary (``DEFAULT_DB_ALIAS``), also inside
+``analytics_read_replica`` views: a lagging replica would otherwise serve an old version or
+an old membership list and delay the revocation by the replication lag.
+
+``TenantContextMiddleware`` exposes the context as ``request.tenant`` (resolved on first
+access); the views use ``get_tenant_context`` so they also work without it.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from .models import Companies, TenantContextVersion
+
+
+SESSION_KEY = '_analytics_tenant_context'
+DEFAULT_TTL = 300  # seconds
+
+
+def get_tenant_context_ttl():
+    return getattr(settings, 'ANALYTICS_TENANT_CONTEXT_TTL', DEFAULT_TTL)
+
+
+def _profile_model():
+    # The profile model is whatever User.profile points at.
+    return get_user_model()._meta.get_field('profile').related_model
+
+
+def get_tenant_version(user_id):
+    version = TenantContextVersion.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list('version', flat=True).first()
+    return version or 0
+
+
+def invalidate_tenant_context(user_ids):
+    """
+    Makes every cached tenant context of the given users stale. Runs in the caller's
+    transaction, so the bump commits (or rolls back) with the change it reflects.
+    """
+    user_ids = {u for u in user_ids if u is not None}
+    if not user_ids:
+        return
+    versions = TenantContextVersion.objects.using(DEFAULT_DB_ALIAS).filter(user_id__in=user_ids)
+    existing = set(versions.values_list('user_id', flat=True))
+    versions.update(version=F('version') + 1)
+    # Users without a row are at version 0.
+    TenantContextVersion.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [TenantContextVersion(user_id=user_id, version=1) for user_id in user_ids - existing],
+        ignore_conflicts=True,
+    )
+
+
+class TenantContext:
+    """
+    The tenant a request acts for. `profile` and `company` are loaded on first access.
+    """
+    def __init__(self, profile_id=None, company_id=None, member_company_ids=(), profile=None):
+        self.profile_id = profile_id
+        self.company_id = company_id
+        self.member_company_ids = frozenset(member_company_ids)
+        if profile is not None:
+            # Already loaded (with its company) while resolving: seed the cached properties.
+            self.__dict__['profile'] = profile
+            self.__dict__['company'] = profile.company
+
+    @cached_property
+    def profile(self):
+        if not self.profile_id:
+            return None
+        return _profile_model().objects.using(DEFAULT_DB_ALIAS).select_related('company').filter(pk=self.profile_id).first()
+
+    @cached_property
+    def company(self):
+        if not self.company_id:
+            return None
+        profile = self.__dict__.get('profile')
+        if profile is not None and profile.company_id == self.company_id:
+            # Already loaded with the profile (select_related).
+            return profile.company
+        return Companies.objects.using(DEFAULT_DB_ALIAS).filter(pk=self.company_id).first()
+
+    def is_member(self, company_id):
+        """
+        True if the user may read company_id's data (their own company or one that lists them as an employee).
+        """
+        try:
+            return int(company_id) in self.member_company_ids
+        except (TypeError, ValueError):
+            return False
+
+    def to_session(self, user_id, version):
+        return {
+            'user_id': user_id,
+            'version': version,
+            'expires_at': time.time() + get_tenant_context_ttl(),
+            'profile_id': self.profile_id,
+            'company_id': self.company_id,
+            'member_company_ids': sorted(self.member_company_ids),
+        }
+
+
+def resolve_tenant_context(user):
+    """
+    Loads the tenant context from the database: the profile with its company, and the
+    user's company memberships (two queries).
+    """
+    profile = _profile_model().objects.using(DEFAULT_DB_ALIAS).select_related('company').filter(user=user).first()
+    if profile is None:
+        return TenantContext()
+
+    member_company_ids = set(
+        Companies.objects.using(DEFAULT_DB_ALIAS).filter(employees=profile).values_list('id', flat=True)
+    )
+    if profile.company_id:
+        member_company_ids.add(profile.company_id)
+    return TenantContext(profile.pk, profile.company_id, member_company_ids, profile=profile)
+
+
+def get_tenant_context(request):
+    """
+    Returns the request's TenantContext, resolving it at most once per request and
+    reusing the session copy while its version and TTL are valid.
+    """
+    tenant = getattr(request, '_tenant_context', None)
+    if tenant is not None:
+        return tenant
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        tenant = TenantContext()
+    else:
+        session = getattr(request, 'session', None)
+        version = get_tenant_version(user.pk)
+        entry = session.get(SESSION_KEY) if session is not None else None
+        if (
+            entry
+            and entry['user_id'] == user.pk
+            and entry['version'] == version
+            and entry['expires_at'] > time.time()
+        ):
+            tenant = TenantContext(entry['profile_id'], entry['company_id'], entry['member_company_ids'])
+        else:
+            tenant = resolve_tenant_context(user)
+            if session is not None:
+                session[SESSION_KEY] = tenant.to_session(user.pk, version)
+
+    request._tenant_context = tenant
+    return tenant
+
+
+class TenantContextMiddleware(MiddlewareMixin):
+    """
+    Exposes the tenant context as request.tenant. Must come after AuthenticationMiddleware.
+    """
+    def process_request(self, request):
+        request.tenant = SimpleLazyObject(lambda: get_tenant_context(request))
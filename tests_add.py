@@ -0,0 +1,61 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_all_monthly_trends.py
+# The all-history trends endpoint must cost O(months), not O(line items): its query count
+# stays the same as a tenant's history grows, and it returns one row per month.
+import json
+from datetime import date
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventory_app import views
+from inventory_app.analytics_cache import invalidate_company_cache
+from inventory_app.models import Order_Items
+from inventory_app.synthetic_tenant import seed_synthetic_tenant
+
+
+def months_between(first, last):
+    return (last.year - first.year) * 12 + last.month - first.month + 1
+
+
+class AllMonthlyTrendsScalingTests(TestCase):
+
+    def fetch(self, company, user):
+        """
+        Calls the endpoint uncached as the tenant's user; returns (payload, query count).
+        """
+        invalidate_company_cache(company.id)
+        request = RequestFactory().get('/', {'metrics': 'all'})
+        request.user = user
+        with CaptureQueriesContext(connection) as queries:
+            response = views.get_all_monthly_sales_trends_api_data(request, company_id=company.id)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content), len(queries)
+
+    def test_query_count_is_constant_as_history_grows(self):
+        short_tenant = seed_synthetic_tenant(products=20, orders=50, items_per_order=2, history_days=60, seed=1)
+        long_tenant = seed_synthetic_tenant(products=20, orders=1500, items_per_order=4, history_days=720, seed=2)
+        self.assertGreater(
+            Order_Items.objects.filter(order__company=long_tenant[0]).count(),
+            20 * Order_Items.objects.filter(order__company=short_tenant[0]).count(),
+        )
+
+        short_payload, short_queries = self.fetch(*short_tenant)
+        long_payload, long_queries = self.fetch(*long_tenant)
+
+        self.assertEqual(short_queries, long_queries)
+        self.assertGreater(len(long_payload['data']), len(short_payload['data']))
+
+    def test_returns_one_row_per_month(self):
+        company, user = seed_synthetic_tenant(products=20, orders=800, items_per_order=4, history_days=400, seed=3)
+        payload, _ = self.fetch(company, user)
+
+        first_sale = date.fromisoformat(payload['first_sale_date'])
+        self.assertEqual(len(payload['data']), months_between(first_sale, timezone.localdate()))
+        self.assertLess(len(payload['data']), Order_Items.objects.filter(order__company=company).count())
@@ -0,0 +1,85 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_approximate_graph.py
+# The approximate all-time graph reads materialized months from CompanyMonthlyMetric and
+# every later month exactly from the daily rollup, and reports which closed months are stale.
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from inventory_app import views
+from inventory_app.metrics_materialization import materialize_company_monthly_metrics
+from inventory_app.models import Companies, CompanyDailyMetric
+
+
+def month_before(month_start):
+    return (month_start - timedelta(days=1)).replace(day=1)
+
+
+class ApproximateAllTimeGraphTests(TestCase):
+
+    def setUp(self):
+        self.company = Companies.objects.create(name="Approximate Co")
+        self.open_month = timezone.localdate().replace(day=1)
+        self.last_month = month_before(self.open_month)
+        self.two_months_ago = month_before(self.last_month)
+        self.three_months_ago = month_before(self.two_months_ago)
+
+        # Two closed months are materialized; last month closed after the run and is not.
+        self.add_day(self.three_months_ago, '100.00')
+        self.add_day(self.two_months_ago, '200.00')
+        materialize_company_monthly_metrics(self.company.id, full=True)
+        self.add_day(self.last_month, '300.00')
+        self.add_day(self.open_month, '50.00')
+
+    def add_day(self, day, revenue):
+        return CompanyDailyMetric.objects.create(
+            company=self.company, day=day, total_daily_revenue=Decimal(revenue),
+            net_daily_profit=Decimal(revenue) / 2, total_daily_cogs=Decimal(revenue) / 2,
+            total_daily_orders=1, total_products_sold=1,
+        )
+
+    def graph(self, metric='sales', precision='approximate'):
+        data, status = views.build_dashboard_graph_data(self.company, metric, 'all', precision=precision)
+        self.assertEqual(status, 200)
+        return data
+
+    def test_months_after_the_materialized_ones_are_exact(self):
+        data = self.graph()
+
+        self.assertEqual([float(value) for value in data['data']], [100.0, 200.0, 300.0, 50.0])
+        self.assertEqual(data['approximation']['exact_from'], self.last_month.isoformat())
+        self.assertEqual(data['approximation']['stale_periods'], [])
+
+    def test_matches_the_exact_graph_when_nothing_is_stale(self):
+        approximate, exact = self.graph(), self.graph(precision='exact')
+
+        self.assertNotIn('approximation', exact)
+        self.assertEqual(approximate['labels'], exact['labels'])
+        self.assertEqual([float(v) for v in approximate['data']], [float(v) for v in exact['data']])
+
+    def test_closed_month_changed_after_materialization_is_reported_stale(self):
+        row = CompanyDailyMetric.objects.get(company=self.company, day=self.two_months_ago)
+        row.total_daily_revenue = Decimal('250.00')
+        row.save()
+
+        data = self.graph()
+        # The bar keeps its materialized value until the next run, and is flagged.
+        self.assertEqual(float(data['data'][1]), 200.0)
+        self.assertEqual(data['approximation']['stale_periods'], [self.two_months_ago.isoformat()])
+
+    def test_order_counts_are_never_approximated(self):
+        self.assertNotIn('approximation', self.graph(metric='num_orders'))
+
+    @override_settings(ANALYTICS_APPROXIMATE_GRAPH_MIN_MONTHS=3)
+    def test_auto_stays_exact_below_the_threshold(self):
+        self.assertNotIn('approximation', self.graph(precision='auto'))
+
+    @override_settings(ANALYTICS_APPROXIMATE_GRAPH_MIN_MONTHS=2)
+    def test_auto_switches_at_the_threshold(self):
+        self.assertIn('approximation', self.graph(precision='auto'))
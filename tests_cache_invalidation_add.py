@@ -0,0 +1,98 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_cache_invalidation.py
+# A write bumps its company's cache version only after commit, once the rollups it feeds
+# have been refreshed, and a version never moves backwards (not even after eviction).
+from decimal import Decimal
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory_app.analytics_cache import (
+    _version_key,
+    get_analytics_cache,
+    get_company_cache_version,
+    invalidate_company_cache,
+)
+from inventory_app.models import Companies, CompanyDailyMetric, Order_Items, Orders, Product
+
+
+def make_product(company, **fields):
+    fields = {'name': 'Widget', 'barcode': '000000000001', 'cost': Decimal('2.00'),
+              'price': Decimal('5.00'), 'stock': 50, 'low_stock_input': 5, **fields}
+    return Product.objects.create(company=company, **fields)
+
+
+class AfterCommitInvalidationTests(TestCase):
+
+    def setUp(self):
+        self.company = Companies.objects.create(name="Cache Co")
+        self.product = make_product(self.company)
+        invalidate_company_cache(self.company.id)
+
+    def checkout(self, lines=1):
+        order = Orders.objects.create(
+            company=self.company, status='paid', order_date=timezone.now(), final_amount=Decimal('0.00'),
+        )
+        for _ in range(lines):
+            Order_Items.objects.create(order=order, product=self.product, quantity=1, price=Decimal('5.00'))
+        return order
+
+    def test_version_is_bumped_after_the_rollup_is_refreshed(self):
+        before = get_company_cache_version(self.company.id)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.checkout()
+
+        # Nothing has been committed yet: the cached results are still current.
+        self.assertEqual(get_company_cache_version(self.company.id), before)
+        self.assertFalse(CompanyDailyMetric.objects.filter(company=self.company).exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_company_cache_version(self.company.id), before)
+        rollup = CompanyDailyMetric.objects.get(company=self.company, day=timezone.localdate())
+        self.assertEqual(rollup.total_daily_orders, 1)
+
+    def test_multi_line_checkout_refreshes_its_day_once(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.checkout(lines=4)
+
+        with mock.patch.object(CompanyDailyMetric, 'refresh_day', wraps=CompanyDailyMetric.refresh_day) as refresh:
+            for callback in callbacks:
+                callback()
+        # Other companies' work left queued on the connection by earlier tests may be flushed too.
+        calls = [call for call in refresh.call_args_list if call.args[0] == self.company.id]
+        self.assertEqual(calls, [mock.call(self.company.id, timezone.localdate())])
+
+    def test_rolled_back_write_registers_nothing(self):
+        before = get_company_cache_version(self.company.id)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.checkout()
+                raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_company_cache_version(self.company.id), before)
+
+
+class CacheVersionTests(TestCase):
+
+    def test_invalidate_moves_the_version_forward(self):
+        company_id = 424242
+        cache = get_analytics_cache()
+        cache.set(_version_key(company_id), 10**18, timeout=None)
+
+        invalidate_company_cache(company_id)
+        self.assertEqual(get_company_cache_version(company_id), 10**18 + 1)
+
+    def test_evicted_version_does_not_restart_below_the_old_one(self):
+        company_id = 424243
+        before = get_company_cache_version(company_id)
+        get_analytics_cache().delete(_version_key(company_id))
+
+        self.assertGreaterEqual(get_company_cache_version(company_id), before)
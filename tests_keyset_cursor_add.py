@@ -0,0 +1,121 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_keyset_cursor.py
+# The items-needing-attention modal pages on (warning rank, stock, name, id): every product
+# appears exactly once across pages, ties break on id, and tampered cursors are rejected.
+import base64
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from inventory_app import views
+from inventory_app.models import Companies, Product
+
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+class KeysetCursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        values = [1, 7, "Widget", 42]
+        self.assertEqual(views.decode_keyset_cursor(views.encode_keyset_cursor(values)), values)
+
+    def test_empty_cursor_is_the_first_page(self):
+        self.assertIsNone(views.decode_keyset_cursor(None))
+        self.assertIsNone(views.decode_keyset_cursor(''))
+
+    def test_malformed_cursors_are_rejected(self):
+        cursors = [
+            'not base64!',
+            base64.urlsafe_b64encode(b'{not json').decode('ascii'),
+            raw_cursor({'rank': 1}),
+            raw_cursor([1, 7, "Widget"]),
+            raw_cursor([1, 7, "Widget", 42, 0]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                views.decode_keyset_cursor(cursor)
+
+    def test_tampered_element_types_are_rejected(self):
+        for values in (
+            [True, 7, "Widget", 42],
+            [1, "7", "Widget", 42],
+            [1, 7.5, "Widget", 42],
+            [1, 7, 3, 42],
+            [1, 7, "Widget", None],
+            [1, 7, "Widget", "42 OR 1=1"],
+        ):
+            with self.subTest(values=values), self.assertRaises(ValueError):
+                views.decode_keyset_cursor(raw_cursor(values))
+
+
+class ItemsToSellPaginationTests(TestCase):
+
+    def setUp(self):
+        self.company = Companies.objects.create(name="Keyset Co")
+        # All low on stock; equal (stock, name) pairs so the id tie-break is exercised.
+        for i, (name, stock) in enumerate([('B', 1), ('A', 1), ('A', 1), ('A', 2), ('C', 0)]):
+            Product.objects.create(
+                company=self.company, name=name, barcode=f"{i:012d}", cost=Decimal('1.00'),
+                price=Decimal('2.00'), stock=stock, low_stock_input=5,
+            )
+
+    def walk(self, page_size):
+        pages, after = [], None
+        while True:
+            context = views.build_items_to_sell_context(self.company, after=after, page_size=page_size)
+            pages.append([product.id for product in context['items']])
+            if context['next_cursor'] is None:
+                return pages
+            after = views.decode_keyset_cursor(context['next_cursor'])
+
+    def test_pages_cover_every_product_once_in_order(self):
+        expected = [
+            product.id for product in views.build_items_to_sell_context(self.company, page_size=100)['items']
+        ]
+        self.assertCountEqual(expected, Product.objects.filter(company=self.company).values_list('id', flat=True))
+
+        for page_size in range(1, 7):
+            with self.subTest(page_size=page_size):
+                pages = self.walk(page_size)
+                self.assertEqual([product_id for page in pages for product_id in page], expected)
+                # A page size that divides the total evenly must not end on an empty page.
+                self.assertTrue(all(pages))
+
+    def test_ties_break_on_id(self):
+        items = views.build_items_to_sell_context(self.company, page_size=100)['items']
+        tied = [item.id for item in items if (item.name, item.stock) == ('A', 1)]
+        self.assertEqual(tied, sorted(tied))
+
+    def test_first_page_flag(self):
+        first = views.build_items_to_sell_context(self.company, page_size=2)
+        second = views.build_items_to_sell_context(
+            self.company, after=views.decode_keyset_cursor(first['next_cursor']), page_size=2,
+        )
+        self.assertTrue(first['is_first_page'])
+        self.assertFalse(second['is_first_page'])
+
+
+class ItemsToSellViewTests(TestCase):
+
+    def test_tampered_cursor_is_a_bad_request(self):
+        company = Companies.objects.create(name="Keyset View Co")
+        user = get_user_model().objects.create_user(username="keyset-view", password=None)
+        profile = user.profile
+        profile.company = company
+        profile.save()
+        company.employees.add(profile)
+
+        request = RequestFactory().get(
+            '/', {'after': raw_cursor([1, "1) OR (1=1", "A", 1])}, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        request.user = user
+        response = views.items_to_sell_modal_view(request)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,178 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_kpi_stream.py
+# The KPI broker reloads stale totals once for all concurrent streams, retries a reload that
+# raced a publish, and delivers deltas and resyncs in publish order.
+import asyncio
+import threading
+import time
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from inventory_app.kpi_stream import MAX_RELOAD_ATTEMPTS, InProcessKpiBroker, kpi_delta
+
+
+COMPANY_ID = 1
+
+
+async def drain(subscription):
+    # Deliveries are scheduled with call_soon_threadsafe; let them run first.
+    await asyncio.sleep(0)
+    events = []
+    while not subscription.empty():
+        events.append(subscription.get_nowait())
+    return events
+
+
+class CountingLoader:
+    """
+    load_totals stand-in returning {'orders': <call number>}; `on_call` runs inside the load.
+    """
+    def __init__(self, delay=0, on_call=None):
+        self.calls = 0
+        self.delay = delay
+        self.on_call = on_call
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if self.on_call:
+            self.on_call(call)
+        return {'revenue': Decimal('10.00'), 'orders': call}
+
+
+class SingleFlightReloadTests(SimpleTestCase):
+
+    async def test_concurrent_streams_share_one_load(self):
+        broker = InProcessKpiBroker()
+        broker.subscribe(COMPANY_ID)
+        load = CountingLoader(delay=0.2)
+
+        results = await asyncio.gather(*(
+            asyncio.to_thread(broker.get_totals, COMPANY_ID, load) for _ in range(5)
+        ))
+        self.assertEqual(load.calls, 1)
+        self.assertEqual(results, [{'revenue': Decimal('10.00'), 'orders': 1}] * 5)
+
+    async def test_fresh_totals_are_not_reloaded(self):
+        broker = InProcessKpiBroker()
+        broker.subscribe(COMPANY_ID)
+        load = CountingLoader()
+
+        broker.get_totals(COMPANY_ID, load)
+        broker.get_totals(COMPANY_ID, load)
+        self.assertEqual(load.calls, 1)
+        self.assertFalse(broker.is_stale(COMPANY_ID))
+
+    async def test_resync_marks_totals_stale_until_reloaded(self):
+        broker = InProcessKpiBroker()
+        broker.subscribe(COMPANY_ID)
+        load = CountingLoader()
+        broker.get_totals(COMPANY_ID, load)
+
+        broker.publish(COMPANY_ID, {'type': 'resync'})
+        self.assertTrue(broker.is_stale(COMPANY_ID))
+        self.assertEqual(broker.get_totals(COMPANY_ID, load)['orders'], 2)
+        self.assertFalse(broker.is_stale(COMPANY_ID))
+
+    async def test_publish_during_a_load_discards_it(self):
+        broker = InProcessKpiBroker()
+        broker.subscribe(COMPANY_ID)
+
+        def publish_during_first_load(call):
+            if call == 1:
+                broker.publish(COMPANY_ID, kpi_delta(orders=1))
+        load = CountingLoader(on_call=publish_during_first_load)
+
+        self.assertEqual(broker.get_totals(COMPANY_ID, load)['orders'], 2)
+        self.assertEqual(load.calls, 2)
+
+    async def test_reload_gives_up_after_max_attempts(self):
+        broker = InProcessKpiBroker()
+        broker.subscribe(COMPANY_ID)
+        load = CountingLoader(on_call=lambda call: broker.publish(COMPANY_ID, kpi_delta(orders=1)))
+
+        self.assertEqual(broker.get_totals(COMPANY_ID, load)['orders'], MAX_RELOAD_ATTEMPTS)
+        self.assertEqual(load.calls, MAX_RELOAD_ATTEMPTS)
+
+    async def test_failed_load_lets_waiters_load_themselves(self):
+        broker = InProcessKpiBroker()
+        broker.subscribe(COMPANY_ID)
+        leader_started = threading.Event()
+
+        def failing_load():
+            leader_started.set()
+            time.sleep(0.2)
+            raise RuntimeError
+
+        def waiter():
+            leader_started.wait()
+            return broker.get_totals(COMPANY_ID, CountingLoader())
+
+        leader = asyncio.to_thread(broker.get_totals, COMPANY_ID, failing_load)
+        results = await asyncio.gather(leader, asyncio.to_thread(waiter), return_exceptions=True)
+        self.assertIsInstance(results[0], RuntimeError)
+        self.assertEqual(results[1]['orders'], 1)
+
+
+class EventOrderingTests(SimpleTestCase):
+
+    async def test_deltas_carry_running_totals(self):
+        broker = InProcessKpiBroker()
+        subscription = broker.subscribe(COMPANY_ID)
+        broker.get_totals(COMPANY_ID, CountingLoader())
+
+        broker.publish(COMPANY_ID, kpi_delta(revenue=Decimal('5.00'), orders=1))
+        broker.publish(COMPANY_ID, kpi_delta(revenue=Decimal('2.50'), orders=1))
+
+        events = await drain(subscription)
+        self.assertEqual([event['totals'] for event in events], [
+            {'revenue': Decimal('15.00'), 'orders': 2},
+            {'revenue': Decimal('17.50'), 'orders': 3},
+        ])
+        self.assertEqual(broker.get_totals(COMPANY_ID, CountingLoader())['revenue'], Decimal('17.50'))
+
+    async def test_deltas_after_a_resync_wait_for_the_reload(self):
+        broker = InProcessKpiBroker()
+        subscription = broker.subscribe(COMPANY_ID)
+        load = CountingLoader()
+        broker.get_totals(COMPANY_ID, load)
+
+        broker.publish(COMPANY_ID, kpi_delta(orders=1))
+        broker.publish(COMPANY_ID, {'type': 'resync'})
+        broker.publish(COMPANY_ID, kpi_delta(orders=1))
+        events = await drain(subscription)
+
+        self.assertEqual([event['type'] for event in events], ['delta', 'resync', 'delta'])
+        self.assertIn('totals', events[0])
+        # Stale totals are not advanced; the stream refetches them after the resync.
+        self.assertNotIn('totals', events[2])
+
+        broker.get_totals(COMPANY_ID, load)
+        broker.publish(COMPANY_ID, kpi_delta(orders=1))
+        self.assertEqual((await drain(subscription))[0]['totals']['orders'], 3)
+
+    async def test_delta_before_the_first_load_has_no_totals(self):
+        broker = InProcessKpiBroker()
+        subscription = broker.subscribe(COMPANY_ID)
+        broker.publish(COMPANY_ID, kpi_delta(orders=1))
+
+        events = await drain(subscription)
+        self.assertEqual(events, [{'type': 'delta', 'delta': {'orders': 1}}])
+
+    async def test_unsubscribing_the_last_stream_drops_the_totals(self):
+        broker = InProcessKpiBroker()
+        subscription = broker.subscribe(COMPANY_ID)
+        broker.get_totals(COMPANY_ID, CountingLoader())
+
+        broker.unsubscribe(COMPANY_ID, subscription)
+        self.assertFalse(broker.has_listeners(COMPANY_ID))
+        self.assertFalse(broker.has_any_listeners())
+        self.assertTrue(broker.is_stale(COMPANY_ID))
@@ -0,0 +1,106 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_line_item_costs.py
+# Line items keep the cost stamped at sale time: edits restamp cogs/net_profit from the
+# stamped unit cost (or the new product's cost), and values the caller set are left alone.
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory_app.models import Companies, Order_Items, Orders, Product
+from inventory_app.signals import stamp_line_item_costs
+
+
+class LineItemCostStampingTests(TestCase):
+
+    def setUp(self):
+        self.company = Companies.objects.create(name="Costs Co")
+        self.product = self.make_product("Widget", "000000000001", Decimal('2.00'))
+        # Pending, so the rollup and KPI handlers have nothing to do.
+        self.order = Orders.objects.create(
+            company=self.company, status='pending', order_date=timezone.now(), final_amount=Decimal('0.00'),
+        )
+        self.item = Order_Items.objects.create(
+            order=self.order, product=self.product, quantity=2, price=Decimal('5.00'),
+        )
+
+    def make_product(self, name, barcode, cost):
+        return Product.objects.create(
+            company=self.company, name=name, barcode=barcode, cost=cost,
+            price=Decimal('9.00'), stock=10, low_stock_input=1,
+        )
+
+    def reload(self):
+        return Order_Items.objects.get(pk=self.item.pk)
+
+    def test_new_line_is_stamped_from_the_product_cost(self):
+        item = self.reload()
+        self.assertEqual(item.cogs, Decimal('4.00'))
+        self.assertEqual(item.net_profit, Decimal('6.00'))
+
+    def test_quantity_change_keeps_the_stamped_unit_cost(self):
+        Product.objects.filter(pk=self.product.pk).update(cost=Decimal('3.00'))
+        item = self.reload()
+        item.quantity = 3
+        item.save()
+
+        item = self.reload()
+        self.assertEqual(item.cogs, Decimal('6.00'))
+        self.assertEqual(item.net_profit, Decimal('9.00'))
+
+    def test_product_change_reads_the_new_product_cost(self):
+        other = self.make_product("Gadget", "000000000002", Decimal('3.50'))
+        item = self.reload()
+        item.product_id = other.pk
+        item.save()
+
+        item = self.reload()
+        self.assertEqual(item.cogs, Decimal('7.00'))
+        self.assertEqual(item.net_profit, Decimal('3.00'))
+
+    def test_price_change_restamps_only_the_profit(self):
+        item = self.reload()
+        item.price = Decimal('6.00')
+        item.save()
+
+        item = self.reload()
+        self.assertEqual(item.cogs, Decimal('4.00'))
+        self.assertEqual(item.net_profit, Decimal('8.00'))
+
+    def test_explicit_cogs_is_kept(self):
+        item = self.reload()
+        item.quantity = 4
+        item.cogs = Decimal('1.00')
+        item.save()
+
+        item = self.reload()
+        self.assertEqual(item.cogs, Decimal('1.00'))
+        self.assertEqual(item.net_profit, Decimal('19.00'))
+
+    def test_explicit_net_profit_is_kept(self):
+        item = self.reload()
+        item.price = Decimal('6.00')
+        item.net_profit = Decimal('0.50')
+        item.save()
+
+        self.assertEqual(self.reload().net_profit, Decimal('0.50'))
+
+    def test_untouched_save_changes_nothing(self):
+        Product.objects.filter(pk=self.product.pk).update(cost=Decimal('3.00'))
+        item = self.reload()
+        item.save()
+
+        item = self.reload()
+        self.assertEqual(item.cogs, Decimal('4.00'))
+        self.assertEqual(item.net_profit, Decimal('6.00'))
+
+    def test_product_passed_in_costs_no_lookup(self):
+        item = Order_Items(order=self.order, product=self.product, quantity=1, price=Decimal('5.00'))
+        with self.assertNumQueries(0):
+            stamp_line_item_costs(sender=Order_Items, instance=item)
+        self.assertEqual(item.cogs, Decimal('2.00'))
+        self.assertEqual(item.net_profit, Decimal('3.00'))
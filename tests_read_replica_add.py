@@ -0,0 +1,175 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_read_replica.py
+# Replica routing: reads inside analytics views go to the replica except for excluded apps and
+# inside transactions, writes always go to the primary, and replica results read right after
+# a change are not cached. The two-database tests need the 'replica' test mirror from settings_add.py.
+import time
+import unittest
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+
+from inventory_app.analytics_cache import (
+    _version_key,
+    get_analytics_cache,
+    invalidate_company_cache,
+    refill_is_cacheable,
+)
+from inventory_app.models import Companies, Product
+from inventory_app.read_replica import (
+    SESSION_PIN_KEY,
+    AnalyticsReplicaRouter,
+    ReplicaPinningMiddleware,
+    _read_alias,
+    _request_writes,
+    analytics_read_replica,
+    replica_alias_for,
+)
+
+
+class RefillIsCacheableTests(TestCase):
+
+    def test_primary_reads_are_always_cacheable(self):
+        invalidate_company_cache(515151)
+        self.assertTrue(refill_is_cacheable(515151, None))
+
+    def test_replica_read_right_after_a_change_is_not_cached(self):
+        invalidate_company_cache(515152)
+        self.assertFalse(refill_is_cacheable(515152, 'replica'))
+
+    @override_settings(ANALYTICS_REPLICA_PIN_SECONDS=5)
+    def test_replica_read_after_the_pin_window_is_cached(self):
+        changed_at = time.time() - 60
+        get_analytics_cache().set(_version_key(515153), int(changed_at * 1_000_000), timeout=None)
+        self.assertTrue(refill_is_cacheable(515153, 'replica'))
+
+
+class RouterTests(TransactionTestCase):
+    # Not TestCase: its per-test transaction would make every read fall back to the primary.
+
+    def setUp(self):
+        self.router = AnalyticsReplicaRouter()
+        token = _read_alias.set('replica')
+        self.addCleanup(_read_alias.reset, token)
+
+    def test_reads_in_analytics_views_go_to_the_replica(self):
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+    def test_reads_outside_analytics_views_are_left_to_the_default(self):
+        token = _read_alias.set(None)
+        self.addCleanup(_read_alias.reset, token)
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    @override_settings(ANALYTICS_REPLICA_EXCLUDED_APPS=('inventory_app',))
+    def test_excluded_apps_are_read_from_the_primary(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        with transaction.atomic():
+            self.assertIsNone(self.router.db_for_read(Product))
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+    def test_writes_go_to_the_primary_and_are_recorded(self):
+        writes = {'wrote': False}
+        token = _request_writes.set(writes)
+        self.addCleanup(_request_writes.reset, token)
+
+        self.assertEqual(self.router.db_for_write(Product), DEFAULT_DB_ALIAS)
+        self.assertTrue(writes['wrote'])
+
+    @override_settings(ANALYTICS_REPLICA_EXCLUDED_APPS=('inventory_app',))
+    def test_writes_to_excluded_apps_do_not_pin(self):
+        writes = {'wrote': False}
+        token = _request_writes.set(writes)
+        self.addCleanup(_request_writes.reset, token)
+
+        self.assertEqual(self.router.db_for_write(Product), DEFAULT_DB_ALIAS)
+        self.assertFalse(writes['wrote'])
+
+
+@unittest.skipUnless('replica' in settings.DATABASES, "needs the 'replica' test mirror (see settings_add.py)")
+@override_settings(ANALYTICS_READ_REPLICA='replica')
+class TwoDatabaseRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.company = Companies.objects.create(name="Replica Co")
+        Product.objects.create(
+            company=self.company, name="Widget", barcode="000000000001", cost=1, price=2,
+            stock=5, low_stock_input=1,
+        )
+
+    def request(self, session=None):
+        request = RequestFactory().get('/')
+        request.session = {} if session is None else session
+        return request
+
+    def test_view_reads_from_the_replica(self):
+        @analytics_read_replica
+        def view(request):
+            return Product.objects.filter(company=self.company).db
+
+        self.assertEqual(view(self.request()), 'replica')
+        self.assertEqual(Product.objects.filter(company=self.company).db, DEFAULT_DB_ALIAS)
+
+    def test_object_read_from_the_replica_is_saved_to_the_primary(self):
+        @analytics_read_replica
+        def view(request):
+            product = Product.objects.get(company=self.company)
+            self.assertEqual(product._state.db, 'replica')
+            product.stock = 4
+            product.save()
+            return product._state.db
+
+        self.assertEqual(view(self.request()), DEFAULT_DB_ALIAS)
+        self.assertEqual(Product.objects.using(DEFAULT_DB_ALIAS).get(company=self.company).stock, 4)
+
+    def test_transaction_in_a_view_reads_from_the_primary(self):
+        @analytics_read_replica
+        def view(request):
+            with transaction.atomic():
+                return Product.objects.filter(company=self.company).db
+
+        self.assertEqual(view(self.request()), DEFAULT_DB_ALIAS)
+
+    def test_alias_is_left_on_the_request_for_the_cache_decorators(self):
+        @analytics_read_replica
+        def view(request):
+            return HttpResponse()
+
+        request = self.request()
+        view(request)
+        self.assertEqual(request._analytics_read_alias, 'replica')
+
+    def test_pinned_session_reads_from_the_primary(self):
+        self.assertEqual(replica_alias_for(self.request()), 'replica')
+        pinned = self.request({SESSION_PIN_KEY: time.time() + 60})
+        self.assertIsNone(replica_alias_for(pinned))
+
+    @override_settings(ANALYTICS_READ_REPLICA='missing')
+    def test_unknown_alias_reads_from_the_primary(self):
+        self.assertIsNone(replica_alias_for(self.request()))
+
+    def test_writing_request_pins_its_session(self):
+        def get_response(request):
+            Companies.objects.create(name="Written Co")
+            return HttpResponse()
+
+        request = self.request()
+        ReplicaPinningMiddleware(get_response)(request)
+        self.assertGreater(request.session[SESSION_PIN_KEY], time.time())
+
+    def test_reading_request_does_not_pin_its_session(self):
+        def get_response(request):
+            list(Product.objects.all())
+            return HttpResponse()
+
+        request = self.request()
+        ReplicaPinningMiddleware(get_response)(request)
+        self.assertNotIn(SESSION_PIN_KEY, request.session)
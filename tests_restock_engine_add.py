@@ -0,0 +1,143 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_restock_engine.py
+# Restock math: demand statistics count days without sales as zero, products that never sold
+# get no reorder and unbounded cover, and the plan is ordered by supplier then urgency.
+import math
+from decimal import Decimal
+from statistics import NormalDist
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from inventory_app.models import Companies, Order_Items, Orders, Product
+from inventory_app.restock_engine import (
+    _supplier_order,
+    compute_restock_plan,
+    demand_statistics,
+    parse_restock_params,
+    restock_rows,
+    restock_selection,
+)
+
+
+class DemandStatisticsTests(SimpleTestCase):
+
+    def test_days_without_sales_count_as_zero(self):
+        product_ids = np.array([1, 2, 3])
+        # Product 1 sold 2 and 4 units on two days of a 4-day window; product 2 never sold.
+        mean, std = demand_statistics(product_ids, np.array([1, 1]), np.array([2.0, 4.0]), 4)
+
+        self.assertAlmostEqual(mean[0], 1.5)
+        self.assertAlmostEqual(std[0], math.sqrt((2 ** 2 + 4 ** 2) / 4 - 1.5 ** 2))
+        self.assertEqual(list(mean[1:]), [0, 0])
+        self.assertEqual(list(std[1:]), [0, 0])
+
+    def test_zero_demand(self):
+        mean, std = demand_statistics(np.array([1, 2]), np.array([], dtype='int64'), np.array([]), 90)
+        self.assertEqual(list(mean), [0, 0])
+        self.assertEqual(list(std), [0, 0])
+
+    def test_demand_for_unknown_products_is_ignored(self):
+        mean, _ = demand_statistics(np.array([5, 7]), np.array([3, 6, 9]), np.array([1.0, 1.0, 1.0]), 1)
+        self.assertEqual(list(mean), [0, 0])
+
+    def test_no_products(self):
+        mean, std = demand_statistics(np.array([], dtype='int64'), np.array([1]), np.array([1.0]), 1)
+        self.assertEqual(len(mean), 0)
+        self.assertEqual(len(std), 0)
+
+
+class SupplierOrderTests(SimpleTestCase):
+
+    def test_unassigned_last_then_most_urgent_first(self):
+        plan = {
+            'product_id': np.array([1, 2, 3, 4, 5, 6]),
+            'supplier_name': np.array(['Zeta', None, 'Acme', 'Acme', 'Acme', None], dtype=object),
+            'needs_reorder': np.array([True, True, False, True, True, False]),
+            'days_of_cover': np.array([1.0, 0.5, 2.0, 9.0, 3.0, np.inf]),
+        }
+        order = plan['product_id'][_supplier_order(plan)]
+        self.assertEqual(list(order), [5, 4, 3, 1, 2, 6])
+
+    def test_days_of_cover_ties_break_on_product_id(self):
+        plan = {
+            'product_id': np.array([9, 3, 6]),
+            'supplier_name': np.array(['Acme'] * 3, dtype=object),
+            'needs_reorder': np.array([False] * 3),
+            'days_of_cover': np.array([np.inf] * 3),
+        }
+        self.assertEqual(list(plan['product_id'][_supplier_order(plan)]), [3, 6, 9])
+
+
+class RestockParamsTests(SimpleTestCase):
+
+    def test_bounds(self):
+        self.assertIsNone(parse_restock_params({'window_days': '30', 'service_level': '0.99'})[1])
+        for query in ({'window_days': '0'}, {'lead_time_days': '366'}, {'service_level': '1'},
+                      {'service_level': '0.4'}, {'review_days': 'two'}):
+            with self.subTest(query=query):
+                params, error = parse_restock_params(query)
+                self.assertIsNone(params)
+                self.assertTrue(error)
+
+
+class RestockPlanTests(TestCase):
+
+    def setUp(self):
+        self.company = Companies.objects.create(name="Restock Co")
+        self.selling = Product.objects.create(
+            company=self.company, name="Selling", barcode="000000000001", cost=Decimal('2.00'),
+            price=Decimal('5.00'), stock=0, low_stock_input=5,
+        )
+        self.idle = Product.objects.create(
+            company=self.company, name="Idle", barcode="000000000002", cost=Decimal('2.00'),
+            price=Decimal('5.00'), stock=0, low_stock_input=5,
+        )
+        order = Orders.objects.create(
+            company=self.company, status='paid', order_date=timezone.now(), final_amount=Decimal('150.00'),
+        )
+        Order_Items.objects.create(order=order, product=self.selling, quantity=30, price=Decimal('5.00'))
+        Product.objects.filter(company=self.company).update(stock=2)
+        self.params = {'window_days': 30, 'lead_time_days': 7, 'review_days': 14, 'service_level': 0.95}
+
+    def rows_by_product(self):
+        plan = compute_restock_plan(self.company, self.params)
+        rows = restock_rows(plan, restock_selection(plan))
+        return plan, {row['product_id']: row for row in rows}
+
+    def test_selling_product_is_reordered_up_to_target(self):
+        plan, rows = self.rows_by_product()
+        row = rows[self.selling.id]
+
+        # 30 units on one day of a 30-day window: d = 1, s = sqrt(30 - 1).
+        safety_stock = NormalDist().inv_cdf(0.95) * math.sqrt(29) * math.sqrt(7)
+        self.assertAlmostEqual(row['daily_demand'], 1.0)
+        self.assertEqual(row['reorder_point'], math.ceil(7 + safety_stock))
+        self.assertEqual(row['target_stock'], math.ceil(21 + safety_stock))
+        self.assertTrue(row['needs_reorder'])
+        self.assertEqual(row['reorder_qty'], math.ceil(21 + safety_stock) - 2)
+        self.assertEqual(row['reorder_cost'], round(row['reorder_qty'] * 2.0, 2))
+        self.assertEqual(row['days_of_cover'], 2.0)
+        self.assertEqual(list(plan['product_id']), [self.selling.id, self.idle.id])
+
+    def test_product_without_demand_needs_no_reorder(self):
+        plan, rows = self.rows_by_product()
+        row = rows[self.idle.id]
+
+        self.assertEqual(row['daily_demand'], 0)
+        self.assertEqual(row['reorder_point'], 0)
+        self.assertEqual(row['reorder_qty'], 0)
+        self.assertFalse(row['needs_reorder'])
+        # Infinite days of cover in the plan; None once serialized.
+        self.assertTrue(np.isinf(plan['days_of_cover'][list(plan['product_id']).index(self.idle.id)]))
+        self.assertIsNone(row['days_of_cover'])
+
+    def test_needs_reorder_selection(self):
+        plan = compute_restock_plan(self.company, self.params)
+        selected = plan['product_id'][restock_selection(plan, needs_reorder_only=True)]
+        self.assertEqual(list(selected), [self.selling.id])
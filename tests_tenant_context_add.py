@@ -0,0 +1,92 @@
+#
+#
+#
+#
+#
+# inventory_app/tests/test_tenant_context.py
+# The session copy of a tenant context is reused for one version read per request, and goes
+# stale as soon as the user's profile, company memberships or companies change.
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+
+from inventory_app.models import Companies
+from inventory_app.tenant_context import get_tenant_context, get_tenant_version
+
+
+class TenantContextInvalidationTests(TestCase):
+
+    def setUp(self):
+        self.home = Companies.objects.create(name="Home Co")
+        self.client_company = Companies.objects.create(name="Client Co")
+        self.user = get_user_model().objects.create_user(username="tenant-user", password=None)
+        self.profile = self.user.profile
+        self.profile.company = self.home
+        self.profile.save()
+        self.client_company.employees.add(self.profile)
+        # Stands in for request.session; it survives from one request to the next.
+        self.session = {}
+
+    def context(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = self.session
+        return get_tenant_context(request)
+
+    def test_session_copy_costs_one_version_read(self):
+        self.context()
+        with self.assertNumQueries(1):
+            tenant = self.context()
+        self.assertEqual(tenant.company_id, self.home.id)
+        self.assertTrue(tenant.is_member(self.client_company.id))
+
+    def test_removed_member_loses_access_on_the_next_request(self):
+        self.assertTrue(self.context().is_member(self.client_company.id))
+        self.client_company.employees.remove(self.profile)
+        self.assertFalse(self.context().is_member(self.client_company.id))
+
+    def test_cleared_membership_is_picked_up(self):
+        self.assertTrue(self.context().is_member(self.client_company.id))
+        self.client_company.employees.clear()
+        self.assertFalse(self.context().is_member(self.client_company.id))
+
+    def test_added_member_gains_access(self):
+        other = Companies.objects.create(name="Other Co")
+        self.assertFalse(self.context().is_member(other.id))
+        other.employees.add(self.profile)
+        self.assertTrue(self.context().is_member(other.id))
+
+    def test_profile_company_change_is_picked_up(self):
+        other = Companies.objects.create(name="Other Co")
+        self.context()
+        self.profile.company = other
+        self.profile.save()
+
+        tenant = self.context()
+        self.assertEqual(tenant.company_id, other.id)
+        self.assertEqual(tenant.company, other)
+
+    def test_deleted_company_is_dropped(self):
+        client_company_id = self.client_company.id
+        self.assertTrue(self.context().is_member(client_company_id))
+        self.client_company.delete()
+        self.assertFalse(self.context().is_member(client_company_id))
+
+    def test_rolled_back_change_keeps_the_version(self):
+        before = get_tenant_version(self.user.pk)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.client_company.employees.remove(self.profile)
+            raise RuntimeError
+        self.assertEqual(get_tenant_version(self.user.pk), before)
+
+    def test_other_users_are_not_invalidated(self):
+        other_user = get_user_model().objects.create_user(username="tenant-other", password=None)
+        before = get_tenant_version(other_user.pk)
+        self.client_company.employees.remove(self.profile)
+        self.assertEqual(get_tenant_version(other_user.pk), before)
+
+    @override_settings(ANALYTICS_TENANT_CONTEXT_TTL=0)
+    def test_expired_copy_is_resolved_again(self):
+        self.context()
+        with self.assertNumQueries(3):
+            self.context()
@@ -1,2 +1,19 @@
 path('api/dashboard-kpi-data/', views.get_kpi_data, name='dashboard-kpi-data'),
     path('dashboard/', views.sample_dashboard, name='your_analytics_insights'),
+    path('api/dashboard-bootstrap/', views.get_dashboard_bootstrap_data, name='dashboard-bootstrap-data'),
+    path('api/export/sales-metrics/', views.export_sales_metrics, name='export-sales-metrics'),
+    path('api/export/product-sales/', views.export_product_sales, name='export-product-sales'),
+    path('api/export/restock-recommendations/', views.export_restock_recommendations, name='export-restock-recommendations'),
+    path('api/analytics-profiling/', views.get_analytics_profiling_data, name='analytics-profiling-data'),
+    # Async variants: login_required only wraps async def views from Django 5.1.
+    *([
+        path('api/async/dashboard-kpi-data/', views.get_kpi_data_async, name='dashboard-kpi-data-async'),
+        path('api/async/dashboard-graph-data/', views.get_dashboard_graph_data_async, name='dashboard-graph-data-async'),
+        path('api/async/sales-trends/<int:company_id>/', views.get_sales_trends_api_data_async, name='sales-trends-api-async'),
+        path('api/async/all-monthly-sales-trends/<int:company_id>/', views.get_all_monthly_sales_trends_api_data_async, name='all-monthly-sales-trends-api-async'),
+    ] if views.async_views_supported() else []),
+    # Live KPI stream: ASGI deployments only, opted in with ANALYTICS_KPI_STREAM_ENABLED.
+    *([
+        path('api/dashboard-kpi-stream/', views.get_kpi_stream, name='dashboard-kpi-stream'),
+    ] if views.kpi_stream_enabled() else []),
+    path('api/restock-recommendations/', views.get_restock_recommendations, name='restock-recommendations'),